@@ -47,21 +47,55 @@ export function IndexerPanel({
     }
 
     setIsIndexing(true);
+    const progressToast = toast.loading("Indexing documents...");
 
     try {
-      const client = createClient(apiUrl, getApiKey() ?? undefined);
+      const apiKey = getApiKey();
+      const client = createClient(apiUrl, apiKey ?? undefined);
 
-      await client.runs.create(null, "indexer", {
-        input: { docs: documents },
+      // Upload the text out of band so the run's state only carries its key.
+      const upload = await fetch(`${apiUrl}/blobs`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "text/plain; charset=utf-8",
+          ...(apiKey ? { "X-Api-Key": apiKey } : {}),
+        },
+        body: documents,
+      });
+      if (!upload.ok) {
+        throw new Error(`Upload failed: ${upload.status} ${upload.statusText}`);
+      }
+      const { blob } = await upload.json();
+
+      const stream = client.runs.stream(null, "indexer", {
+        input: { docs: [{ blob }] },
         config: {
           configurable: {
             user_id: userId,
             retriever_provider: retrieverProvider,
           },
         },
+        streamMode: "custom",
       });
+      for await (const chunk of stream) {
+        if (chunk.event === "error") {
+          throw new Error(chunk.data?.message ?? "Indexing run failed");
+        }
+        const progress = chunk.data?.indexing;
+        if (chunk.event === "custom" && progress) {
+          const eta =
+            progress.eta_seconds != null
+              ? `, about ${Math.ceil(progress.eta_seconds)}s left`
+              : "";
+          toast.loading(
+            `Indexed ${progress.docs_done} of ${progress.docs_total} documents${eta}`,
+            { id: progressToast },
+          );
+        }
+      }
 
       toast.success("Documents indexed successfully", {
+        id: progressToast,
         description: `Indexed for user: ${userId}`,
       });
 
@@ -70,6 +104,7 @@ export function IndexerPanel({
     } catch (error) {
       console.error("Indexing error:", error);
       toast.error("Failed to index documents", {
+        id: progressToast,
         description: error instanceof Error ? error.message : "Unknown error",
       });
     } finally {
@@ -0,0 +1,120 @@
+"""Recall vs latency report for the local vector store's IVF index.
+
+Builds a ``LocalVectorStore`` with ``index="ivf"`` over synthetic clustered
+embeddings, then compares every ``nprobe`` setting against exact search.
+
+Usage:
+    python -m benchmarks.ann_recall --rows 100000 --dim 256 --nprobe 1 4 8 16 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retrieval_graph.local_store import LocalVectorStore
+
+
+def synthetic_corpus(
+    rows: int, dim: int, clusters: int, noise: float = 1.0, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(corpus, queries)`` drawn from a Gaussian mixture."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    corpus = centers[labels] + noise * rng.standard_normal((rows, dim)).astype(
+        np.float32
+    )
+    query_labels = rng.integers(0, clusters, 200)
+    queries = centers[query_labels] + noise * rng.standard_normal((200, dim)).astype(
+        np.float32
+    )
+    return corpus, queries
+
+
+def _exact(matrix: np.ndarray, query: np.ndarray, k: int) -> set[int]:
+    scores = matrix @ (query / np.linalg.norm(query))
+    return set(np.argpartition(-scores, k)[:k].tolist())
+
+
+def run(rows: int, dim: int, k: int, nprobes: list[int], clusters: int) -> list[dict]:
+    """Build the store and return one result row per configuration."""
+    corpus, queries = synthetic_corpus(rows, dim, clusters)
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(
+            path, DeterministicFakeEmbedding(size=dim), index="ivf"
+        )
+        start = time.perf_counter()
+        for offset in range(0, rows, 10_000):
+            block = corpus[offset : offset + 10_000]
+            store._append(
+                [str(offset + i) for i in range(len(block))],
+                block,
+                [{"user_id": "bench"} for _ in block],
+                None,
+            )
+        build_s = time.perf_counter() - start
+        matrix = np.asarray(store._matrix)
+        truth = [_exact(matrix, q, k) for q in queries]
+        row_of = {id_: row for row, id_ in enumerate(store._ids)}
+
+        results = []
+        for nprobe in [None, *nprobes]:
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                kwargs = {"nprobe": nprobe} if nprobe else {}
+                if nprobe is None:
+                    store.exact_search_rows = rows + 1
+                t0 = time.perf_counter()
+                found = store.similarity_search_with_score_by_vector(
+                    query.tolist(), k, {"user_id": "bench"}, **kwargs
+                )
+                latencies.append((time.perf_counter() - t0) * 1000)
+                store.exact_search_rows = 2048
+                got = {row_of[doc.id] for doc, _ in found}
+                recalls.append(len(got & expected) / k)
+            results.append(
+                {
+                    "index": "flat" if nprobe is None else "ivf",
+                    "nprobe": nprobe,
+                    "nlist": None
+                    if store._ivf is None or store._ivf.centroids is None
+                    else len(store._ivf.centroids),
+                    f"recall@{k}": round(float(np.mean(recalls)), 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                    "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                    "build_s": round(build_s, 2),
+                }
+            )
+        return results
+
+
+def main() -> None:
+    """Print a markdown table (and optionally JSON) of recall vs latency."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--json", help="Write results to this file.")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.dim, args.k, args.nprobe, args.clusters)
+    header = list(results[0])
+    print("| " + " | ".join(header) + " |")  # noqa: T201
+    print("|" + "---|" * len(header))  # noqa: T201
+    for row in results:
+        print("| " + " | ".join(str(row[h]) for h in header) + " |")  # noqa: T201
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Per-node chat model setup overhead, with and without the model pool.
+
+``generate_query`` and ``respond`` call ``load_chat_model`` on every turn.
+This measures that setup cost (model loading plus, for ``generate_query``,
+``with_structured_output``) when every call builds a new client, as before
+pooling, and when the pooled client is reused. No requests are sent, so
+placeholder API keys are set for providers that have none configured.
+
+Usage:
+    python -m benchmarks.chat_model_load --models openai/gpt-4o-mini
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Callable
+
+import numpy as np
+
+from retrieval_graph.graph import SearchQuery
+from retrieval_graph.utils import (
+    _init_chat_model,
+    _provider_kwargs,
+    load_chat_model,
+    load_structured_model,
+)
+
+_PLACEHOLDER_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+
+def _uncached(name: str) -> Callable[[], object]:
+    provider, model = name.split("/", maxsplit=1)
+    return lambda: _init_chat_model(provider, model, _provider_kwargs(provider))
+
+
+def _time(fn: Callable[[], object], iterations: int) -> list[float]:
+    fn()  # Warm up imports and the pool.
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def run(models: list[str], iterations: int) -> list[dict]:
+    """Return one result row per model, node and loading strategy."""
+    results = []
+    for name in models:
+        provider = name.split("/", maxsplit=1)[0]
+        if provider in _PLACEHOLDER_KEYS:
+            os.environ.setdefault(_PLACEHOLDER_KEYS[provider], "placeholder")
+        load = _uncached(name)
+        strategies = {
+            "per_call": {
+                "respond": load,
+                "generate_query": lambda load=load: load().with_structured_output(
+                    SearchQuery
+                ),
+            },
+            "pooled": {
+                "respond": lambda name=name: load_chat_model(name),
+                "generate_query": lambda name=name: load_structured_model(
+                    name, SearchQuery
+                ),
+            },
+        }
+        for strategy, nodes in strategies.items():
+            for node, fn in nodes.items():
+                latencies = _time(fn, iterations)
+                results.append(
+                    {
+                        "model": name,
+                        "node": node,
+                        "loading": strategy,
+                        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                    }
+                )
+    return results
+
+
+def main() -> None:
+    """Print a markdown table (and optionally JSON) of per-node setup cost."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["openai/gpt-4o-mini", "anthropic/claude-3-5-haiku-latest"],
+    )
+    parser.add_argument("--json", help="Write results to this file.")
+    args = parser.parse_args()
+
+    # The per-call path logs at DEBUG on every build; keep it out of the timings.
+    logging.disable(logging.CRITICAL)
+    results = run(args.models, args.iterations)
+    header = list(results[0])
+    print("| " + " | ".join(header) + " |")  # noqa: T201
+    print("|" + "---|" * len(header))  # noqa: T201
+    for row in results:
+        print("| " + " | ".join(str(row[h]) for h in header) + " |")  # noqa: T201
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
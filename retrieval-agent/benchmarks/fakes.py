@@ -0,0 +1,232 @@
+"""Deterministic offline stand-ins for model providers, used by the benchmarks.
+
+``LatencyChatModel`` and ``LatencyEmbeddings`` behave like remote providers
+(a fixed request latency, a token rate for streamed output) without network
+access, so graph overhead can be measured on its own and compared across
+changes. ``install`` routes ``load_chat_model`` and ``make_text_encoder`` to
+them for the ``fake/...`` model names.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from pydantic import BaseModel
+
+from retrieval_graph import retrieval, tracing, utils
+from retrieval_graph.utils import get_message_text
+
+_TOPICS = [
+    "cloud migration",
+    "data engineering",
+    "security audits",
+    "machine learning",
+    "customer support",
+    "billing",
+    "onboarding",
+    "compliance",
+]
+_WORDS = (
+    "service team project client platform pipeline report policy contract "
+    "region account invoice model dataset dashboard incident review roadmap "
+    "budget vendor schedule office training release"
+).split()
+
+
+def synthetic_corpus(size: int, seed: int = 0) -> list[str]:
+    """Return ``size`` short pseudo-documents about a handful of topics."""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(size):
+        topic = _TOPICS[i % len(_TOPICS)]
+        words = " ".join(rng.choices(_WORDS, k=40))
+        docs.append(f"Document {i} about {topic}. The {topic} {words}.")
+    return docs
+
+
+def synthetic_conversations(size: int, seed: int = 1) -> list[list[tuple[str, str]]]:
+    """Return ``size`` conversations about the topics of ``synthetic_corpus``.
+
+    Every third conversation ends in a short follow-up ("and for billing?"),
+    so the query rewrite path is exercised alongside the skip fast path.
+    """
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(size):
+        question = f"What does the {rng.choice(_TOPICS)} {rng.choice(_WORDS)} cover?"
+        if i % 3 == 2:
+            conversations.append(
+                [
+                    ("user", question),
+                    ("ai", "It covers the usual scope."),
+                    ("user", f"and for {rng.choice(_TOPICS)}?"),
+                ]
+            )
+        else:
+            conversations.append([("user", question)])
+    return conversations
+
+
+def _estimate_tokens(messages: Any) -> int:
+    if hasattr(messages, "to_messages"):
+        messages = messages.to_messages()
+    if isinstance(messages, str):
+        return len(messages) // 4
+    return sum(len(get_message_text(m)) for m in messages) // 4
+
+
+class LatencyChatModel(BaseChatModel):
+    """A chat model that answers after a fixed latency at a fixed token rate."""
+
+    latency: float = 0.0
+    """Seconds before the first token."""
+    tokens_per_second: float = 0.0
+    """Output rate after the first token; ``0`` emits everything at once."""
+    answer: str = "The documents describe the requested service in detail."
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-fake"
+
+    def _usage(self, messages: list[BaseMessage]) -> dict[str, int]:
+        input_tokens = _estimate_tokens(messages)
+        output_tokens = len(self.answer.split())
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _duration(self) -> float:
+        if not self.tokens_per_second:
+            return self.latency
+        return self.latency + len(self.answer.split()) / self.tokens_per_second
+
+    def _generate(
+        self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        time.sleep(self._duration())
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self._duration())
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, word in enumerate(self.answer.split()):
+            if i and self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(
+        self, messages: list[BaseMessage], stop: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(self.answer.split()):
+            if i and self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def with_structured_output(  # type: ignore[override]
+        self, schema: type[BaseModel], *, include_raw: bool = False, **kwargs: Any
+    ) -> RunnableLambda:
+        """Return a runnable that "rewrites" the last message into ``schema``.
+
+        The underlying call goes through this model, so it is timed by the
+        same callbacks as a real structured-output call.
+        """
+
+        def parse(value: Any, raw: BaseMessage) -> Any:
+            messages = value.to_messages() if hasattr(value, "to_messages") else value
+            text = get_message_text(messages[-1])
+            if "queries" in schema.model_fields:
+                parsed = schema(queries=[text, f"{text} overview", f"about {text}"])
+            else:
+                parsed = schema(query=text)
+            if not include_raw:
+                return parsed
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        def invoke(value: Any, config: RunnableConfig) -> Any:
+            return parse(value, self.invoke(value, config))
+
+        async def ainvoke(value: Any, config: RunnableConfig) -> Any:
+            return parse(value, await self.ainvoke(value, config))
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class LatencyEmbeddings(Embeddings):
+    """Deterministic embeddings with a fixed per-request latency."""
+
+    def __init__(self, size: int, latency: float = 0.0) -> None:
+        """Embed into ``size`` dimensions, waiting ``latency`` seconds per call."""
+        self.inner = DeterministicFakeEmbedding(size=size)
+        self.latency = latency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents."""
+        time.sleep(self.latency)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query."""
+        time.sleep(self.latency)
+        return self.inner.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents asynchronously."""
+        await asyncio.sleep(self.latency)
+        return self.inner.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a query asynchronously."""
+        await asyncio.sleep(self.latency)
+        return self.inner.embed_query(text)
+
+
+def install(
+    *,
+    llm_latency: float = 0.0,
+    tokens_per_second: float = 0.0,
+    embedding_latency: float = 0.0,
+) -> None:
+    """Serve ``fake/<anything>`` chat models and ``fake/<dim>`` embeddings.
+
+    Other provider names still go to the real constructors.
+    """
+    build_chat_model = utils._init_chat_model
+    build_encoder = retrieval._build_text_encoder
+
+    def init_chat_model(provider: str, model: str, config_kwargs: dict) -> Any:
+        if provider != "fake":
+            return build_chat_model(provider, model, config_kwargs)
+        chat_model = LatencyChatModel(
+            latency=llm_latency, tokens_per_second=tokens_per_second
+        )
+        chat_model.callbacks = [tracing.llm_timer]
+        return chat_model
+
+    def build_text_encoder(model: str) -> Embeddings:
+        provider, name = model.split("/", maxsplit=1)
+        if provider != "fake":
+            return build_encoder(model)
+        return LatencyEmbeddings(int(name), embedding_latency)
+
+    utils._init_chat_model = init_chat_model  # type: ignore[assignment]
+    retrieval._build_text_encoder = build_text_encoder  # type: ignore[assignment]
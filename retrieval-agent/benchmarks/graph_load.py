@@ -0,0 +1,270 @@
+"""Offline load test for the index and retrieval graphs.
+
+Indexes a synthetic corpus through ``index_graph``, then drives the retrieval
+graph with concurrent conversations. Chat models and embeddings are replaced
+by the latency-simulating fakes in ``benchmarks.fakes`` and the vector store
+is the in-process ``local`` provider, so no API keys or services are needed
+and runs are comparable across changes.
+
+Reports p50/p95/p99 per traced span (graph nodes, LLM calls, embedding and
+search calls), end-to-end latency and throughput, plus memory allocated per
+request in a separate ``tracemalloc`` pass. With ``--baseline`` the run is
+compared against a stored result and exits non-zero on a regression.
+
+Usage:
+    python -m benchmarks.graph_load --requests 200 --concurrency 8
+    python -m benchmarks.graph_load --baseline benchmarks/baselines/graph_load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any
+
+import numpy as np
+
+_LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _summary(latencies_s: list[float]) -> dict[str, Any]:
+    ms = np.asarray(latencies_s) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def _span_key(name: str, labels: tuple[tuple[str, str], ...]) -> str:
+    shown = [f"{k}={v}" for k, v in labels if k != "model"]
+    return f"{name}[{','.join(shown)}]" if shown else name
+
+
+async def _drive(
+    graph: Any, conversations: list, config: dict, concurrency: int
+) -> tuple[list[float], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(messages: list) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": messages}, config)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(m) for m in conversations))
+    return latencies, time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Index the corpus, run the load and return the results."""
+    from benchmarks import fakes
+    from retrieval_graph import tracing
+    from retrieval_graph.graph import graph, speculative_graph
+    from retrieval_graph.index_graph import graph as index_graph
+
+    tracing.SAMPLE_RATE = 1.0
+    config = {
+        "configurable": {
+            "user_id": "bench",
+            "retriever_provider": "local",
+            "embedding_model": f"fake/{args.dim}",
+            "query_model": "fake/chat",
+            "response_model": "fake/chat",
+            "retrieval_mode": args.retrieval_mode,
+            "use_answer_cache": args.answer_cache,
+        }
+    }
+    spans: dict[str, list[float]] = defaultdict(list)
+
+    def listen(name: str, seconds: float, labels: tuple) -> None:
+        spans[_span_key(name, labels)].append(seconds)
+
+    corpus = fakes.synthetic_corpus(args.docs)
+    index_latencies = []
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), args.index_batch):
+        t0 = time.perf_counter()
+        await index_graph.ainvoke(
+            {"docs": corpus[offset : offset + args.index_batch]}, config
+        )
+        index_latencies.append(time.perf_counter() - t0)
+    index_s = time.perf_counter() - start
+
+    target = speculative_graph if args.speculative else graph
+    conversations = fakes.synthetic_conversations(args.requests)
+    # Warm the model and store pools so the first requests are not outliers.
+    await _drive(target, conversations[: args.concurrency], config, args.concurrency)
+    tracing.add_listener(listen)
+    try:
+        latencies, elapsed = await _drive(
+            target, conversations, config, args.concurrency
+        )
+    finally:
+        tracing.remove_listener(listen)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    sample = conversations[: args.memory_requests]
+    await _drive(target, sample, config, 1)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "config": {
+            k: getattr(args, k)
+            for k in (
+                "docs",
+                "dim",
+                "requests",
+                "concurrency",
+                "llm_latency",
+                "tokens_per_second",
+                "embedding_latency",
+                "retrieval_mode",
+                "answer_cache",
+                "speculative",
+            )
+        },
+        "index": {
+            "docs_per_s": round(len(corpus) / index_s, 1),
+            **_summary(index_latencies),
+        },
+        "end_to_end": _summary(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "spans": {name: _summary(values) for name, values in sorted(spans.items())},
+        "memory": {
+            "peak_kib": round((peak - before) / 1024, 1),
+            "retained_kib_per_request": round(
+                (current - before) / 1024 / len(sample), 2
+            ),
+        },
+    }
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float, slack_ms: float
+) -> list[str]:
+    """Return a description of every metric that regressed against ``baseline``.
+
+    Latencies regress when they exceed the baseline by more than ``tolerance``
+    (relative) plus ``slack_ms`` (absolute, to absorb timer noise on fast
+    spans); throughput and peak memory regress when they get worse by more
+    than ``tolerance``.
+    """
+    regressions = []
+
+    def check_latency(name: str, current: dict, previous: dict) -> None:
+        for key in _LATENCY_KEYS:
+            limit = previous[key] * (1 + tolerance) + slack_ms
+            if current[key] > limit:
+                regressions.append(
+                    f"{name} {key}: {current[key]} > {previous[key]} (limit {limit:.3f})"
+                )
+
+    check_latency("end_to_end", results["end_to_end"], baseline["end_to_end"])
+    for name, previous in baseline["spans"].items():
+        if name in results["spans"]:
+            check_latency(name, results["spans"][name], previous)
+    floor = baseline["throughput_rps"] * (1 - tolerance)
+    if results["throughput_rps"] < floor:
+        regressions.append(f"throughput_rps: {results['throughput_rps']} < {floor:.2f}")
+    ceiling = baseline["memory"]["peak_kib"] * (1 + tolerance)
+    if results["memory"]["peak_kib"] > ceiling:
+        regressions.append(
+            f"memory peak_kib: {results['memory']['peak_kib']} > {ceiling:.1f}"
+        )
+    if baseline["config"] != results["config"]:
+        regressions.append("config differs from the baseline; results not comparable")
+    return regressions
+
+
+def _print_table(results: dict[str, Any]) -> None:
+    header = ["span", "count", *_LATENCY_KEYS]
+    print("| " + " | ".join(header) + " |")  # noqa: T201
+    print("|" + "---|" * len(header))  # noqa: T201
+    rows = {**results["spans"], "end_to_end": results["end_to_end"]}
+    for name, row in rows.items():
+        cells = [name, *(str(row[h]) for h in header[1:])]
+        print("| " + " | ".join(cells) + " |")  # noqa: T201
+    print()  # noqa: T201
+    print(f"throughput: {results['throughput_rps']} req/s")  # noqa: T201
+    print(f"indexing: {results['index']['docs_per_s']} docs/s")  # noqa: T201
+    print(f"memory: {results['memory']}")  # noqa: T201
+
+
+def main() -> None:
+    """Run the load test and print per-span latencies, throughput and memory."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--index-batch", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--memory-requests", type=int, default=20)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="Seconds to first token."
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.01)
+    parser.add_argument(
+        "--retrieval-mode", choices=["vector", "hybrid"], default="vector"
+    )
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument("--speculative", action="store_true")
+    parser.add_argument("--json", help="Write results to this file.")
+    parser.add_argument("--baseline", help="Compare against this results file.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression against the baseline.",
+    )
+    parser.add_argument(
+        "--slack-ms",
+        type=float,
+        default=1.0,
+        help="Allowed absolute latency regression against the baseline.",
+    )
+    args = parser.parse_args()
+
+    # Importing the package configures logging; keep it out of the timings.
+    logging.disable(logging.INFO)
+    from benchmarks import fakes
+
+    fakes.install(
+        llm_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        embedding_latency=args.embedding_latency,
+    )
+    with tempfile.TemporaryDirectory() as path:
+        os.environ["LOCAL_VECTOR_STORE_PATH"] = path
+        results = asyncio.run(run(args))
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.slack_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")  # noqa: T201
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Retrieval quality vs latency over the company knowledge corpus.
+
+Indexes ``knowledge/*.md`` (one document per ``##`` section) and the rows of
+the SQL seed data through the index graph into each configured retriever
+provider. It then runs a labeled question set against every combination of
+provider, retrieval mode and ``k``, and reports recall@k, MRR and search
+latency per configuration in one table. With ``--recall-target`` it also
+names the cheapest configuration (smallest ``k``, then lowest p95) that
+meets the target.
+
+The providers need their usual environment (API keys, URLs) and the
+embedding model comes from ``--embedding-model`` or ``EMBEDDING_MODEL``.
+``--offline`` swaps in the deterministic fakes from ``benchmarks.fakes``,
+which checks the harness end to end but gives meaningless vector recall.
+
+Usage:
+    python -m benchmarks.retrieval_eval --providers local --k 2 4 8 --modes vector hybrid
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+KNOWLEDGE_DIR = REPO_ROOT / "knowledge"
+SQL_SEED = REPO_ROOT / "azure-sql-server" / "01-init-company-data.sql"
+QUESTIONS = Path(__file__).parent / "data" / "retrieval_eval.jsonl"
+
+_INSERT_RE = re.compile(
+    r"INSERT INTO (\w+) \(([^)]*)\)\s*VALUES\s*(.*?);", re.DOTALL | re.IGNORECASE
+)
+_VALUE_RE = re.compile(r"'((?:[^']|'')*)'|(@?[\w.]+)")
+
+
+def slug(text: str) -> str:
+    """Return a lowercase, hyphenated form of ``text`` for document ids.
+
+    Examples:
+        >>> slug("India Market Entry & Strategy")
+        'india-market-entry-strategy'
+    """
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def load_markdown(directory: Path = KNOWLEDGE_DIR) -> list[Document]:
+    """Split every markdown file into one document per ``##`` section.
+
+    Each section keeps the file's title line for context. Ids have the form
+    ``<file stem>#<section slug>``.
+    """
+    docs = []
+    for path in sorted(directory.glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        title, _, body = text.partition("\n## ")
+        for section in re.split(r"\n## ", "## " + body if body else ""):
+            heading, _, _ = section.removeprefix("## ").partition("\n")
+            if not section.strip():
+                continue
+            docs.append(
+                Document(
+                    id=f"{path.stem}#{slug(heading)}",
+                    page_content=f"{title.strip()}\n\n{section.strip()}",
+                    metadata={"source": path.name, "section": heading.strip()},
+                )
+            )
+    return docs
+
+
+def _sql_rows(values: str) -> list[list[str]]:
+    rows, depth, current = [], 0, ""
+    for match in re.finditer(r"'(?:[^']|'')*'|[()]|[^'()]+", values):
+        token = match.group(0)
+        if token == "(" and depth == 0:
+            depth, current = 1, ""
+        elif token == ")" and depth == 1:
+            depth = 0
+            rows.append(
+                [
+                    quoted.replace("''", "'") if quoted else bare
+                    for quoted, bare in _VALUE_RE.findall(current)
+                ]
+            )
+        elif depth:
+            current += token
+    return rows
+
+
+def load_sql_seed(path: Path = SQL_SEED) -> list[Document]:
+    """Turn every row inserted by the SQL seed script into a document.
+
+    Ids have the form ``sql:<table>:<slug of the first column>``.
+    """
+    docs = []
+    for table, columns, values in _INSERT_RE.findall(path.read_text("utf-8")):
+        names = [c.strip() for c in columns.split(",")]
+        for row in _sql_rows(values):
+            fields = [
+                f"{name}: {value}"
+                for name, value in zip(names, row)
+                if not value.startswith("@")
+            ]
+            docs.append(
+                Document(
+                    id=f"sql:{table}:{slug(row[0])}",
+                    page_content=f"{table}\n" + "\n".join(fields),
+                    metadata={"source": path.name, "section": table},
+                )
+            )
+    return docs
+
+
+def load_questions(path: Path = QUESTIONS) -> list[dict[str, Any]]:
+    """Read ``{"question": ..., "relevant": [doc ids]}`` lines."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(ranked: list[str], relevant: set[str], k: int) -> tuple[float, float]:
+    """Return ``(recall@k, reciprocal rank)`` of ``ranked`` against ``relevant``.
+
+    Examples:
+        >>> score(["a", "b", "c"], {"b", "d"}, k=3)
+        (0.5, 0.5)
+    """
+    top = ranked[:k]
+    recall = len(relevant.intersection(top)) / len(relevant)
+    rank = next((i for i, key in enumerate(top, 1) if key in relevant), None)
+    return recall, 1 / rank if rank else 0.0
+
+
+async def _index(docs: list[Document], configurable: dict[str, Any]) -> None:
+    from retrieval_graph.index_graph import graph as index_graph
+
+    # Index in hybrid mode so both the vector store and the BM25 index are
+    # populated and every retrieval mode can be evaluated.
+    config = {"configurable": {**configurable, "retrieval_mode": "hybrid"}}
+    await index_graph.ainvoke({"docs": docs}, config)
+
+
+async def _evaluate(
+    questions: list[dict[str, Any]], configurable: dict[str, Any], k: int
+) -> dict[str, Any]:
+    from retrieval_graph import retrieval
+    from retrieval_graph.fusion import doc_key
+
+    config = {"configurable": {**configurable, "search_kwargs": {"k": k}}}
+    await retrieval.asearch(config, questions[0]["question"])  # Warm up pools.
+    recalls, ranks, latencies = [], [], []
+    for item in questions:
+        start = time.perf_counter()
+        docs = await retrieval.asearch(config, item["question"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recall, rank = score([doc_key(d) for d in docs], set(item["relevant"]), k)
+        recalls.append(recall)
+        ranks.append(rank)
+    return {
+        "recall@k": round(float(np.mean(recalls)), 3),
+        "mrr": round(float(np.mean(ranks)), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Index the corpus into every provider and evaluate every configuration."""
+    docs = load_markdown() + load_sql_seed()
+    questions = load_questions(Path(args.questions))
+    results = []
+    for provider in args.providers:
+        configurable = {
+            # A dedicated user keeps the eval corpus apart from real data.
+            "user_id": args.user_id,
+            "retriever_provider": provider,
+            "embedding_model": args.embedding_model,
+        }
+        await _index(docs, configurable)
+        for mode, k in itertools.product(args.modes, sorted(args.k)):
+            row = {"provider": provider, "mode": mode, "k": k}
+            row.update(
+                await _evaluate(questions, {**configurable, "retrieval_mode": mode}, k)
+            )
+            results.append(row)
+    return results
+
+
+def cheapest(results: list[dict[str, Any]], target: float) -> dict[str, Any] | None:
+    """Return the configuration with the smallest ``k``, then p95, meeting ``target``."""
+    passing = [row for row in results if row["recall@k"] >= target]
+    return min(passing, key=lambda row: (row["k"], row["p95_ms"]), default=None)
+
+
+def main() -> None:
+    """Print a markdown table (and optionally JSON) of quality vs latency."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--providers", nargs="+", default=["local"])
+    parser.add_argument("--modes", nargs="+", default=["vector", "hybrid"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument(
+        "--embedding-model",
+        default=os.environ.get("EMBEDDING_MODEL", "openai/text-embedding-3-small"),
+    )
+    parser.add_argument("--user-id", default="retrieval-eval")
+    parser.add_argument("--questions", default=str(QUESTIONS))
+    parser.add_argument("--recall-target", type=float)
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use deterministic fake embeddings; vector recall is meaningless.",
+    )
+    parser.add_argument("--json", help="Write results to this file.")
+    args = parser.parse_args()
+
+    # Importing the package configures logging; keep it out of the output.
+    logging.disable(logging.INFO)
+    if args.offline:
+        from benchmarks import fakes
+
+        fakes.install()
+        args.embedding_model = "fake/256"
+    with tempfile.TemporaryDirectory() as path:
+        # Keep the local store and BM25 index out of the working directory.
+        os.environ.setdefault("LOCAL_VECTOR_STORE_PATH", path)
+        results = asyncio.run(run(args))
+
+    header = list(results[0])
+    print("| " + " | ".join(header) + " |")  # noqa: T201
+    print("|" + "---|" * len(header))  # noqa: T201
+    for row in results:
+        print("| " + " | ".join(str(row[h]) for h in header) + " |")  # noqa: T201
+    if args.recall_target is not None:
+        best = cheapest(results, args.recall_target)
+        print()  # noqa: T201
+        print(f"cheapest configuration with recall@k >= {args.recall_target}: {best}")  # noqa: T201
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
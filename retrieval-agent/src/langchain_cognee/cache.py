@@ -0,0 +1,237 @@
+"""Generation-versioned cache of Cognee search results.
+
+Identical searches against an unchanged dataset return the same results, yet
+each one is a slow ``/api/v1/search`` call. ``SearchCache`` keys results by
+the searched datasets, search type, normalized query and ``k``, together with
+a generation counter per dataset. ``CogneeRetriever`` bumps a dataset's
+generation whenever it adds documents to it or cognifies it, and every
+dataset's on ``prune``, so results computed before a change are never served
+after it.
+
+Two tiers are used:
+
+1. An in-memory LRU holding the most recently used results.
+2. An optional SQLite file, which also stores the generations, so that
+   worker processes sharing the file see each other's changes.
+
+Changes made to a dataset without going through a ``CogneeRetriever`` (for
+example by another client of the Cognee server) are not detected.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.documents import Document
+
+_ALL = "*"
+"""Generation key bumped by ``prune``, which clears every dataset."""
+
+
+def normalize_query(query: str) -> str:
+    """Return ``query`` case-folded with runs of whitespace collapsed.
+
+    Examples:
+        >>> normalize_query("  Where is   Paris? ")
+        'where is paris?'
+    """
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """An LRU of search results, optionally backed by a SQLite file.
+
+    Args:
+        max_entries: Capacity of the in-memory tier. Zero disables it.
+        path: SQLite file for the persistent tier. ``None`` disables it.
+    """
+
+    def __init__(
+        self, *, max_entries: int = 1024, path: str | Path | None = None
+    ) -> None:
+        """Create an empty cache, opening ``path`` if given."""
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, List[Dict[str, Any]]] = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, datasets TEXT NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations "
+                "(dataset TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _generation(self, dataset: str) -> int:
+        if self._conn is None:
+            return self._generations.get(dataset, 0)
+        row = self._conn.execute(
+            "SELECT generation FROM generations WHERE dataset = ?", (dataset,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def key(self, datasets: Sequence[str], search_type: str, query: str, k: int) -> str:
+        """Return the cache key of a search at the datasets' current generations."""
+        with self._lock:
+            generations = [
+                f"{dataset}@{self._generation(dataset)}"
+                for dataset in (_ALL, *sorted(datasets))
+            ]
+        raw = json.dumps([generations, search_type, normalize_query(query), k])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def bump(self, dataset: str | None = None) -> None:
+        """Invalidate the results of ``dataset``, or of every dataset if ``None``."""
+        name = _ALL if dataset is None else dataset
+        with self._lock:
+            if self._conn is None:
+                self._generations[name] = self._generations.get(name, 0) + 1
+                return
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO generations VALUES (?, 1) ON CONFLICT(dataset) "
+                    "DO UPDATE SET generation = generation + 1",
+                    (name,),
+                )
+                # Rows of older generations can no longer be hit.
+                if dataset is None:
+                    self._conn.execute("DELETE FROM results")
+                else:
+                    self._conn.execute(
+                        "DELETE FROM results WHERE instr(datasets, ?) > 0",
+                        (f"\x1f{dataset}\x1f",),
+                    )
+
+    def get(self, key: str) -> List[Document] | None:
+        """Return the cached results of ``key``, or ``None`` on a miss."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _to_documents(value)
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return _to_documents(value)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, datasets: Sequence[str], docs: List[Document]) -> None:
+        """Store the results of ``key``, a search of ``datasets``."""
+        # Copy the metadata both ways, so callers mutating their documents
+        # cannot change what later hits return.
+        value = [
+            {
+                "id": doc.id,
+                "page_content": doc.page_content,
+                "metadata": copy.deepcopy(doc.metadata),
+            }
+            for doc in docs
+        ]
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                        (
+                            key,
+                            "".join(f"\x1f{dataset}\x1f" for dataset in datasets),
+                            json.dumps(value, default=str),
+                        ),
+                    )
+
+    def _remember(self, key: str, value: List[Dict[str, Any]]) -> None:
+        if not self.max_entries:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the hit rate.
+
+        ``hits`` includes ``disk_hits``.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        """Release the SQLite connection, if any."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _to_documents(value: List[Dict[str, Any]]) -> List[Document]:
+    return [
+        Document(
+            id=doc["id"],
+            page_content=doc["page_content"],
+            metadata=copy.deepcopy(doc["metadata"]),
+        )
+        for doc in value
+    ]
+
+
+_caches: Dict[str, SearchCache | None] = {}
+_caches_lock = threading.Lock()
+
+
+def search_cache_for(api_url: str) -> SearchCache | None:
+    """Return the process-wide search cache of a Cognee server.
+
+    Sized by ``COGNEE_SEARCH_CACHE_SIZE`` (default 1024; ``0`` disables the
+    memory tier) and persisted to ``COGNEE_SEARCH_CACHE_PATH`` when set. With
+    both tiers disabled there is no cache and this returns ``None``.
+    """
+    with _caches_lock:
+        if api_url not in _caches:
+            size = int(os.environ.get("COGNEE_SEARCH_CACHE_SIZE", "1024"))
+            path = os.environ.get("COGNEE_SEARCH_CACHE_PATH") or None
+            if path is not None:
+                # One file per server, as dataset names are per server.
+                digest = hashlib.sha256(api_url.encode()).hexdigest()[:12]
+                path = str(Path(path).with_suffix(f".{digest}.sqlite"))
+            _caches[api_url] = (
+                SearchCache(max_entries=size, path=path) if size or path else None
+            )
+        return _caches[api_url]
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Return the stats of every search cache, by API URL."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {url: cache.stats() for url, cache in caches.items() if cache is not None}
@@ -7,18 +7,21 @@ and vector store functionalities with LangChain's Retriever interface.
 
 import asyncio
 import hashlib
+import json
 import os
-import time
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
-import httpx
 from langchain_core.callbacks import (
     AsyncCallbackManagerForRetrieverRun,
     CallbackManagerForRetrieverRun,
 )
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from pydantic import ConfigDict, Field, model_validator
+from pydantic import ConfigDict, Field, PrivateAttr, model_validator
+
+from langchain_cognee.cache import SearchCache, search_cache_for
+from langchain_cognee.scheduler import CognifyJob, CognifyScheduler, scheduler_for
+from langchain_cognee.transport import CogneeTransport, shared_transport
 
 
 class CogneeRetriever(BaseRetriever):
@@ -48,6 +51,14 @@ class CogneeRetriever(BaseRetriever):
             The name of the cognee dataset to which documents are added and from which they are retrieved.
         - k (int):
             Default number of documents to retrieve if not overridden during a query.
+            Sent to the server as ``top_k``.
+        - search_type (str):
+            The Cognee search type. ``CHUNKS`` returns stored text chunks without
+            an LLM call; ``GRAPH_COMPLETION`` (the default) returns an answer
+            generated by the server. Override per query with ``search_type=...``.
+        - transport (CogneeTransport):
+            Pooled HTTP clients to send requests with. Retrievers for the same
+            ``api_url`` share one by default.
 
     Instantiate:
         .. code-block:: python
@@ -116,19 +127,53 @@ class CogneeRetriever(BaseRetriever):
 
     """
 
-    model_config = ConfigDict(extra="allow")
+    model_config = ConfigDict(extra="allow", arbitrary_types_allowed=True)
 
-    llm_api_key: Optional[str] = None
+    llm_api_key: str | None = None
     llm_provider: str = "openai"
     llm_model: str = "gpt-4o-mini"
     dataset_name: str = "default_dataset"
     k: int = 1
     api_url: str = Field(
-        default_factory=lambda: os.environ.get("COGNEE_API_URL", "http://localhost:8000")
+        default_factory=lambda: os.environ.get(
+            "COGNEE_API_URL", "http://localhost:8000"
+        )
     )  # Cognee API URL
+    transport: CogneeTransport | None = None
+    """Pooled HTTP clients; defaults to the shared transport of ``api_url``."""
+    event_hooks: Dict[str, List[Callable[..., Any]]] | None = None
+    """``httpx`` event hooks of the async clients, e.g. for request timing.
+
+    Setting hooks without a ``transport`` gives the retriever its own transport.
+    """
+    sync_event_hooks: Dict[str, List[Callable[..., Any]]] | None = None
+    """``httpx`` event hooks of the sync client."""
+    upload_batch_files: int = 64
+    """Maximum documents per ``/api/v1/add`` request."""
+    upload_batch_bytes: int = 4_000_000
+    """Maximum bytes of text per ``/api/v1/add`` request."""
+    upload_concurrency: int = 4
+    """Maximum ``/api/v1/add`` requests in flight in ``aadd_documents``."""
+    upload_max_retries: int = 3
+    """Retries of a batch after timeouts, connection errors and 408/429/5xx."""
+    search_type: str = "GRAPH_COMPLETION"
+    """Cognee search type, e.g. ``CHUNKS``, ``SUMMARIES``, ``INSIGHTS`` or
+    ``GRAPH_COMPLETION``. Only ``GRAPH_COMPLETION`` runs an LLM on the server."""
+    datasets: List[str] | None = None
+    """Datasets to search; defaults to ``dataset_name``."""
+    search_cache: SearchCache | None = None
+    """Cache of search results; defaults to the shared cache of ``api_url``.
+
+    See ``langchain_cognee.cache``. Set ``cache_searches=False`` to disable it.
+    """
+    cache_searches: bool = True
+    cognify_debounce_seconds: float = 5.0
+    """Quiet period before a scheduled cognify run starts; see ``schedule_process_data``."""
+
+    _owns_transport: bool = PrivateAttr(default=False)
 
     @model_validator(mode="after")
-    def configure_cognee(self):
+    def configure_cognee(self) -> "CogneeRetriever":
         """Run after the object is constructed to set cognee config."""
         # If no key is provided, try environment variable fallback:
         if not self.llm_api_key:
@@ -139,14 +184,39 @@ class CogneeRetriever(BaseRetriever):
                 )
             self.llm_api_key = env_key
 
+        if self.transport is None:
+            if self.event_hooks or self.sync_event_hooks:
+                self.transport = CogneeTransport(
+                    self.api_url,
+                    event_hooks=self.event_hooks,
+                    sync_event_hooks=self.sync_event_hooks,
+                )
+                self._owns_transport = True
+            else:
+                self.transport = shared_transport(self.api_url)
+        if self.search_cache is None and self.cache_searches:
+            self.search_cache = search_cache_for(self.api_url)
         return self
 
-    def _lazy_init_cognee(self):
-        """Lazy init - returns client for HTTP API calls."""
-        if not hasattr(self, "_http_client"):
-            # Increase timeout for cognify operations which can take longer
-            self._http_client = httpx.AsyncClient(base_url=self.api_url, timeout=120.0)
-        return self._http_client
+    def _changed(self, dataset: str | None) -> None:
+        """Invalidate cached searches of ``dataset``, or of all if ``None``."""
+        if self.search_cache is not None:
+            self.search_cache.bump(dataset)
+
+    @property
+    def _http(self) -> CogneeTransport:
+        assert self.transport is not None
+        return self.transport
+
+    def close(self) -> None:
+        """Release the connections of a transport this retriever created."""
+        if self._owns_transport:
+            self._http.close()
+
+    async def aclose(self) -> None:
+        """Async version of ``close``."""
+        if self._owns_transport:
+            await self._http.aclose()
 
     def prune(self) -> None:
         """Prune (remove) data from the cognee dataset.
@@ -154,81 +224,156 @@ class CogneeRetriever(BaseRetriever):
         Call this before adding documents if you want to ensure a clean state.
         Otherwise, you can skip this step to retain existing data in cognee.
         """
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self._prune_async())
+        self._http.request("prune", "POST", "/api/v1/prune")
+        self._changed(None)
 
     async def _prune_async(self) -> None:
         """Async helper to prune a dataset in cognee via HTTP API."""
-        client = self._lazy_init_cognee()
-        # Call the Cognee API prune endpoint
-        response = await client.post("/api/v1/prune")
-        response.raise_for_status()
+        await self._http.arequest("prune", "POST", "/api/v1/prune")
+        self._changed(None)
 
     def add_documents(self, docs: List[Document]) -> None:
         """Add LangChain Documents to the cognee dataset.
 
         Typically, you'd do this once before calling `process_data()` to build the knowledge graph.
+        Documents are uploaded in batches of at most ``upload_batch_files`` files and
+        ``upload_batch_bytes`` bytes, one batch at a time.
         """
-        # Convert each Document to text
-        texts = [doc.page_content for doc in docs]
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self._add_documents_async(texts))
+        for batch in self._upload_batches(docs):
+            self._http.request(
+                "add",
+                "POST",
+                "/api/v1/add",
+                retries=self.upload_max_retries,
+                **self._add_request(batch),
+            )
+        self._changed(self.dataset_name)
 
     async def aadd_documents(self, docs: List[Document]) -> None:
         """Async version: Add LangChain Documents to the cognee dataset.
 
         Typically, you'd do this once before calling `process_data()` to build the knowledge graph.
+        Up to ``upload_concurrency`` batches are uploaded at once; a batch that
+        still fails after ``upload_max_retries`` retries fails the call.
         """
-        # Convert each Document to text
-        texts = [doc.page_content for doc in docs]
-        await self._add_documents_async(texts)
-
-    async def _add_documents_async(self, texts: List[str]) -> None:
+        slots = asyncio.Semaphore(max(1, self.upload_concurrency))
+        failure: List[Exception] = []
+
+        async def upload(batch: List[Tuple[str, bytes]]) -> None:
+            try:
+                await self._add_documents_async(batch)
+            except Exception as e:
+                failure.append(e)
+            finally:
+                slots.release()
+
+        tasks: List[asyncio.Task[None]] = []
+        try:
+            # Batches are built only as upload slots free up, so at most
+            # ``upload_concurrency`` of them are held in memory.
+            for batch in self._upload_batches(docs):
+                await slots.acquire()
+                if failure:
+                    slots.release()
+                    break
+                tasks.append(asyncio.create_task(upload(batch)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Even a failed call may have added some batches.
+            self._changed(self.dataset_name)
+        if failure:
+            raise failure[0]
+
+    def _upload_batches(
+        self, docs: Iterable[Document]
+    ) -> Iterator[List[Tuple[str, bytes]]]:
+        """Yield ``(filename, content)`` batches, skipping repeated content.
+
+        Files are named by the SHA-256 of their content, so uploading the same
+        text again does not create a new file in the dataset.
+        """
+        seen = set()
+        batch: List[Tuple[str, bytes]] = []
+        size = 0
+        for doc in docs:
+            data = doc.page_content.encode()
+            digest = hashlib.sha256(data).hexdigest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            if batch and (
+                len(batch) >= self.upload_batch_files
+                or size + len(data) > self.upload_batch_bytes
+            ):
+                yield batch
+                batch, size = [], 0
+            batch.append((f"{digest[:32]}.txt", data))
+            size += len(data)
+        if batch:
+            yield batch
+
+    def _add_request(self, batch: List[Tuple[str, bytes]]) -> Dict[str, Any]:
+        """Build the multipart/form-data body of an add request."""
+        files = [("data", (name, data, "text/plain")) for name, data in batch]
+        return {"files": files, "data": {"datasetName": self.dataset_name}}
+
+    async def _add_documents_async(self, batch: List[Tuple[str, bytes]]) -> None:
         """Async helper to call cognee add via HTTP API."""
-        client = self._lazy_init_cognee()
-
-        # Prepare files for multipart/form-data upload
-        # Each text will be sent as a separate file with unique filename
-        files = []
-        for i, text in enumerate(texts):
-            # Create unique filename using content hash and timestamp to avoid duplicates
-            content_hash = hashlib.md5(text.encode()).hexdigest()[:8]
-            timestamp = int(time.time() * 1000)
-            unique_filename = f"document_{timestamp}_{content_hash}_{i}.txt"
-
-            # Create in-memory file-like objects
-            files.append(("data", (unique_filename, text, "text/plain")))
-
-        # Add dataset name as form data
-        data = {"datasetName": self.dataset_name}
-
-        # Call the Cognee API add endpoint with multipart/form-data
-        response = await client.post("/api/v1/add", files=files, data=data)
-        response.raise_for_status()
+        await self._http.arequest(
+            "add",
+            "POST",
+            "/api/v1/add",
+            retries=self.upload_max_retries,
+            **self._add_request(batch),
+        )
 
     def process_data(self) -> None:
         """Process ingested data into a knowledge graph (aka 'cognify')."""
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self._process_data_async())
+        payload = {"datasets": [self.dataset_name]}
+        self._http.request("cognify", "POST", "/api/v1/cognify", json=payload)
+        self._changed(self.dataset_name)
 
     async def _process_data_async(self) -> None:
         """Async helper to 'cognify' a dataset in cognee via HTTP API."""
-        client = self._lazy_init_cognee()
-        # Call the Cognee API cognify endpoint
         payload = {"datasets": [self.dataset_name]}
-        response = await client.post("/api/v1/cognify", json=payload)
-        response.raise_for_status()
+        await self._http.arequest("cognify", "POST", "/api/v1/cognify", json=payload)
+        self._changed(self.dataset_name)
+
+    def schedule_process_data(self) -> CognifyJob:
+        """Cognify the dataset in the background and return immediately.
+
+        Requests for the same dataset within ``cognify_debounce_seconds`` of
+        each other are coalesced into one run. See
+        ``langchain_cognee.scheduler``.
+        """
+        return self._scheduler.request(self.dataset_name)
+
+    def cognify_status(self) -> CognifyJob | None:
+        """Return the latest scheduled cognify job of the dataset, if any."""
+        return self._scheduler.status(self.dataset_name)
+
+    @property
+    def _scheduler(self) -> CognifyScheduler:
+        scheduler = scheduler_for(self._http, debounce=self.cognify_debounce_seconds)
+        if self.search_cache is not None:
+            scheduler.add_listener(self.search_cache.bump)
+        return scheduler
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
     ) -> List[Document]:
-        k = kwargs.get("k", self.k)
-        loop = asyncio.get_event_loop()
-        results = loop.run_until_complete(self._search_cognee(query))
-
-        # Convert cognee results to LangChain Documents
-        docs = [Document(page_content=str(r)) for r in results]
-        return docs[:k]
+        payload = self._search_payload(query, **kwargs)
+        key = self._cache_key(payload)
+        cached = self.search_cache.get(key) if self.search_cache and key else None
+        if cached is not None:
+            return cached
+        response = self._http.request("search", "POST", "/api/v1/search", json=payload)
+        docs = self._to_documents(response.json(), payload)
+        if self.search_cache is not None and key:
+            self.search_cache.put(key, payload["datasets"], docs)
+        return docs
 
     async def _aget_relevant_documents(
         self,
@@ -237,24 +382,107 @@ class CogneeRetriever(BaseRetriever):
         run_manager: AsyncCallbackManagerForRetrieverRun,
         **kwargs: Any,
     ) -> List[Document]:
-        k = kwargs.get("k", self.k)
-        results = await self._search_cognee(query)
+        payload = self._search_payload(query, **kwargs)
+        key = self._cache_key(payload)
+        cached = self.search_cache.get(key) if self.search_cache and key else None
+        if cached is not None:
+            return cached
+        docs = self._to_documents(await self._search_cognee(payload), payload)
+        if self.search_cache is not None and key:
+            self.search_cache.put(key, payload["datasets"], docs)
+        return docs
+
+    def _cache_key(self, payload: Dict[str, Any]) -> str | None:
+        if self.search_cache is None:
+            return None
+        return self.search_cache.key(
+            payload["datasets"],
+            payload["search_type"],
+            payload["query"],
+            payload["top_k"],
+        )
+
+    def _search_payload(self, query: str, **kwargs: Any) -> Dict[str, Any]:
+        """Build a search request; ``kwargs`` override ``k``, ``search_type`` and ``datasets``."""
+        return {
+            "query": query,
+            "search_type": kwargs.get("search_type", self.search_type),
+            "top_k": kwargs.get("k", self.k),
+            "datasets": kwargs.get("datasets", self.datasets or [self.dataset_name]),
+        }
+
+    async def _search_cognee(self, payload: Dict[str, Any]) -> Any:
+        """Async helper to call cognee search via HTTP API."""
+        response = await self._http.arequest(
+            "search", "POST", "/api/v1/search", json=payload
+        )
+        return response.json()
 
-        return [Document(page_content=str(r)) for r in results][:k]
+    @staticmethod
+    def _to_documents(data: Any, payload: Dict[str, Any]) -> List[Document]:
+        """Map a search response to at most ``top_k`` Documents."""
+        search_type = payload["search_type"]
+        docs: List[Document] = []
+        for item, dataset in _flatten_results(data):
+            doc = _to_document(item)
+            doc.metadata["search_type"] = search_type
+            if dataset is not None:
+                doc.metadata.setdefault("dataset_name", dataset)
+            docs.append(doc)
+        return docs[: payload["top_k"]]
 
-    async def _search_cognee(self, query: str) -> List[str]:
-        """Async helper to call cognee search via HTTP API."""
-        client = self._lazy_init_cognee()
-        # Call the Cognee API search endpoint
-        payload = {"query": query, "search_type": "GRAPH_COMPLETION"}
-        response = await client.post("/api/v1/search", json=payload)
-        response.raise_for_status()
-        data = response.json()
-
-        # Extract results from response
-        if isinstance(data, list):
-            return [str(item) for item in data]
-        elif isinstance(data, dict) and "results" in data:
-            return [str(item) for item in data["results"]]
+
+_TEXT_KEYS = ("text", "content", "summary", "description", "name")
+
+
+def _flatten_results(data: Any) -> Iterator[Tuple[Any, str | None]]:
+    """Yield ``(result, dataset name)`` from the shapes ``/api/v1/search`` returns.
+
+    The response is a list of results, a ``{"results": [...]}`` object, or a
+    list of per-dataset ``{"dataset_name": ..., "search_result": [...]}`` groups.
+    """
+    if isinstance(data, dict) and "results" in data:
+        data = data["results"]
+    if not isinstance(data, list):
+        data = [data]
+    for item in data:
+        if isinstance(item, dict) and "search_result" in item:
+            results = item["search_result"]
+            for result in results if isinstance(results, list) else [results]:
+                yield result, item.get("dataset_name")
         else:
-            return [str(data)]
+            yield item, None
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, dict):
+        for key in _TEXT_KEYS:
+            if isinstance(value.get(key), str):
+                return str(value[key])
+        if isinstance(value.get("relationship_name"), str):
+            return str(value["relationship_name"])
+        return json.dumps(value, sort_keys=True, default=str)
+    if isinstance(value, (list, tuple)):
+        return " ".join(_text(part) for part in value)
+    return str(value)
+
+
+def _to_document(item: Any) -> Document:
+    """Map one search result to a Document, keeping its id, score and fields."""
+    if not isinstance(item, dict):
+        # Completions are strings; insights are (node, edge, node) triples.
+        return Document(page_content=_text(item))
+    metadata = {
+        key: value
+        for key, value in item.items()
+        if key not in _TEXT_KEYS and isinstance(value, (str, int, float, bool))
+    }
+    score = item.get("score", item.get("relevance"))
+    if isinstance(score, (int, float)):
+        metadata["score"] = float(score)
+    id_ = item.get("id")
+    return Document(
+        id=str(id_) if id_ is not None else None,
+        page_content=_text(item),
+        metadata=metadata,
+    )
@@ -0,0 +1,250 @@
+"""Background, coalesced cognify jobs.
+
+``CogneeRetriever.process_data`` blocks until Cognee has built the knowledge
+graph, which takes minutes. A ``CognifyScheduler`` instead runs cognify in the
+background on its own event loop thread:
+
+- ``request(dataset)`` returns immediately. The job waits ``debounce`` seconds
+  and every further request for the same dataset restarts that wait, so a
+  burst of uploads is processed by a single run.
+- A request that arrives while a run is in progress queues one more run for
+  when it finishes, since the running one may not see the new data.
+- Runs are submitted with ``run_in_background`` and polled on
+  ``/api/v1/datasets/status`` until Cognee reports them completed or errored.
+
+``status(dataset)`` reports the job as ``pending``, ``running``,
+``completed`` or ``failed``, and listeners added with ``add_listener`` are
+called with the name of each dataset whose run completes.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Literal
+
+from langchain_cognee.transport import CogneeTransport
+
+logger = logging.getLogger(__name__)
+
+JobState = Literal["pending", "running", "completed", "failed"]
+_STATES: tuple[JobState, ...] = ("pending", "running", "completed", "failed")
+
+
+@dataclass
+class CognifyJob:
+    """The latest cognify job of a dataset."""
+
+    dataset: str
+    state: JobState = "pending"
+    requests: int = 1
+    """Requests coalesced into this job."""
+    requested_at: float = dataclasses.field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+
+
+def _dataset_ids(data: Any) -> List[str]:
+    """Return the dataset ids of a ``/api/v1/cognify`` response, if any."""
+    runs = list(data.values()) if isinstance(data, dict) else data
+    if not isinstance(runs, list):
+        return []
+    return [
+        str(run["dataset_id"])
+        for run in runs
+        if isinstance(run, dict) and run.get("dataset_id")
+    ]
+
+
+class CognifyScheduler:
+    """Debounces, coalesces and polls cognify runs for one Cognee server.
+
+    Args:
+        transport: The transport of the Cognee server.
+        debounce: Seconds to wait for further requests before a run starts.
+        poll_interval: Seconds between status checks of a running job.
+        timeout: Seconds after which a run that has not finished is failed.
+    """
+
+    def __init__(
+        self,
+        transport: CogneeTransport,
+        *,
+        debounce: float = 5.0,
+        poll_interval: float = 5.0,
+        timeout: float = 3600.0,
+    ) -> None:
+        """Create the scheduler; its thread starts with the first request."""
+        self.transport = transport
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._jobs: Dict[str, CognifyJob] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._rerun: Dict[str, bool] = {}
+        self._condition = threading.Condition()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener(dataset)`` whenever a run completes; added once."""
+        with self._condition:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="cognify-scheduler", daemon=True
+            ).start()
+            self._loop = loop
+        return self._loop
+
+    def request(self, dataset: str) -> CognifyJob:
+        """Ask for ``dataset`` to be cognified and return its job.
+
+        Safe to call from any thread or event loop.
+        """
+        with self._condition:
+            loop = self._ensure_loop()
+            job = self._jobs.get(dataset)
+            self._deadlines[dataset] = time.monotonic() + self.debounce
+            if job is not None and job.state == "pending":
+                job.requests += 1
+            elif job is not None and job.state == "running":
+                job.requests += 1
+                self._rerun[dataset] = True
+            else:
+                job = self._jobs[dataset] = CognifyJob(dataset)
+                asyncio.run_coroutine_threadsafe(self._run(dataset), loop)
+            return dataclasses.replace(job)
+
+    def status(self, dataset: str) -> CognifyJob | None:
+        """Return a snapshot of the latest job of ``dataset``."""
+        with self._condition:
+            job = self._jobs.get(dataset)
+            return dataclasses.replace(job) if job is not None else None
+
+    def wait(self, dataset: str, timeout: float | None = None) -> CognifyJob | None:
+        """Block until the job of ``dataset`` has finished, and return it."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (
+                    dataset not in self._jobs
+                    or self._jobs[dataset].state in ("completed", "failed")
+                ),
+                timeout,
+            )
+        return self.status(dataset)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of datasets whose latest job is in each state."""
+        with self._condition:
+            counts: Dict[str, int] = {state: 0 for state in _STATES}
+            for job in self._jobs.values():
+                counts[job.state] += 1
+            return counts
+
+    def _update(self, dataset: str, **changes: Any) -> None:
+        with self._condition:
+            for name, value in changes.items():
+                setattr(self._jobs[dataset], name, value)
+            self._condition.notify_all()
+
+    async def _run(self, dataset: str) -> None:
+        while True:
+            await self._debounce(dataset)
+            self._update(dataset, state="running", started_at=time.time())
+            try:
+                await self._cognify(dataset)
+            except Exception as e:
+                logger.warning("Cognify of dataset %s failed: %s", dataset, e)
+                self._update(
+                    dataset, state="failed", finished_at=time.time(), error=str(e)
+                )
+            else:
+                logger.info("🧠 Cognified dataset %s", dataset)
+                self._update(dataset, state="completed", finished_at=time.time())
+                for listener in list(self._listeners):
+                    try:
+                        listener(dataset)
+                    except Exception:
+                        logger.warning(
+                            "Cognify listener %r failed for dataset %s",
+                            listener,
+                            dataset,
+                            exc_info=True,
+                        )
+            with self._condition:
+                if not self._rerun.pop(dataset, False):
+                    return
+                self._jobs[dataset] = CognifyJob(dataset)
+                self._deadlines[dataset] = time.monotonic() + self.debounce
+
+    async def _debounce(self, dataset: str) -> None:
+        while True:
+            with self._condition:
+                delay = self._deadlines[dataset] - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _cognify(self, dataset: str) -> None:
+        response = await self.transport.arequest(
+            "cognify",
+            "POST",
+            "/api/v1/cognify",
+            retries=2,
+            json={"datasets": [dataset], "run_in_background": True},
+        )
+        dataset_ids = _dataset_ids(response.json())
+        if not dataset_ids:
+            # Nothing to poll: the server ran cognify before responding.
+            return
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            response = await self.transport.arequest(
+                "status",
+                "GET",
+                "/api/v1/datasets/status",
+                retries=2,
+                params={"dataset": dataset_ids},
+            )
+            statuses = [str(status) for status in response.json().values()]
+            if any("ERRORED" in status for status in statuses):
+                raise RuntimeError(f"Cognee reported {statuses}")
+            if statuses and all("COMPLETED" in status for status in statuses):
+                return
+        raise TimeoutError(f"Cognify did not finish within {self.timeout:.0f}s")
+
+
+_schedulers: "weakref.WeakKeyDictionary[CogneeTransport, CognifyScheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(transport: CogneeTransport, **kwargs: Any) -> CognifyScheduler:
+    """Return the scheduler of ``transport``, creating it with ``kwargs``."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(transport)
+        if scheduler is None:
+            scheduler = _schedulers[transport] = CognifyScheduler(transport, **kwargs)
+        return scheduler
+
+
+def stats() -> Dict[str, int]:
+    """Return the job counts of every scheduler, summed."""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    totals: Dict[str, int] = {state: 0 for state in _STATES}
+    for scheduler in schedulers:
+        for state, count in scheduler.stats().items():
+            totals[state] += count
+    return totals
@@ -0,0 +1,257 @@
+"""Pooled HTTP transport for the Cognee API.
+
+A ``CogneeTransport`` owns one ``httpx.Client`` for synchronous calls and one
+``httpx.AsyncClient`` per running event loop, since an async client cannot be
+shared across loops. All of them share the same connection-pool limits and
+keep-alive settings, so retrievers for different datasets on the same server
+reuse connections instead of opening new ones per request.
+
+Each call names its operation (``add``, ``cognify``, ``search``, ...) and gets
+that operation's read timeout, so a slow ``cognify`` does not force a
+two-minute timeout on searches.
+
+Requests can be retried: timeouts, connection errors and 408/429/5xx responses
+are retried after an exponential, jittered backoff that honours
+``Retry-After``.
+
+Closing a transport releases its connections; it reopens them lazily if it is
+used again.
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Mapping
+
+import httpx
+
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "add": 300.0,
+    "cognify": 600.0,
+    "prune": 60.0,
+    "search": 30.0,
+    "status": 10.0,
+}
+"""Read timeout in seconds of each operation."""
+
+DEFAULT_TIMEOUT = 30.0
+"""Read timeout of operations missing from the timeout table."""
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether ``error`` is a timeout, connection error or transient status."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_delay(error: BaseException, attempt: int) -> float:
+    """Return the seconds to wait before retry number ``attempt`` (from 0)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(BACKOFF_MAX_SECONDS, float(retry_after))
+    delay: float = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2.0**attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class CogneeTransport:
+    """Shares pooled ``httpx`` clients between Cognee retrievers.
+
+    Args:
+        base_url: The Cognee API URL.
+        max_connections: Maximum open connections per client. Defaults to
+            ``COGNEE_MAX_CONNECTIONS``, or 20.
+        max_keepalive_connections: Idle connections kept open per client.
+            Defaults to ``COGNEE_MAX_KEEPALIVE``, or 10.
+        keepalive_expiry: Seconds an idle connection is kept open.
+        connect_timeout: Seconds to establish a connection.
+        http2: Whether to negotiate HTTP/2. Defaults to whether the ``h2``
+            package is installed.
+        timeouts: Read timeouts per operation, merged over ``DEFAULT_TIMEOUTS``.
+        event_hooks: ``httpx`` event hooks of the async clients.
+        sync_event_hooks: ``httpx`` event hooks of the sync client.
+        http_transport: An ``httpx`` transport to send requests through instead
+            of the connection pool, e.g. an ``httpx.MockTransport`` in tests.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        http2: bool | None = None,
+        timeouts: Mapping[str, float] | None = None,
+        event_hooks: Dict[str, List[Callable[..., Any]]] | None = None,
+        sync_event_hooks: Dict[str, List[Callable[..., Any]]] | None = None,
+        http_transport: Any | None = None,
+    ) -> None:
+        """Configure the transport; clients are created on first use."""
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _env_int("COGNEE_MAX_CONNECTIONS", 20),
+            max_keepalive_connections=max_keepalive_connections
+            or _env_int("COGNEE_MAX_KEEPALIVE", 10),
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.http2 = _http2_available() if http2 is None else http2
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._event_hooks = event_hooks
+        self._sync_event_hooks = sync_event_hooks
+        self._http_transport = http_transport
+        self._lock = threading.Lock()
+        self._client: httpx.Client | None = None
+        # One async client per event loop, dropped when the loop is collected.
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncClient
+        ] = weakref.WeakKeyDictionary()
+
+    def timeout(self, operation: str) -> httpx.Timeout:
+        """Return the timeout of ``operation``."""
+        return httpx.Timeout(
+            self.timeouts.get(operation, DEFAULT_TIMEOUT), connect=self.connect_timeout
+        )
+
+    def _options(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "limits": self.limits,
+            "http2": self.http2,
+            "timeout": DEFAULT_TIMEOUT,
+            "transport": self._http_transport,
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        """Return the shared sync client."""
+        with self._lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.Client(
+                    **self._options(), event_hooks=self._sync_event_hooks
+                )
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Return the async client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    **self._options(), event_hooks=self._event_hooks
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def request(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        *,
+        retries: int = 0,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request with the sync client and raise on HTTP errors.
+
+        Retryable errors are retried up to ``retries`` times. Request bodies
+        are rebuilt from ``kwargs`` on every attempt.
+        """
+        for attempt in range(retries + 1):
+            try:
+                response = self.client.request(
+                    method, path, timeout=self.timeout(operation), **kwargs
+                )
+                return response.raise_for_status()
+            except httpx.HTTPError as e:
+                if attempt >= retries or not is_retryable(e):
+                    raise
+                time.sleep(retry_delay(e, attempt))
+        raise AssertionError("unreachable")
+
+    async def arequest(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        *,
+        retries: int = 0,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request with the loop's async client and raise on HTTP errors.
+
+        Retryable errors are retried up to ``retries`` times.
+        """
+        for attempt in range(retries + 1):
+            try:
+                response = await self.async_client.request(
+                    method, path, timeout=self.timeout(operation), **kwargs
+                )
+                return response.raise_for_status()
+            except httpx.HTTPError as e:
+                if attempt >= retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(retry_delay(e, attempt))
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        """Close the sync client and the async clients of idle loops.
+
+        Async clients of running loops are closed on their loop.
+        """
+        with self._lock:
+            client, self._client = self._client, None
+            async_clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        if client is not None:
+            client.close()
+        for loop, async_client in async_clients:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(async_client.aclose(), loop)
+            else:
+                loop.run_until_complete(async_client.aclose())
+
+    async def aclose(self) -> None:
+        """Close all clients, awaiting the one of the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            current = self._async_clients.pop(loop, None)
+        if current is not None:
+            await current.aclose()
+        self.close()
+
+
+_shared: Dict[str, CogneeTransport] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_transport(base_url: str) -> CogneeTransport:
+    """Return the process-wide default transport for ``base_url``."""
+    with _shared_lock:
+        transport = _shared.get(base_url)
+        if transport is None:
+            transport = _shared[base_url] = CogneeTransport(base_url)
+        return transport
@@ -29,7 +29,7 @@ and individual component documentation within the retrieval_graph package.
 
 # Import logging config first to set up logging
 from retrieval_graph import logging_config  # noqa: F401
-from retrieval_graph.graph import graph
+from retrieval_graph.graph import graph, speculative_graph
 from retrieval_graph.index_graph import graph as index_graph
 
-__all__ = ["graph", "index_graph"]
+__all__ = ["graph", "index_graph", "speculative_graph"]
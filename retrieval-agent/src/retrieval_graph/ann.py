@@ -0,0 +1,185 @@
+"""Approximate nearest neighbour search for the local vector store.
+
+``IVFIndex`` is an inverted-file index: the (L2-normalised) vectors are
+clustered with spherical k-means, each row is assigned to its closest
+centroid, and a query only scores the rows of its ``nprobe`` closest clusters.
+``nprobe`` trades recall for latency and can be set per query through
+``search_kwargs``.
+
+The index only stores centroids and row assignments; the vectors themselves
+stay in the store's memory-mapped matrix. Both are persisted next to it:
+
+- ``ivf_centroids.npz``: the ``(nlist, dim)`` centroid matrix and the number
+  of rows it was trained on.
+- ``ivf_assign.i32``: one int32 cluster id per row, appended as rows arrive.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+CENTROIDS_FILE = "ivf_centroids.npz"
+ASSIGN_FILE = "ivf_assign.i32"
+
+
+def kmeans(
+    vectors: np.ndarray, nlist: int, *, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Cluster unit vectors with spherical k-means and return the centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty clusters on random points so every list stays useful.
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a memory-mapped matrix.
+
+    The index is trained lazily: until the store holds ``min_train_rows``
+    rows, searches fall back to an exact scan. Once trained, new rows are
+    assigned to the existing centroids on insert, and the index is retrained
+    when the store has grown ``retrain_factor`` times past the size it was
+    trained on.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        nlist: int | None = None,
+        nprobe: int = 8,
+        min_train_rows: int = 4096,
+        retrain_factor: float = 4.0,
+    ) -> None:
+        """Open the index files in ``path``, if present.
+
+        Args:
+            path: Directory of the owning store.
+            nlist: Number of clusters. Defaults to ``sqrt(rows)`` at training
+                time.
+            nprobe: Default number of clusters scanned per query.
+            min_train_rows: Row count below which no index is built.
+            retrain_factor: Growth factor that triggers a retrain.
+        """
+        self.path = Path(path)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.retrain_factor = retrain_factor
+        self.centroids: np.ndarray | None = None
+        self.trained_rows = 0
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: list[np.ndarray] | None = None
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        """Whether centroids are available."""
+        return self.centroids is not None
+
+    @property
+    def clusters(self) -> int:
+        """Return the number of trained clusters."""
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def _load(self) -> None:
+        centroids_path = self.path / CENTROIDS_FILE
+        if not centroids_path.exists():
+            return
+        with np.load(centroids_path) as data:
+            self.centroids = data["centroids"]
+            self.trained_rows = int(data["trained_rows"])
+        assign_path = self.path / ASSIGN_FILE
+        if assign_path.exists():
+            self._assign = np.fromfile(assign_path, dtype=np.int32)
+
+    def _lists_view(self) -> list[np.ndarray]:
+        if self._lists is None:
+            assert self.centroids is not None
+            order = np.argsort(self._assign, kind="stable")
+            bounds = np.searchsorted(
+                self._assign[order], np.arange(len(self.centroids) + 1)
+            )
+            self._lists = [
+                order[bounds[i] : bounds[i + 1]] for i in range(len(self.centroids))
+            ]
+        return self._lists
+
+    def train(self, matrix: np.ndarray) -> None:
+        """Cluster ``matrix`` and assign every row to a centroid."""
+        rows = len(matrix)
+        nlist = self.nlist or max(1, int(math.sqrt(rows)))
+        nlist = min(nlist, rows)
+        rng = np.random.default_rng(0)
+        sample_size = min(rows, nlist * 64)
+        sample = np.asarray(
+            matrix[np.sort(rng.choice(rows, sample_size, replace=False))]
+        )
+        self.centroids = kmeans(sample, nlist)
+        self._assign = self._nearest(matrix)
+        self.trained_rows = rows
+        tmp = self.path / f"{CENTROIDS_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, trained_rows=rows)
+        # Drop the old assignments before publishing the new centroids: after
+        # a crash in between, missing assignments are rebuilt on open, while
+        # assignments to other centroids would silently break searches.
+        (self.path / ASSIGN_FILE).unlink(missing_ok=True)
+        os.replace(tmp, self.path / CENTROIDS_FILE)
+        tmp = self.path / f"{ASSIGN_FILE}.tmp"
+        self._assign.tofile(tmp)
+        os.replace(tmp, self.path / ASSIGN_FILE)
+        self._lists = None
+
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        assert self.centroids is not None
+        out = np.empty(len(vectors), dtype=np.int32)
+        # Assign in blocks to bound the temporary (rows x nlist) score matrix.
+        for start in range(0, len(vectors), 8192):
+            block = np.asarray(vectors[start : start + 8192])
+            out[start : start + len(block)] = np.argmax(
+                block @ self.centroids.T, axis=1
+            )
+        return out
+
+    def update(self, matrix: np.ndarray) -> None:
+        """Bring the index up to date with ``matrix`` after rows were appended."""
+        rows = len(matrix)
+        if not self.trained:
+            if rows >= self.min_train_rows:
+                self.train(matrix)
+            return
+        if rows >= self.trained_rows * self.retrain_factor:
+            self.train(matrix)
+            return
+        start = len(self._assign)
+        if rows <= start:
+            return
+        new = self._nearest(matrix[start:rows])
+        with open(self.path / ASSIGN_FILE, "ab") as f:
+            f.truncate(start * 4)
+            f.write(new.tobytes())
+        self._assign = np.concatenate([self._assign, new])
+        self._lists = None
+
+    def candidates(self, query: np.ndarray, nprobe: int | None = None) -> np.ndarray:
+        """Return the rows in the ``nprobe`` clusters closest to ``query``."""
+        assert self.centroids is not None
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        lists = self._lists_view()
+        return np.concatenate([lists[i] for i in closest])
@@ -0,0 +1,192 @@
+"""Semantic cache for generated answers.
+
+Users of the same knowledge base ask the same handful of questions, and each
+one costs a full ``respond`` LLM call. ``AnswerCache`` remembers answers per
+``user_id`` and serves a cached answer when:
+
+- the search query embeds close enough to a previous one (cosine similarity at
+  or above a threshold), and
+- the retrieval step returned the same documents, compared by a fingerprint
+  of their ids, and
+- the response model and prompt are unchanged, and
+- the entry is younger than the TTL.
+
+Indexing documents for a user invalidates all of that user's entries, so an
+answer is never served from a knowledge base that has since changed. The cache
+is process-local: with several workers, each worker invalidates its own copy.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval_graph import tracing
+from retrieval_graph.fusion import doc_key
+from retrieval_graph.resources import fingerprint
+
+
+def docs_fingerprint(docs: Sequence[Document]) -> str:
+    """Return a digest of the ids of ``docs``, in rank order."""
+    return fingerprint(*(doc_key(doc) for doc in docs))
+
+
+@dataclass
+class _Entry:
+    user_id: str
+    scope: str
+    vector: np.ndarray
+    answer: str
+    created: float
+
+
+class AnswerCache:
+    """A size- and age-bounded per-user answer cache.
+
+    Entries are grouped by ``(user_id, scope)``, where the scope fingerprints
+    the retrieved documents and the response settings, so a lookup only
+    compares the query vector against a handful of candidates.
+
+    Examples:
+        >>> cache = AnswerCache(max_entries=10, ttl=60)
+        >>> gen = cache.generation("u1")
+        >>> cache.put("u1", "scope", [1.0, 0.0], "42", generation=gen)
+        >>> cache.get("u1", "scope", [0.99, 0.05], threshold=0.95)
+        '42'
+        >>> cache.invalidate("u1")
+        >>> cache.get("u1", "scope", [1.0, 0.0], threshold=0.95) is None
+        True
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: Total number of answers kept across all users. Zero
+                disables the cache.
+            ttl: Age in seconds after which an answer is no longer served.
+                Zero disables expiry.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._groups: dict[tuple[str, str], list[int]] = {}
+        self._generations: dict[str, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        group = self._groups[(entry.user_id, entry.scope)]
+        group.remove(entry_id)
+        if not group:
+            del self._groups[(entry.user_id, entry.scope)]
+
+    @staticmethod
+    def _normalize(vector: Sequence[float] | np.ndarray) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+    def generation(self, user_id: str) -> int:
+        """Return the invalidation counter of ``user_id``.
+
+        Pass it back to ``put`` so an answer computed while the user's
+        documents were being re-indexed is not stored.
+        """
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(
+        self,
+        user_id: str,
+        scope: str,
+        vector: Sequence[float] | np.ndarray,
+        *,
+        threshold: float,
+    ) -> str | None:
+        """Return the best cached answer at or above ``threshold``, if any."""
+        if not self.max_entries:
+            return None
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_sim = None, threshold
+            for entry_id in list(self._groups.get((user_id, scope), ())):
+                entry = self._entries[entry_id]
+                if self.ttl and now - entry.created > self.ttl:
+                    self._drop(entry_id)
+                    self.evictions += 1
+                    continue
+                sim = float(entry.vector @ query)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].answer
+
+    def put(
+        self,
+        user_id: str,
+        scope: str,
+        vector: Sequence[float] | np.ndarray,
+        answer: str,
+        *,
+        generation: int,
+    ) -> None:
+        """Store ``answer`` unless ``user_id`` was invalidated since ``generation``."""
+        if not self.max_entries:
+            return
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(
+                user_id, scope, self._normalize(vector), answer, time.monotonic()
+            )
+            self._groups.setdefault((user_id, scope), []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop every answer cached for ``user_id``."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            stale = [i for i, e in self._entries.items() if e.user_id == user_id]
+            for entry_id in stale:
+                self._drop(entry_id)
+            self.invalidations += 1
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss/eviction counters and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+cache = AnswerCache(
+    max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600")),
+)
+"""The process-wide answer cache shared by the retrieval and index graphs."""
+
+tracing.register_collector("answer_cache", cache.stats)
@@ -0,0 +1,164 @@
+"""Out-of-band document payloads for the index graph.
+
+Passing full document text through ``IndexState.docs`` serializes it into
+every checkpoint and into the run's JSON body. Instead, ``docs`` may hold
+references that ``index_docs`` reads one at a time while indexing:
+
+- ``{"blob": "<sha256>"}``: a payload in the local content-addressed
+  ``BlobStore`` at ``BLOB_STORE_PATH`` (default ``.blobs/``). Upload payloads
+  with ``POST /blobs`` (``retrieval_graph.webapp``) or ``BlobStore.put``.
+- ``{"path": "<relative path>"}``: a UTF-8 file under ``INDEX_FILE_ROOT``.
+  File references are rejected when that variable is unset, and paths
+  that resolve outside it are refused.
+
+Both forms accept optional ``id`` and ``metadata`` keys. Without an ``id``,
+a reference is identified by its blob key or path, so re-indexing it
+updates the same source.
+"""
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from langchain_core.documents import Document
+
+_READ_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class DocumentRef:
+    """A document whose text is stored outside the graph state."""
+
+    blob: str | None = None
+    """SHA-256 key of the payload in the blob store."""
+    path: str | None = None
+    """Path of the payload relative to ``INDEX_FILE_ROOT``."""
+    id: str | None = None
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        """Check that exactly one of ``blob`` and ``path`` is set."""
+        if (self.blob is None) == (self.path is None):
+            raise ValueError("A document reference needs exactly one of blob or path.")
+
+    @property
+    def key(self) -> str:
+        """Return the source key used by the index manifest."""
+        return self.id or (f"blob:{self.blob}" if self.blob else f"file:{self.path}")
+
+    def digest(self) -> str:
+        """Return the SHA-256 of the payload, reading files in blocks."""
+        if self.blob is not None:
+            return self.blob
+        digest = hashlib.sha256()
+        with open(resolve_file(self.path or ""), "rb") as f:
+            while block := f.read(_READ_SIZE):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load(self) -> Document:
+        """Read the payload into a ``Document``."""
+        if self.blob is not None:
+            data = blob_store().read(self.blob)
+            metadata = self.metadata
+        else:
+            data = resolve_file(self.path or "").read_bytes()
+            metadata = {"source": self.path, **self.metadata}
+        return Document(
+            id=self.key,
+            page_content=data.decode("utf-8", errors="replace"),
+            metadata=metadata,
+        )
+
+
+class BlobWriter:
+    """Streams a payload into the store; the key is known once committed."""
+
+    def __init__(self, store: "BlobStore") -> None:
+        """Open a temporary file in ``store``."""
+        self._store = store
+        self._digest = hashlib.sha256()
+        fd, self._tmp = tempfile.mkstemp(dir=store.root, prefix=".upload-")
+        self._file: BinaryIO = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        """Append ``data`` to the payload."""
+        self._digest.update(data)
+        self._file.write(data)
+
+    def commit(self) -> str:
+        """Move the payload into place and return its key."""
+        self._file.close()
+        key = self._digest.hexdigest()
+        target = self._store.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._tmp, target)
+        return key
+
+    def abort(self) -> None:
+        """Discard the payload."""
+        self._file.close()
+        Path(self._tmp).unlink(missing_ok=True)
+
+
+class BlobStore:
+    """A directory of payloads named by the SHA-256 of their content."""
+
+    def __init__(self, root: str | Path) -> None:
+        """Use (and create) the directory ``root``."""
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        """Return the file of ``key``, fanned out by its first two characters."""
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return self.root / key[:2] / key[2:]
+
+    def writer(self) -> BlobWriter:
+        """Return a writer for a new payload."""
+        return BlobWriter(self)
+
+    def put(self, data: bytes | str) -> str:
+        """Store ``data`` and return its key."""
+        writer = self.writer()
+        try:
+            writer.write(data.encode() if isinstance(data, str) else data)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def read(self, key: str) -> bytes:
+        """Return the payload stored under ``key``."""
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            raise KeyError(f"Unknown blob: {key}") from None
+
+
+_store: BlobStore | None = None
+
+
+def blob_store() -> BlobStore:
+    """Return the process-wide blob store at ``BLOB_STORE_PATH``."""
+    global _store
+    root = Path(os.environ.get("BLOB_STORE_PATH", ".blobs"))
+    if _store is None or _store.root != root:
+        _store = BlobStore(root)
+    return _store
+
+
+def resolve_file(path: str) -> Path:
+    """Return ``path`` resolved under ``INDEX_FILE_ROOT``, refusing escapes."""
+    root = os.environ.get("INDEX_FILE_ROOT")
+    if not root:
+        raise ValueError("File references require INDEX_FILE_ROOT to be set.")
+    base = Path(root).resolve()
+    resolved = (base / path).resolve()
+    if not resolved.is_relative_to(base):
+        raise ValueError(f"File reference outside INDEX_FILE_ROOT: {path}")
+    return resolved
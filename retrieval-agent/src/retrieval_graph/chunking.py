@@ -0,0 +1,265 @@
+"""Token-aware chunking of documents before indexing.
+
+Whole documents make poor retrieval units: a long document is one embedding
+input, which the model truncates or rejects, and a match anywhere in it ranks
+the whole text. ``iter_chunks`` splits documents into chunks of at most
+``chunk_tokens`` tokens, preferring to break at section headings, then
+paragraphs, lines, sentences and finally words, with ``overlap_tokens`` of
+context repeated between consecutive chunks.
+
+Chunks are produced lazily, one document at a time, so the caller can embed
+and upsert the first batch while the rest is still being split. Large
+batches are split in a process pool (``CHUNKING_PROCESSES`` workers, at most
+four by default, used once a batch holds at least
+``CHUNKING_PARALLEL_MIN_CHARS`` characters). The pool starts on first use and
+is shut down at interpreter exit.
+
+Each chunk carries the metadata of its document plus:
+
+- ``parent_id``: the id of the document it was cut from;
+- ``chunk_index``: its position within that document;
+- ``start_index`` and ``end_index``: its character offsets in the document.
+"""
+
+import atexit
+import functools
+import itertools
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Literal
+
+from langchain_core.documents import Document
+
+from retrieval_graph.context import estimate_tokens
+from retrieval_graph.fusion import doc_key
+
+Tokenizer = Literal["chars", "tiktoken"]
+
+SEPARATORS = ("\n## ", "\n### ", "\n\n", "\n", ". ", " ")
+"""Split points, from the most to the least preferred."""
+
+PROCESSES = int(os.environ.get("CHUNKING_PROCESSES", "0")) or min(
+    4, os.cpu_count() or 1
+)
+PARALLEL_MIN_CHARS = int(os.environ.get("CHUNKING_PARALLEL_MIN_CHARS", "2000000"))
+
+Span = tuple[int, int]
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+
+
+@functools.cache
+def token_counter(tokenizer: Tokenizer) -> Callable[[str], int]:
+    """Return a function that counts the tokens of a string.
+
+    ``chars`` estimates four characters per token, like ``context``;
+    ``tiktoken`` counts ``cl100k_base`` tokens exactly and needs the
+    ``tiktoken`` package.
+    """
+    if tokenizer == "chars":
+        return estimate_tokens
+    if tokenizer == "tiktoken":
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError(
+                "The 'tiktoken' tokenizer requires the tiktoken package. "
+                "Install it with `pip install tiktoken`."
+            ) from e
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    raise ValueError(f"Unsupported tokenizer: {tokenizer}")
+
+
+def _pieces(
+    text: str,
+    start: int,
+    end: int,
+    max_tokens: int,
+    count: Callable[[str], int],
+    separators: tuple[str, ...] = SEPARATORS,
+) -> Iterator[tuple[Span, int]]:
+    """Yield ``((start, end), tokens)`` pieces of ``text[start:end]`` that fit."""
+    tokens = count(text[start:end])
+    if tokens <= max_tokens:
+        yield (start, end), tokens
+        return
+    for i, separator in enumerate(separators):
+        cuts = []
+        position = text.find(separator, start + 1, end)
+        while position != -1:
+            # Keep the separator with the piece it introduces ("\n## Title")
+            # or ends (". ").
+            cuts.append(
+                position if separator.startswith("\n") else position + len(separator)
+            )
+            position = text.find(separator, position + len(separator), end)
+        if not cuts:
+            continue
+        bounds = [start, *cuts, end]
+        for piece_start, piece_end in zip(bounds, bounds[1:]):
+            if piece_start < piece_end:
+                yield from _pieces(
+                    text, piece_start, piece_end, max_tokens, count, separators[i + 1 :]
+                )
+        return
+    # A single word longer than a chunk: cut it by characters.
+    step = max(1, (end - start) * max_tokens // tokens)
+    for piece_start in range(start, end, step):
+        piece_end = min(piece_start + step, end)
+        yield (piece_start, piece_end), count(text[piece_start:piece_end])
+
+
+def split_text(
+    text: str,
+    *,
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    tokenizer: Tokenizer = "chars",
+) -> list[Span]:
+    r"""Return the ``(start, end)`` character spans of the chunks of ``text``.
+
+    Examples:
+        >>> text = "One two three.\n\nFour five six."
+        >>> [text[s:e] for s, e in split_text(text, chunk_tokens=4)]
+        ['One two three.', 'Four five six.']
+    """
+    if not text:
+        return []
+    count = token_counter(tokenizer)
+    spans: list[Span] = []
+    window: list[tuple[Span, int]] = []
+    window_tokens = 0
+    for piece, tokens in _pieces(text, 0, len(text), chunk_tokens, count):
+        if window and window_tokens + tokens > chunk_tokens:
+            spans.append((window[0][0][0], window[-1][0][1]))
+            # Carry the tail of the chunk over as overlap.
+            while window and (
+                window_tokens > overlap_tokens or window_tokens + tokens > chunk_tokens
+            ):
+                window_tokens -= window.pop(0)[1]
+        window.append((piece, tokens))
+        window_tokens += tokens
+    spans.append((window[0][0][0], window[-1][0][1]))
+    trimmed = []
+    for start, end in spans:
+        chunk = text[start:end]
+        if stripped := chunk.strip():
+            start += len(chunk) - len(chunk.lstrip())
+            trimmed.append((start, start + len(stripped)))
+    return trimmed
+
+
+def _split_many(
+    texts: list[str], chunk_tokens: int, overlap_tokens: int, tokenizer: Tokenizer
+) -> list[list[Span]]:
+    return [
+        split_text(
+            text,
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=overlap_tokens,
+            tokenizer=tokenizer,
+        )
+        for text in texts
+    ]
+
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PROCESSES)
+            atexit.register(shutdown)
+        return _executor
+
+
+def shutdown() -> None:
+    """Stop the worker processes of the chunking pool, if it was started."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        atexit.unregister(shutdown)
+        executor.shutdown(cancel_futures=True)
+
+
+def _chunk(doc: Document, text: str, start: int, end: int, index: int) -> Document:
+    parent_id = doc_key(doc)
+    return Document(
+        id=f"{parent_id}:{index}",
+        page_content=text[start:end],
+        metadata={
+            **doc.metadata,
+            "parent_id": parent_id,
+            "chunk_index": index,
+            "start_index": start,
+            "end_index": end,
+        },
+    )
+
+
+def _windows(docs: Iterable[Document]) -> Iterator[list[Document]]:
+    """Group ``docs`` into runs of about ``PARALLEL_MIN_CHARS`` characters."""
+    window: list[Document] = []
+    chars = 0
+    for doc in docs:
+        window.append(doc)
+        chars += len(doc.page_content)
+        if chars >= PARALLEL_MIN_CHARS:
+            yield window
+            window, chars = [], 0
+    if window:
+        yield window
+
+
+def _spans(
+    docs: list[Document], chunk_tokens: int, overlap_tokens: int, tokenizer: Tokenizer
+) -> Iterable[list[Span]]:
+    texts = [doc.page_content for doc in docs]
+    if PROCESSES > 1 and len(docs) > 1 and sum(map(len, texts)) >= PARALLEL_MIN_CHARS:
+        size = max(1, len(texts) // (PROCESSES * 4))
+        batches = [texts[i : i + size] for i in range(0, len(texts), size)]
+        results = _get_executor().map(
+            _split_many,
+            batches,
+            itertools.repeat(chunk_tokens),
+            itertools.repeat(overlap_tokens),
+            itertools.repeat(tokenizer),
+        )
+        return itertools.chain.from_iterable(results)
+    return (
+        split_text(
+            text,
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=overlap_tokens,
+            tokenizer=tokenizer,
+        )
+        for text in texts
+    )
+
+
+def iter_chunks(
+    docs: Iterable[Document],
+    *,
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    tokenizer: Tokenizer = "chars",
+) -> Iterator[Document]:
+    """Lazily yield the chunks of ``docs``, in document order.
+
+    ``docs`` is consumed incrementally: with a process pool, in windows of
+    about ``PARALLEL_MIN_CHARS`` characters, otherwise one document at a time.
+    ``chunk_tokens=0`` disables chunking and yields the documents unchanged.
+    """
+    if chunk_tokens <= 0:
+        yield from docs
+        return
+    windows = _windows(docs) if PROCESSES > 1 else ([doc] for doc in docs)
+    for window in windows:
+        for doc, spans in zip(
+            window, _spans(window, chunk_tokens, overlap_tokens, tokenizer)
+        ):
+            for index, (start, end) in enumerate(spans):
+                yield _chunk(doc, doc.page_content, start, end, index)
@@ -4,12 +4,16 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass, field, fields
-from typing import Annotated, Any, Literal, Type, TypeVar
+from typing import Annotated, Any, Literal, Type, TypeVar, cast
 
 from langchain_core.runnables import RunnableConfig, ensure_config
 
 from retrieval_graph import prompts
 
+RetrieverProvider = Literal[
+    "elastic", "elastic-local", "pinecone", "mongodb", "cognee", "local"
+]
+
 
 def _get_model_with_provider(env_var: str, default: str) -> str:
     """Get model name with AI_PROVIDER prefix if not already specified.
@@ -63,12 +67,23 @@ class IndexConfiguration:
     )
 
     retriever_provider: Annotated[
-        Literal["elastic", "elastic-local", "pinecone", "mongodb", "cognee"],
+        RetrieverProvider,
         {"__template_metadata__": {"kind": "retriever"}},
     ] = field(
-        default_factory=lambda: os.getenv("RETRIEVER_PROVIDER", "cognee"),
+        default_factory=lambda: cast(
+            RetrieverProvider, os.getenv("RETRIEVER_PROVIDER", "cognee")
+        ),
+        metadata={
+            "description": "The vector store provider to use for retrieval. Options are 'elastic', 'pinecone', 'mongodb', 'cognee', or 'local'."
+        },
+    )
+
+    retrieval_mode: Literal["vector", "hybrid"] = field(
+        default_factory=lambda: cast(
+            Literal["vector", "hybrid"], os.getenv("RETRIEVAL_MODE", "vector")
+        ),
         metadata={
-            "description": "The vector store provider to use for retrieval. Options are 'elastic', 'pinecone', 'mongodb', or 'cognee'."
+            "description": "'vector' searches the retriever only. 'hybrid' also indexes documents into an in-process BM25 index and fuses both rankings with reciprocal rank fusion. Use the same value for the index and retrieval graphs."
         },
     )
 
@@ -86,6 +101,85 @@ class IndexConfiguration:
         },
     )
 
+    cognee_search_type: Literal[
+        "CHUNKS", "SUMMARIES", "INSIGHTS", "GRAPH_COMPLETION"
+    ] = field(
+        default="GRAPH_COMPLETION",
+        metadata={
+            "description": "Cognee search type. GRAPH_COMPLETION returns an answer the Cognee server generates; CHUNKS returns stored text without an LLM call on the server. The search_kwargs keys 'search_type' and 'datasets' override the search type and the datasets searched."
+        },
+    )
+
+    chunk_tokens: int = field(
+        default=512,
+        metadata={
+            "description": "Maximum size of an indexed chunk, in tokens. Documents are split at headings, paragraphs, lines, sentences or words to fit. Set to 0 to index whole documents."
+        },
+    )
+
+    chunk_overlap_tokens: int = field(
+        default=64,
+        metadata={
+            "description": "Tokens of context repeated between consecutive chunks of a document."
+        },
+    )
+
+    tokenizer: Literal["chars", "tiktoken"] = field(
+        default="chars",
+        metadata={
+            "description": "How chunk sizes are counted. 'chars' estimates four characters per token; 'tiktoken' counts cl100k_base tokens exactly."
+        },
+    )
+
+    index_batch_size: int = field(
+        default=128,
+        metadata={
+            "description": "Maximum number of chunks embedded and upserted per request when indexing. Lowered automatically after rate-limit or timeout errors."
+        },
+    )
+
+    index_batch_tokens: int = field(
+        default=50_000,
+        metadata={
+            "description": "Maximum number of tokens embedded and upserted per request when indexing, counted with `tokenizer`."
+        },
+    )
+
+    index_concurrency: int = field(
+        default=4,
+        metadata={
+            "description": "Maximum number of batches embedded and upserted concurrently when indexing."
+        },
+    )
+
+    index_max_retries: int = field(
+        default=5,
+        metadata={
+            "description": "Retries of a batch after rate-limit or timeout errors, with exponential backoff."
+        },
+    )
+
+    index_prune: bool = field(
+        default=False,
+        metadata={
+            "description": "Treat each upload as the complete document set: delete previously indexed sources that are missing from it. Use when syncing a directory."
+        },
+    )
+
+    cognee_cognify: Literal["background", "off"] = field(
+        default="background",
+        metadata={
+            "description": "With the cognee provider, schedule a debounced background cognify run of the dataset after each upload, or leave it to the caller."
+        },
+    )
+
+    index_step_docs: int = field(
+        default=256,
+        metadata={
+            "description": "Documents indexed and committed per graph step. A failed run resumed from its checkpoint continues after the last committed step."
+        },
+    )
+
     @classmethod
     def from_runnable_config(cls: Type[T], config: RunnableConfig | None = None) -> T:
         """Create an IndexConfiguration instance from a RunnableConfig object.
@@ -131,6 +225,48 @@ class Configuration(IndexConfiguration):
         },
     )
 
+    num_queries: int = field(
+        default=1,
+        metadata={
+            "description": "Number of search query variants to generate per turn. Values above 1 enable multi-query fan-out: the variants are searched concurrently and the results fused."
+        },
+    )
+
+    skip_simple_rewrites: bool = field(
+        default=True,
+        metadata={
+            "description": "Search self-contained follow-up messages as-is instead of asking the query model to rewrite them. Messages with pronouns or other references to earlier turns are still rewritten."
+        },
+    )
+
+    speculative_reuse_threshold: float = field(
+        default=0.9,
+        metadata={
+            "description": "Speculative graph only: minimum cosine similarity between the rewritten query and the raw user message for the speculatively retrieved documents to be reused."
+        },
+    )
+
+    context_token_budget: int = field(
+        default=4000,
+        metadata={
+            "description": "Approximate token budget for the retrieved documents placed in the response prompt. Near-duplicate documents are dropped and lower-ranked ones are left out once the budget is spent. 0 disables the budget."
+        },
+    )
+
+    use_answer_cache: bool = field(
+        default=False,
+        metadata={
+            "description": "Reuse a previously generated answer when a similar search query retrieves the same documents. The rest of the conversation is not compared, so only enable this for mostly single-turn use. Cached answers are dropped when documents are indexed for the user."
+        },
+    )
+
+    answer_cache_threshold: float = field(
+        default=0.95,
+        metadata={
+            "description": "Minimum cosine similarity between search query embeddings for a cached answer to be reused."
+        },
+    )
+
     query_model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = field(
         default_factory=lambda: _get_model_with_provider(
             "QUERY_MODEL", "anthropic/claude-3-haiku-20240307"
@@ -0,0 +1,229 @@
+"""Content-addressed cache for embedding vectors.
+
+Re-indexing the same documents or asking the same question twice should not
+pay for another embedding request. ``CachedEmbeddings`` wraps any LangChain
+``Embeddings`` implementation and keys vectors by model name, input kind
+(document or query) and the SHA-256 of the text.
+
+Two tiers are used:
+
+1. An in-memory LRU holding the most recently used vectors as float32
+   arrays, a quarter of the size of Python float lists.
+2. An optional SQLite file storing vectors as packed float32 blobs, which
+   survives restarts and can be shared between worker processes.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from retrieval_graph.tracing import span
+
+logger = logging.getLogger(__name__)
+
+Kind = Literal["doc", "query"]
+
+
+class _DiskTier:
+    """SQLite-backed vector store keyed by cache key."""
+
+    def __init__(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vec).tobytes()) for key, vec in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """An ``Embeddings`` wrapper that caches vectors by content hash.
+
+    Only texts that miss both tiers are sent to the underlying encoder, in a
+    single batched call with duplicates removed.
+
+    Examples:
+        >>> from langchain_core.embeddings import DeterministicFakeEmbedding
+        >>> emb = CachedEmbeddings(DeterministicFakeEmbedding(size=4), "fake/4")
+        >>> _ = emb.embed_documents(["a", "b", "a"])
+        >>> _ = emb.embed_documents(["a"])
+        >>> emb.stats()["hits"], emb.stats()["misses"]
+        (1, 2)
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        *,
+        max_entries: int = 10_000,
+        path: str | Path | None = None,
+    ) -> None:
+        """Wrap ``underlying``.
+
+        Args:
+            underlying: The encoder that computes vectors on a miss.
+            model: Fully specified model name; part of every cache key so
+                vectors from different models never mix.
+            max_entries: Capacity of the in-memory tier. Zero disables it.
+            path: SQLite file for the persistent tier. ``None`` disables it.
+        """
+        self.underlying = underlying
+        self.model = model
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, kind: Kind, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{self.model}:{kind}:{digest}"
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec.tolist()
+        remaining = [k for k in dict.fromkeys(keys) if k not in found]
+        if self._disk and remaining:
+            from_disk = self._disk.get_many(remaining)
+            counts = Counter(keys)
+            self.disk_hits += sum(counts[k] for k in from_disk)
+            self._remember(from_disk)
+            found.update(from_disk)
+        return found
+
+    def _remember(self, items: dict[str, list[float]]) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._memory[key] = np.asarray(vec, dtype=np.float32)
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, items: dict[str, list[float]]) -> None:
+        self._remember(items)
+        if self._disk and items:
+            self._disk.put_many(items)
+
+    def _plan(
+        self, kind: Kind, texts: list[str]
+    ) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        """Split ``texts`` into cached vectors and unique texts still to embed."""
+        keys = [self._key(kind, t) for t in texts]
+        found = self._lookup(keys)
+        todo: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                todo.setdefault(key, text)
+        self.hits += len(keys) - sum(1 for k in keys if k in todo)
+        self.misses += len(todo)
+        return keys, found, todo
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents, computing only the ones not already cached."""
+        keys, found, todo = self._plan("doc", texts)
+        if todo:
+            with span("embedding", model=self.model, kind="doc"):
+                vectors = self.underlying.embed_documents(list(todo.values()))
+            computed = dict(zip(todo, vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Asynchronously embed documents, computing only cache misses."""
+        keys, found, todo = await asyncio.to_thread(self._plan, "doc", texts)
+        if todo:
+            with span("embedding", model=self.model, kind="doc"):
+                vectors = await self.underlying.aembed_documents(list(todo.values()))
+            computed = dict(zip(todo, vectors))
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query, reusing a cached vector when available."""
+        keys, found, todo = self._plan("query", [text])
+        if todo:
+            with span("embedding", model=self.model, kind="query"):
+                vector = self.underlying.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Asynchronously embed a query, reusing a cached vector when available."""
+        keys, found, todo = await asyncio.to_thread(self._plan, "query", [text])
+        if todo:
+            with span("embedding", model=self.model, kind="query"):
+                vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self._store, {keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters.
+
+        ``hits`` includes ``disk_hits``; ``misses`` counts unique texts sent
+        to the underlying encoder.
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        """Release the SQLite connection, if any."""
+        if self._disk:
+            self._disk.close()
+            self._disk = None
@@ -0,0 +1,83 @@
+"""Combine ranked document lists from several searches.
+
+Functions:
+    doc_key: A stable identity for a document, used for de-duplication.
+    stable_id: The id under which a user's document is stored.
+    reciprocal_rank_fusion: Merge rankings with Reciprocal Rank Fusion (RRF).
+"""
+
+import hashlib
+import uuid
+from typing import Sequence
+
+from langchain_core.documents import Document
+
+NAMESPACE = uuid.UUID("6f1c0e9a-8a57-4c1e-9f3c-3f7e1c2b5d10")
+"""UUID namespace of stable document ids."""
+
+
+def doc_key(doc: Document) -> str:
+    """Return a stable identity for ``doc``.
+
+    Uses ``Document.id`` or the ``id`` metadata field when present, and falls
+    back to a hash of the page content so results from backends that do not
+    return ids can still be de-duplicated.
+
+    Examples:
+        >>> doc_key(Document(page_content="x", id="a"))
+        'a'
+        >>> doc_key(Document(page_content="x")) == doc_key(Document(page_content="x"))
+        True
+    """
+    if doc.id:
+        return str(doc.id)
+    if doc.metadata.get("id"):
+        return str(doc.metadata["id"])
+    return hashlib.sha256(doc.page_content.encode()).hexdigest()
+
+
+def stable_id(user_id: str, key: str) -> str:
+    """Return the id under which ``user_id``'s document ``key`` is stored.
+
+    Document keys fall back to a hash of the content, so the user is part of
+    the id: otherwise two users indexing the same text would overwrite each
+    other's rows.
+
+    Examples:
+        >>> stable_id("u1", "a.md") == stable_id("u1", "a.md")
+        True
+        >>> stable_id("u1", "a.md") == stable_id("u2", "a.md")
+        False
+    """
+    return str(uuid.uuid5(NAMESPACE, f"{user_id}\x00{key}"))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    *,
+    k: int = 60,
+    limit: int | None = None,
+) -> list[Document]:
+    """Merge several rankings into one using Reciprocal Rank Fusion.
+
+    Each document scores ``sum(1 / (k + rank))`` over the rankings it appears
+    in, so documents found by several searches rise to the top without having
+    to compare raw scores from different retrievers.
+
+    Args:
+        rankings: Ranked lists of documents, best first.
+        k: RRF smoothing constant; 60 is the value from the original paper.
+        limit: Maximum number of documents to return.
+
+    Returns:
+        list[Document]: De-duplicated documents, best first.
+    """
+    scores: dict[str, float] = {}
+    first_seen: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [first_seen[key] for key in ordered[:limit]]
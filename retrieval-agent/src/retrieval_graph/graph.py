@@ -6,24 +6,33 @@ and key functions for processing user inputs, generating queries, retrieving
 relevant documents, and formulating responses.
 """
 
+import asyncio
 import logging
-from datetime import datetime, timezone
-from typing import cast
+from typing import Any, cast
 
+import numpy as np
 from langchain_core.documents import Document
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
 from pydantic import BaseModel
 
-from retrieval_graph import retrieval
+from retrieval_graph import answer_cache, prompts, query_rewrite, retrieval
 from retrieval_graph.configuration import Configuration
+from retrieval_graph.context import pack_docs
+from retrieval_graph.fusion import reciprocal_rank_fusion
+from retrieval_graph.prompt_cache import coarse_time, record_usage, system_message
+from retrieval_graph.resources import fingerprint
 from retrieval_graph.state import InputState, State
-from retrieval_graph.utils import format_docs, get_message_text, load_chat_model
+from retrieval_graph.tracing import traced
+from retrieval_graph.utils import (
+    get_message_text,
+    load_chat_model,
+    load_structured_model,
+)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 # Define the function that calls the model
 
@@ -34,9 +43,28 @@ class SearchQuery(BaseModel):
     query: str
 
 
-async def generate_query(
-    state: State, *, config: RunnableConfig
-) -> dict[str, list[str]]:
+class SearchQueries(BaseModel):
+    """Search the indexed documents for several phrasings of a query."""
+
+    queries: list[str]
+
+
+def _unique_queries(queries: list[str], limit: int) -> list[str]:
+    """Return up to ``limit`` non-empty queries, dropping repeated phrasings.
+
+    Queries that differ only in case or whitespace count as repeats; each one
+    would cost a search without adding recall.
+    """
+    unique: dict[str, str] = {}
+    for query in queries:
+        key = " ".join(query.split()).casefold()
+        if key and key not in unique:
+            unique[key] = query.strip()
+    return list(unique.values())[:limit]
+
+
+@traced()
+async def generate_query(state: State, config: RunnableConfig) -> dict[str, list[str]]:
     """Generate a search query based on the current state and configuration.
 
     This function analyzes the messages in the state and generates an appropriate
@@ -52,52 +80,97 @@ async def generate_query(
 
     Behavior:
         - If there's only one message (first user input), it uses that as the query.
-        - For subsequent messages, it uses a language model to generate a refined query.
+        - Self-contained follow-ups are used as-is when ``skip_simple_rewrites`` is set.
+        - Rewrites are cached on the tail of the conversation and reused.
+        - For other subsequent messages, it uses a language model to generate a refined query.
+        - If ``num_queries`` is above 1, it always uses the language model and asks
+          for that many query variants in a single structured-output call.
         - The function uses the configuration to set up the prompt and model for query generation.
     """
     logger.debug("📝 generate_query called")
     messages = state.messages
-    logger.debug(f"💬 Number of messages: {len(messages)}")
-    if len(messages) == 1:
+    logger.debug("💬 Number of messages: %s", len(messages))
+    configuration = Configuration.from_runnable_config(config)
+    multi_query = configuration.num_queries > 1
+    human_input = get_message_text(messages[-1])
+    if len(messages) == 1 and not multi_query:
         # It's the first user question. We will use the input directly to search.
-        human_input = get_message_text(messages[-1])
-        return {"queries": [human_input]}
+        return {"queries": [human_input], "query_variants": [human_input]}
+    if (
+        configuration.skip_simple_rewrites
+        and not multi_query
+        and not query_rewrite.needs_rewrite(human_input, state.queries)
+    ):
+        # A self-contained follow-up: search it directly, no LLM call needed.
+        query_rewrite.record("skipped")
+        return {"queries": [human_input], "query_variants": [human_input]}
+    cache_key = query_rewrite.cache.key(
+        messages,
+        configuration.query_model,
+        configuration.query_system_prompt,
+        configuration.num_queries,
+    )
+    if (cached := query_rewrite.cache.get(cache_key)) is not None:
+        query_rewrite.record("cache_hits")
+        return {"queries": cached, "query_variants": cached}
     else:
-        configuration = Configuration.from_runnable_config(config)
+        # Static instructions first, so providers can cache the prompt prefix.
         # Feel free to customize the prompt, model, and other logic!
         prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", configuration.query_system_prompt),
+                system_message(
+                    configuration.query_system_prompt,
+                    {
+                        "queries": "\n- ".join(state.queries),
+                        "num_queries": configuration.num_queries,
+                        "system_time": coarse_time(),
+                    },
+                    model=configuration.query_model,
+                    suffix=prompts.MULTI_QUERY_PROMPT if multi_query else "",
+                ),
                 ("placeholder", "{messages}"),
             ]
         )
-        model = load_chat_model(configuration.query_model).with_structured_output(
-            SearchQuery
+        model = load_structured_model(
+            configuration.query_model,
+            SearchQueries if multi_query else SearchQuery,
+            include_raw=True,
         )
 
-        message_value = await prompt.ainvoke(
-            {
-                "messages": state.messages,
-                "queries": "\n- ".join(state.queries),
-                "system_time": datetime.now(tz=timezone.utc).isoformat(),
-            },
-            config,
-        )
-        generated = cast(SearchQuery, await model.ainvoke(message_value, config))
+        message_value = await prompt.ainvoke({"messages": state.messages}, config)
+        output = await model.ainvoke(message_value, config)
+        record_usage("generate_query", output["raw"])
+        if output["parsing_error"] is not None:
+            raise output["parsing_error"]
+        generated = output["parsed"]
+        if multi_query:
+            variants = _unique_queries(
+                cast(SearchQueries, generated).queries, configuration.num_queries
+            )
+            if not variants:
+                variants = [human_input]
+        else:
+            variants = [cast(SearchQuery, generated).query]
+        query_rewrite.record("rewritten")
+        query_rewrite.cache.put(cache_key, variants)
         return {
-            "queries": [generated.query],
+            "queries": variants,
+            "query_variants": variants,
         }
 
 
-async def retrieve(
-    state: State, *, config: RunnableConfig
-) -> dict[str, list[Document]]:
+@traced()
+async def retrieve(state: State, config: RunnableConfig) -> dict[str, list[Document]]:
     """Retrieve documents based on the latest query in the state.
 
     This function takes the current state and configuration, uses the latest query
     from the state to retrieve relevant documents using the retriever, and returns
     the retrieved documents.
 
+    When the query node produced several variants for this turn, they are searched
+    concurrently and the rankings are merged with reciprocal rank fusion, which
+    also removes duplicate documents.
+
     Args:
         state (State): The current state containing queries and the retriever.
         config (RunnableConfig | None, optional): Configuration for the retrieval process.
@@ -107,60 +180,172 @@ async def retrieve(
         containing a list of retrieved Document objects.
     """
     logger.debug("🔎 retrieve called")
-    logger.debug(f"🔍 Latest query: {state.queries[-1]}")
+    queries = state.query_variants or state.queries[-1:]
+    logger.debug("🔍 Queries: %s", queries)
 
     try:
-        with retrieval.make_retriever(config) as retriever:
-            logger.debug("✅ Retriever created successfully")
-            response = await retriever.ainvoke(state.queries[-1], config)
-            logger.debug(f"📚 Retrieved {len(response)} documents")
-            return {"retrieved_docs": response}
+        response = await _search_queries(queries, config)
+        logger.debug("📚 Retrieved %s documents", len(response))
+        return {"retrieved_docs": response}
     except Exception as e:
-        logger.error(f"❌ retrieve failed: {type(e).__name__}: {e}")
+        logger.error("❌ retrieve failed: %s: %s", type(e).__name__, e)
         raise
 
 
-async def respond(
-    state: State, *, config: RunnableConfig
-) -> dict[str, list[BaseMessage]]:
-    """Call the LLM powering our "agent"."""
+async def _search_queries(
+    queries: list[str],
+    config: RunnableConfig,
+    reuse: dict[str, list[Document]] | None = None,
+) -> list[Document]:
+    """Search every query concurrently and fuse the results.
+
+    Queries found in ``reuse`` are answered from it instead of searching again.
+    """
+    reuse = reuse or {}
+
+    async def search(query: str) -> list[Document]:
+        if query in reuse:
+            return reuse[query]
+        return await retrieval.asearch(config, query)
+
+    if len(queries) == 1:
+        return await search(queries[0])
+    configuration = Configuration.from_runnable_config(config)
+    rankings = await asyncio.gather(*(search(query) for query in queries))
+    return reciprocal_rank_fusion(
+        rankings, limit=configuration.search_kwargs.get("k", 4)
+    )
+
+
+@traced()
+async def speculative_retrieve(state: State, config: RunnableConfig) -> dict[str, Any]:
+    """Retrieve documents for the raw user message while the query is rewritten.
+
+    Runs in parallel with ``generate_query`` in the speculative graph. Its
+    results are reused by ``retrieve_with_speculation`` when the rewritten query
+    turns out to be close enough to the raw message.
+    """
+    query = get_message_text(state.messages[-1])
+    logger.debug("🏎️ speculative_retrieve for: %s", query)
+    docs = await retrieval.asearch(config, query)
+    return {"speculative_query": query, "speculative_docs": docs}
+
+
+@traced()
+async def retrieve_with_speculation(
+    state: State, config: RunnableConfig
+) -> dict[str, list[Document]]:
+    """Retrieve documents, reusing the speculative results where possible.
+
+    A rewritten query reuses the speculative documents if it equals the raw
+    user message or if the cosine similarity of their embeddings is at least
+    ``speculative_reuse_threshold``; otherwise it is searched as usual.
+    """
+    configuration = Configuration.from_runnable_config(config)
+    queries = state.query_variants or state.queries[-1:]
+    speculative_query = state.speculative_query
+    reusable = [q for q in queries if q.strip() == speculative_query.strip()]
+    remaining = [q for q in queries if q not in reusable]
+    if remaining and speculative_query:
+        encoder = retrieval.make_text_encoder(configuration.embedding_model)
+        vectors = np.asarray(
+            await asyncio.gather(
+                *(encoder.aembed_query(q) for q in [speculative_query, *remaining])
+            ),
+            dtype=np.float32,
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        similarity = vectors[1:] @ vectors[0]
+        reusable += [
+            q
+            for q, sim in zip(remaining, similarity)
+            if sim >= configuration.speculative_reuse_threshold
+        ]
+    logger.debug(
+        "♻️ Reusing speculative results for %s/%s queries", len(reusable), len(queries)
+    )
+    response = await _search_queries(
+        queries, config, reuse={q: state.speculative_docs for q in reusable}
+    )
+    return {"retrieved_docs": response}
+
+
+@traced()
+async def respond(state: State, config: RunnableConfig) -> dict[str, list[BaseMessage]]:
+    """Call the LLM powering our "agent".
+
+    When ``use_answer_cache`` is set, an answer generated earlier for a
+    similar search query over the same retrieved documents is returned
+    instead of calling the model.
+    """
     logger.debug("💭 respond called")
 
     try:
         configuration = Configuration.from_runnable_config(config)
+        cached = None
+        queries = state.query_variants or state.queries[-1:]
+        if configuration.use_answer_cache and queries:
+            encoder = retrieval.make_text_encoder(configuration.embedding_model)
+            query_vector = await encoder.aembed_query(" ".join(queries))
+            cache_scope = fingerprint(
+                answer_cache.docs_fingerprint(state.retrieved_docs),
+                configuration.response_model,
+                configuration.response_system_prompt,
+            )
+            generation = answer_cache.cache.generation(configuration.user_id)
+            cached = answer_cache.cache.get(
+                configuration.user_id,
+                cache_scope,
+                query_vector,
+                threshold=configuration.answer_cache_threshold,
+            )
+        if cached is not None:
+            logger.debug("⚡ Answer served from cache")
+            return {"messages": [AIMessage(content=cached)]}
+
         logger.debug("⚙️ Response configuration:")
-        logger.debug(f"  - response_model: {configuration.response_model}")
+        logger.debug("  - response_model: %s", configuration.response_model)
         logger.debug(
-            f"  - response_system_prompt length: {len(configuration.response_system_prompt)}"
+            "  - response_system_prompt length: %s",
+            len(configuration.response_system_prompt),
+        )
+
+        retrieved_docs = pack_docs(
+            state.retrieved_docs, token_budget=configuration.context_token_budget
         )
+        logger.debug("📄 Formatted docs length: %s", len(retrieved_docs))
 
+        # Static instructions first, so providers can cache the prompt prefix.
         # Feel free to customize the prompt, model, and other logic!
         prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", configuration.response_system_prompt),
+                system_message(
+                    configuration.response_system_prompt,
+                    {"retrieved_docs": retrieved_docs, "system_time": coarse_time()},
+                    model=configuration.response_model,
+                ),
                 ("placeholder", "{messages}"),
             ]
         )
         model = load_chat_model(configuration.response_model)
 
-        retrieved_docs = format_docs(state.retrieved_docs)
-        logger.debug(f"📄 Formatted docs length: {len(retrieved_docs)}")
-
-        message_value = await prompt.ainvoke(
-            {
-                "messages": state.messages,
-                "retrieved_docs": retrieved_docs,
-                "system_time": datetime.now(tz=timezone.utc).isoformat(),
-            },
-            config,
-        )
+        message_value = await prompt.ainvoke({"messages": state.messages}, config)
         logger.debug("📨 Invoking model...")
         response = await model.ainvoke(message_value, config)
         logger.debug("✅ Response generated successfully")
+        record_usage("respond", response)
+        if configuration.use_answer_cache and queries:
+            answer_cache.cache.put(
+                configuration.user_id,
+                cache_scope,
+                query_vector,
+                get_message_text(response),
+                generation=generation,
+            )
         # We return a list, because this will get added to the existing list
         return {"messages": [response]}
     except Exception as e:
-        logger.error(f"❌ respond failed: {type(e).__name__}: {e}")
+        logger.error("❌ respond failed: %s: %s", type(e).__name__, e)
         logger.error("❌ Error details:", exc_info=True)
         raise
 
@@ -170,9 +355,9 @@ async def respond(
 
 builder = StateGraph(State, input_schema=InputState, context_schema=Configuration)
 
-builder.add_node(generate_query)  # type: ignore[arg-type]
-builder.add_node(retrieve)  # type: ignore[arg-type]
-builder.add_node(respond)  # type: ignore[arg-type]
+builder.add_node(generate_query)
+builder.add_node(retrieve)
+builder.add_node(respond)
 builder.add_edge("__start__", "generate_query")
 builder.add_edge("generate_query", "retrieve")
 builder.add_edge("retrieve", "respond")
@@ -184,3 +369,23 @@ graph = builder.compile(
     interrupt_after=[],
 )
 graph.name = "RetrievalGraph"
+
+
+# A variant that starts retrieval on the raw user message while the query is
+# being rewritten, saving a retrieval round-trip whenever the rewrite does not
+# change the meaning of the question.
+
+speculative_builder = StateGraph(
+    State, input_schema=InputState, context_schema=Configuration
+)
+speculative_builder.add_node(generate_query)
+speculative_builder.add_node(speculative_retrieve)
+speculative_builder.add_node("retrieve", retrieve_with_speculation)
+speculative_builder.add_node(respond)
+speculative_builder.add_edge("__start__", "generate_query")
+speculative_builder.add_edge("__start__", "speculative_retrieve")
+speculative_builder.add_edge(["generate_query", "speculative_retrieve"], "retrieve")
+speculative_builder.add_edge("retrieve", "respond")
+
+speculative_graph = speculative_builder.compile()
+speculative_graph.name = "SpeculativeRetrievalGraph"
@@ -1,20 +1,44 @@
-"""This "graph" simply exposes an endpoint for a user to upload docs to be indexed."""
+"""This "graph" simply exposes an endpoint for a user to upload docs to be indexed.
 
-from typing import Sequence
+Large uploads are indexed in steps of ``index_step_docs`` documents. Each step
+commits its documents to the index manifest and advances a cursor in the graph
+state, so a failed run resumed from its checkpoint (re-invoked with no input
+on the same thread) continues after the last committed step. Progress is
+streamed as ``{"indexing": {...}}`` events in the ``custom`` stream mode.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Callable, Iterable, Iterator, Literal, Sequence
 
 from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph
 
-from retrieval_graph import retrieval
+from retrieval_graph import answer_cache, chunking, indexing, retrieval
+from retrieval_graph.blobstore import DocumentRef
 from retrieval_graph.configuration import IndexConfiguration
+from retrieval_graph.fusion import doc_key, stable_id
+from retrieval_graph.manifest import IndexManifest, SyncPlan, source_key
 from retrieval_graph.state import IndexState
+from retrieval_graph.tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 
 def ensure_docs_have_user_id(
     docs: Sequence[Document], config: RunnableConfig
 ) -> list[Document]:
-    """Ensure that all documents have a user_id in their metadata.
+    """Ensure that all documents have a user_id in their metadata and a stable id.
+
+    The id is derived from the user and the document's source key, so
+    re-indexing a document overwrites its previous version. It is kept
+    consistent between the vector store and the BM25 index so that hybrid
+    retrieval can de-duplicate results from both.
 
         docs (Sequence[Document]): A sequence of Document objects to process.
         config (RunnableConfig): A configuration object containing the user_id.
@@ -23,34 +47,225 @@ def ensure_docs_have_user_id(
         list[Document]: A new list of Document objects with updated metadata.
     """
     user_id = config["configurable"]["user_id"]
-    return [
-        Document(
-            page_content=doc.page_content, metadata={**doc.metadata, "user_id": user_id}
-        )
-        for doc in docs
-    ]
+    return [_stamp(doc, user_id) for doc in docs]
+
+
+def _stamp(doc: Document, user_id: str) -> Document:
+    return Document(
+        id=stable_id(user_id, doc_key(doc)),
+        page_content=doc.page_content,
+        metadata={**doc.metadata, "user_id": user_id},
+    )
+
 
+def _load_stamped(
+    items: Iterable[Document | DocumentRef], user_id: str
+) -> Iterator[Document]:
+    """Yield stamped documents, reading referenced payloads one at a time."""
+    for item in items:
+        yield _stamp(item.load() if isinstance(item, DocumentRef) else item, user_id)
 
+
+def _fingerprint(docs: Sequence[Document | DocumentRef]) -> str:
+    """Identify an upload, so a cursor is only reused for the same documents."""
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(source_key(doc).encode())
+        if isinstance(doc, DocumentRef):
+            digest.update((doc.blob or doc.path or "").encode())
+        else:
+            digest.update(doc.page_content.encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _stream_writer() -> Callable[[Any], None]:
+    try:
+        return get_stream_writer()
+    except RuntimeError:  # Called outside of a graph run.
+        return lambda chunk: None
+
+
+@traced()
 async def index_docs(
     state: IndexState, *, config: RunnableConfig | None = None
-) -> dict[str, str]:
-    """Asynchronously index documents in the given state using the configured retriever.
+) -> dict[str, Any]:
+    """Asynchronously index the next step of documents using the configured retriever.
 
-    This function takes the documents from the state, ensures they have a user ID,
-    adds them to the retriever's index, and then signals for the documents to be
-    deleted from the state.
+    This function takes the next ``index_step_docs`` documents after the
+    state's cursor, skips those the index manifest records as unchanged, reads
+    the text of referenced documents lazily, ensures the rest have a user ID,
+    splits them into token-bounded chunks, adds the chunks to the retriever's
+    index in concurrent, size- and token-bounded batches, deletes chunks that
+    are no longer produced, and commits the step to the manifest. It then
+    advances the cursor or, after the last step, signals for the documents to
+    be deleted from the state.
 
     Args:
         state (IndexState): The current state containing documents and retriever.
-        config (Optional[RunnableConfig]): Configuration for the indexing process.r
+        config (Optional[RunnableConfig]): Configuration for the indexing process.
     """
     if not config:
         raise ValueError("Configuration required to run index_docs.")
+    configuration = IndexConfiguration.from_runnable_config(config)
+    user_id = configuration.user_id
+    manifest = retrieval.make_manifest()
+    namespace = "/".join(
+        (
+            configuration.retriever_provider,
+            configuration.embedding_model,
+            configuration.retrieval_mode,
+        )
+    )
+    docs = state.docs
+    job = _fingerprint(docs)
+    cursor, elapsed = (state.cursor, state.elapsed) if state.job == job else (0, 0.0)
+    # Every step is a graph super-step: keep the job within the recursion limit.
+    steps = max(1, config.get("recursion_limit", 25) - 1)
+    step_docs = max(configuration.index_step_docs, math.ceil(len(docs) / steps), 1)
+    end = min(len(docs), cursor + step_docs)
+    final = end >= len(docs)
+    write = _stream_writer()
+    started = time.perf_counter()
+
+    def report(chunks_done: int) -> None:
+        seconds = elapsed + time.perf_counter() - started
+        rate = cursor / seconds if seconds else 0.0
+        remaining = len(docs) - cursor
+        write(
+            {
+                "indexing": {
+                    "docs_done": cursor,
+                    "docs_total": len(docs),
+                    "chunks_done": chunks_done,
+                    "docs_per_second": rate,
+                    "eta_seconds": remaining / rate if rate else None,
+                }
+            }
+        )
+
+    plan = manifest.plan(
+        user_id,
+        namespace,
+        docs[cursor:end],
+        settings=f"{configuration.chunk_tokens}/{configuration.chunk_overlap_tokens}"
+        f"/{configuration.tokenizer}",
+        prune=configuration.index_prune and final,
+        keep=map(source_key, docs) if final else None,
+    )
+    logger.info(
+        "🗂️ Documents %d-%d of %d: %d new or changed, %d unchanged, %d removed sources",
+        cursor + 1 if end else 0,
+        end,
+        len(docs),
+        len(plan.changed),
+        plan.unchanged,
+        len(plan.removed),
+    )
+    if plan.changed or plan.removed:
+        await _apply(plan, configuration, config, manifest, namespace, report)
+        answer_cache.cache.invalidate(user_id)
+    elapsed += time.perf_counter() - started
+    cursor = end
+    started = time.perf_counter()
+    report(0)
+    if not final:
+        return {"job": job, "cursor": cursor, "elapsed": elapsed}
+    logger.info("✅ Indexed %d documents in %.1fs", len(docs), elapsed)
+    return {"docs": "delete", "job": "", "cursor": 0, "elapsed": 0.0}
+
+
+async def _apply(
+    plan: SyncPlan,
+    configuration: IndexConfiguration,
+    config: RunnableConfig,
+    manifest: IndexManifest,
+    namespace: str,
+    report: Callable[[int], None],
+) -> None:
+    """Upsert the changed sources of ``plan``, delete stale chunks and commit."""
+    user_id = configuration.user_id
+    stamped_docs = _load_stamped(plan.changed, user_id)
+    source_of = {stable_id(user_id, key): key for key in plan.hashes}
+    new_ids: dict[str, list[str]] = {key: [] for key in plan.hashes}
+
+    def record(chunks: Iterable[Document]) -> Iterator[Document]:
+        for chunk in chunks:
+            # Chunk ids are "<stamped id>:<index>", or the stamped id itself
+            # when documents are indexed whole; metadata comes from the caller.
+            chunk_id = str(chunk.id)
+            parent = chunk_id if chunk_id in source_of else chunk_id.rpartition(":")[0]
+            new_ids[source_of[parent]].append(chunk_id)
+            yield chunk
+
+    chunks = record(
+        chunking.iter_chunks(
+            stamped_docs,
+            chunk_tokens=configuration.chunk_tokens,
+            overlap_tokens=configuration.chunk_overlap_tokens,
+            tokenizer=configuration.tokenizer,
+        )
+    )
+    lexical = (
+        retrieval.make_lexical_index()
+        if configuration.retrieval_mode == "hybrid"
+        else None
+    )
     with retrieval.make_retriever(config) as retriever:
-        stamped_docs = ensure_docs_have_user_id(state.docs, config)
 
-        await retriever.aadd_documents(stamped_docs)
-    return {"docs": "delete"}
+        async def upsert(batch: list[Document]) -> None:
+            with span("vector_upsert", provider=configuration.retriever_provider):
+                await retriever.aadd_documents(batch)
+            if lexical is not None:
+                with span("lexical_upsert"):
+                    await asyncio.to_thread(lexical.add_documents, user_id, batch)
+
+        await indexing.upsert_batches(
+            chunks,
+            upsert,
+            batch_size=configuration.index_batch_size,
+            batch_tokens=configuration.index_batch_tokens,
+            concurrency=configuration.index_concurrency,
+            count=chunking.token_counter(configuration.tokenizer),
+            max_retries=configuration.index_max_retries,
+            progress=lambda run: report(run.docs),
+        )
+        if configuration.cognee_cognify == "background" and hasattr(
+            retriever, "schedule_process_data"
+        ):
+            job = retriever.schedule_process_data()
+            logger.info(
+                "🧠 Cognify of %s is %s (%d requests)",
+                job.dataset,
+                job.state,
+                job.requests,
+            )
+
+        stale = plan.stale_ids(new_ids)
+        if stale:
+            vectorstore = getattr(retriever, "vectorstore", None)
+            if vectorstore is None:
+                logger.warning(
+                    "%s does not support deletes; %d stale chunks are kept",
+                    configuration.retriever_provider,
+                    len(stale),
+                )
+            else:
+                with span("vector_delete", provider=configuration.retriever_provider):
+                    await vectorstore.adelete(stale)
+            if lexical is not None:
+                await asyncio.to_thread(lexical.delete, user_id, stale)
+    manifest.commit(
+        user_id,
+        namespace,
+        {key: (plan.hashes[key], ids) for key, ids in new_ids.items()},
+        plan.removed,
+    )
+
+
+def route_index(state: IndexState) -> Literal["index_docs", "__end__"]:
+    """Continue with the next step until the documents have been indexed."""
+    return "index_docs" if state.docs else "__end__"
 
 
 # Define a new graph
@@ -59,6 +274,7 @@ async def index_docs(
 builder = StateGraph(IndexState, context_schema=IndexConfiguration)
 builder.add_node(index_docs)
 builder.add_edge("__start__", "index_docs")
+builder.add_conditional_edges("index_docs", route_index)
 # Finally, we compile it!
 # This compiles it into a graph you can invoke and deploy.
 graph = builder.compile()
@@ -0,0 +1,253 @@
+"""Bounded-concurrency, rate-limit-aware batch upserts for the index graph.
+
+A bulk index job used to be one ``aadd_documents`` call: a single request
+that times out on large uploads, or that the client library serializes.
+``upsert_batches`` instead cuts the chunk stream into batches bounded by both
+a document count and a token count, and upserts up to ``concurrency`` of them
+at once.
+
+Batch size adapts to the provider: a rate-limit (HTTP 429) or timeout error
+halves the size of the following batches, and each successful batch grows it
+back by one document up to the configured maximum. The failed batch itself is
+retried in two halves after an exponential, jittered backoff, up to
+``max_retries`` times. Any other error fails the job.
+
+Each run returns an ``IndexStats`` with its throughput; the totals are
+exported on ``/metrics`` as ``retrieval_graph_indexing_*``.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator
+
+from langchain_core.documents import Document
+
+from retrieval_graph import tracing
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+"""HTTP statuses retried with backoff."""
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def _status(error: BaseException) -> int | None:
+    for holder in (
+        error,
+        getattr(error, "response", None),
+        getattr(error, "meta", None),
+    ):
+        for attr in ("status_code", "status"):
+            value = getattr(holder, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether ``error`` is a rate limit, timeout or transient server error.
+
+    Provider clients raise their own exception types, so this looks at the
+    HTTP status they carry and at the exception name rather than at classes.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if _status(error) in RETRYABLE_STATUS:
+        return True
+    name = type(error).__name__
+    return "RateLimit" in name or "Timeout" in name
+
+
+@dataclass
+class IndexStats:
+    """Counters of one indexing run."""
+
+    docs: int = 0
+    tokens: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        """Return the upserted documents per second of wall-clock time."""
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Return the upserted tokens per second of wall-clock time."""
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+_totals = IndexStats()
+_last = IndexStats()
+_totals_lock = threading.Lock()
+
+
+def _record(stats: IndexStats) -> None:
+    global _last
+    with _totals_lock:
+        _totals.docs += stats.docs
+        _totals.tokens += stats.tokens
+        _totals.batches += stats.batches
+        _totals.retries += stats.retries
+        _totals.seconds += stats.seconds
+        _last = stats
+
+
+def stats() -> dict[str, float]:
+    """Return cumulative indexing counters and the throughput of the last run."""
+    with _totals_lock:
+        return {
+            "docs": _totals.docs,
+            "tokens": _totals.tokens,
+            "batches": _totals.batches,
+            "retries": _totals.retries,
+            "last_docs_per_second": _last.docs_per_second,
+            "last_tokens_per_second": _last.tokens_per_second,
+        }
+
+
+def _take_batch(
+    chunks: Iterator[Document],
+    pending: list[Document],
+    max_docs: int,
+    max_tokens: int,
+    count: Callable[[str], int],
+) -> list[tuple[Document, int]]:
+    """Take up to ``max_docs`` chunks totalling at most ``max_tokens`` tokens.
+
+    A chunk that would overflow the token bound is kept in ``pending`` for
+    the next batch; a single chunk above the bound still forms a batch.
+    """
+    batch: list[tuple[Document, int]] = []
+    total = 0
+    while len(batch) < max_docs:
+        doc = pending.pop() if pending else next(chunks, None)
+        if doc is None:
+            break
+        tokens = count(doc.page_content)
+        if batch and total + tokens > max_tokens:
+            pending.append(doc)
+            break
+        batch.append((doc, tokens))
+        total += tokens
+    return batch
+
+
+async def upsert_batches(
+    chunks: Iterator[Document],
+    upsert: Callable[[list[Document]], Awaitable[None]],
+    *,
+    batch_size: int,
+    batch_tokens: int,
+    concurrency: int,
+    count: Callable[[str], int],
+    max_retries: int = 5,
+    progress: Callable[[IndexStats], None] | None = None,
+) -> IndexStats:
+    """Upsert ``chunks`` in bounded batches with up to ``concurrency`` in flight.
+
+    Args:
+        chunks: The documents to index. Consumed lazily, in a worker thread,
+            so splitting does not block the event loop.
+        upsert: Embeds and stores one batch.
+        batch_size: Maximum documents per batch.
+        batch_tokens: Maximum tokens per batch, as counted by ``count``.
+        concurrency: Maximum batches in flight.
+        count: Counts the tokens of a document's text.
+        max_retries: Retries of a batch on rate-limit and timeout errors.
+        progress: Called with the running counters after each stored batch.
+
+    Returns:
+        IndexStats: The counters and throughput of this run.
+    """
+    run = IndexStats()
+    limit = batch_size
+    pending: list[Document] = []
+    slots = asyncio.Semaphore(max(1, concurrency))
+    tasks: set[asyncio.Task[None]] = set()
+    failure: list[Exception] = []
+
+    async def attempt(batch: list[Document], tries: int) -> None:
+        nonlocal limit
+        try:
+            await upsert(batch)
+        except Exception as e:
+            if not is_retryable(e) or tries >= max_retries:
+                raise
+            limit = max(1, limit // 2)
+            run.retries += 1
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**tries)
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(
+                "⏳ Upsert of %d documents failed with %s; retrying in %.1fs "
+                "with batch size %d",
+                len(batch),
+                type(e).__name__,
+                delay,
+                limit,
+            )
+            await asyncio.sleep(delay)
+            mid = len(batch) // 2
+            for part in (batch[:mid], batch[mid:]) if mid else (batch,):
+                await attempt(part, tries + 1)
+            return
+        limit = min(batch_size, limit + 1)
+
+    async def process(batch: list[tuple[Document, int]]) -> None:
+        try:
+            await attempt([doc for doc, _ in batch], 0)
+            run.docs += len(batch)
+            run.tokens += sum(tokens for _, tokens in batch)
+            run.batches += 1
+            if progress is not None:
+                run.seconds = time.perf_counter() - start
+                progress(run)
+        except Exception as e:
+            failure.append(e)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    try:
+        while not failure:
+            await slots.acquire()
+            batch = await asyncio.to_thread(
+                _take_batch, chunks, pending, limit, batch_tokens, count
+            )
+            if not batch:
+                slots.release()
+                break
+            task = asyncio.create_task(process(batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    run.seconds = time.perf_counter() - start
+    _record(run)
+    if failure:
+        raise failure[0]
+    logger.info(
+        "📦 Indexed %d documents (%d tokens) in %d batches, %.1fs: "
+        "%.1f docs/s, %.0f tokens/s, %d retries",
+        run.docs,
+        run.tokens,
+        run.batches,
+        run.seconds,
+        run.docs_per_second,
+        run.tokens_per_second,
+        run.retries,
+    )
+    return run
+
+
+tracing.register_collector("indexing", stats)
@@ -0,0 +1,193 @@
+"""In-process BM25 index used for hybrid retrieval.
+
+Dense retrieval is weak on exact names (people, service names, product codes)
+that rarely appear in the embedding model's training data. ``LexicalIndex``
+keeps a small inverted index per ``user_id`` partition and scores queries
+with Okapi BM25, so the retrieval graph can fuse lexical and vector results.
+
+The index is populated by ``index_docs`` alongside the vector store. When a
+path is given, every write is appended to a JSONL log that is replayed on
+start-up, so the postings survive restarts.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+from langchain_core.documents import Document
+
+from retrieval_graph.fusion import doc_key
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the "
+    "their there this to was were what when where which who whom why will with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Split ``text`` into lowercase word tokens, dropping stopwords.
+
+    Examples:
+        >>> tokenize("Who leads the Data Practice?")
+        ['leads', 'data', 'practice']
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Partition:
+    """Postings and statistics for the documents of a single partition."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """Create an empty partition with the given BM25 parameters."""
+        self.k1 = k1
+        self.b = b
+        self.docs: dict[str, Document] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        """Return the number of documents in the partition."""
+        return len(self.docs)
+
+    def add(self, doc_id: str, doc: Document) -> None:
+        """Index ``doc`` under ``doc_id``, replacing any previous version."""
+        self.remove(doc_id)
+        counts = Counter(tokenize(doc.page_content))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.docs[doc_id] = doc
+        self.lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        """Drop ``doc_id`` from the partition, if present."""
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in set(tokenize(doc.page_content)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int) -> list[tuple[Document, float]]:
+        """Return the ``k`` best BM25 matches for ``query``."""
+        n = len(self.docs)
+        if not n:
+            return []
+        avg_length = self.total_length / n or 1.0
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.lengths[doc_id] / avg_length
+                )
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (
+                    tf + norm
+                )
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.docs[doc_id], score) for doc_id, score in best]
+
+
+class LexicalIndex:
+    """A set of BM25 partitions keyed by ``user_id``.
+
+    Thread-safe: reads and writes are serialised with a lock. Searches are
+    pure-Python dictionary walks over one partition and take well under a
+    millisecond for corpora of a few thousand chunks.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Create the index, replaying the write log at ``path`` if it exists."""
+        self.path = Path(path) if path else None
+        self._partitions: dict[str, BM25Partition] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():
+                self._replay()
+
+    def _replay(self) -> None:
+        assert self.path is not None
+        with open(self.path) as f:
+            for line in f:
+                record = json.loads(line)
+                partition = self._partitions.setdefault(
+                    record["user_id"], BM25Partition()
+                )
+                if record.get("deleted"):
+                    partition.remove(record["id"])
+                else:
+                    partition.add(
+                        record["id"],
+                        Document(
+                            id=record["id"],
+                            page_content=record["text"],
+                            metadata=record["metadata"],
+                        ),
+                    )
+
+    def _log(self, records: Iterable[dict[str, Any]]) -> None:
+        if self.path is None:
+            return
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def add_documents(self, user_id: str, docs: Sequence[Document]) -> list[str]:
+        """Index ``docs`` in the ``user_id`` partition and return their ids."""
+        ids = [doc_key(doc) for doc in docs]
+        with self._lock:
+            partition = self._partitions.setdefault(user_id, BM25Partition())
+            for doc_id, doc in zip(ids, docs):
+                partition.add(
+                    doc_id,
+                    Document(
+                        id=doc_id, page_content=doc.page_content, metadata=doc.metadata
+                    ),
+                )
+            self._log(
+                {
+                    "user_id": user_id,
+                    "id": doc_id,
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                }
+                for doc_id, doc in zip(ids, docs)
+            )
+        return ids
+
+    def delete(self, user_id: str, ids: Sequence[str]) -> None:
+        """Remove documents from the ``user_id`` partition."""
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                return
+            for doc_id in ids:
+                partition.remove(doc_id)
+            self._log({"user_id": user_id, "id": i, "deleted": True} for i in ids)
+
+    def search(self, user_id: str, query: str, k: int = 4) -> list[Document]:
+        """Return the ``k`` best BM25 matches for ``query`` in ``user_id``'s partition."""
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                return []
+            return [doc for doc, _ in partition.search(query, k)]
@@ -0,0 +1,507 @@
+"""In-process vector store backed by a memory-mapped NumPy matrix.
+
+The ``local`` retriever provider keeps everything on the local filesystem so
+the stack can run (and be benchmarked) without any remote service:
+
+- ``vectors.f32``: L2-normalised float32 embeddings, one row per chunk,
+  memory-mapped read-only for search.
+- ``docs.jsonl``: the page content and metadata of each row. Only the rows
+  returned by a search are read, using the byte offsets from the table below.
+- ``index.json``: the sidecar table with the dimension, row ids, byte offsets,
+  per-``user_id`` row partitions and deleted rows.
+
+By default search is an exact cosine top-k: one matrix-vector product over the
+rows of the requested partition followed by ``argpartition``. With
+``index="ivf"`` large partitions are searched through an inverted-file index
+instead (see ``retrieval_graph.ann``), tuned per query with ``nprobe``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from retrieval_graph.ann import IVFIndex
+
+VECTORS_FILE = "vectors.f32"
+DOCS_FILE = "docs.jsonl"
+INDEX_FILE = "index.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    normalized: np.ndarray = vectors / norms
+    return normalized.astype(np.float32, copy=False)
+
+
+def _matches(metadata: dict[str, Any], filter: dict[str, Any]) -> bool:
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the ``k`` largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class LocalVectorStore(VectorStore):
+    """A single-process vector store persisted to a directory.
+
+    Writes are serialised with a lock and appended to the data files, so
+    re-opening the directory is cheap: only the sidecar table is parsed and the
+    matrix is mapped, not read. Adding a document with an existing id replaces
+    the previous row.
+
+    Filters are equality matches on metadata keys. ``user_id`` is answered from
+    the partition table without touching the document file; other keys are
+    checked on the ranked candidates.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        embedding: Embeddings,
+        *,
+        index: Literal["flat", "ivf"] = "flat",
+        exact_search_rows: int = 2048,
+    ) -> None:
+        """Open (or create) a store in ``path``.
+
+        Args:
+            path: Directory holding the data files.
+            embedding: Encoder used for documents and queries.
+            index: ``"flat"`` for exact search, ``"ivf"`` to use an
+                approximate inverted-file index once the store is large enough.
+            exact_search_rows: Partitions with at most this many rows are
+                always searched exactly, even with ``index="ivf"``.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedding = embedding
+        self.exact_search_rows = exact_search_rows
+        self._ivf = IVFIndex(self.path) if index == "ivf" else None
+        self._lock = threading.RLock()
+        self._dim: int | None = None
+        self._ids: list[str] = []
+        self._offsets: list[int] = []
+        self._partitions: dict[str, list[int]] = {}
+        # Live rows by user_id (``None`` for all rows), rebuilt after writes.
+        self._live_rows: dict[str | None, np.ndarray] = {}
+        self._deleted: set[int] = set()
+        self._row_of: dict[str, int] = {}
+        self._matrix: np.ndarray | None = None
+        self._load()
+        if self._ivf is not None and self._matrix is not None:
+            # Train a store first opened with index="ivf", and assign rows
+            # written while the index files were behind.
+            self._ivf.update(self._matrix)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Return the embedding model used by the store."""
+        return self.embedding
+
+    def __len__(self) -> int:
+        """Return the number of live rows."""
+        return len(self._row_of)
+
+    # Persistence
+
+    def _load(self) -> None:
+        index_path = self.path / INDEX_FILE
+        if not index_path.exists():
+            return
+        table = json.loads(index_path.read_text())
+        self._dim = table["dim"]
+        self._ids = table["ids"]
+        self._offsets = table["offsets"]
+        self._partitions = table["partitions"]
+        self._deleted = set(table["deleted"])
+        self._row_of = {
+            id_: row for row, id_ in enumerate(self._ids) if row not in self._deleted
+        }
+        self._remap()
+
+    def _remap(self) -> None:
+        rows = len(self._ids)
+        if not rows or self._dim is None:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(
+            self.path / VECTORS_FILE,
+            dtype=np.float32,
+            mode="r",
+            shape=(rows, self._dim),
+        )
+
+    def _write_table(self) -> None:
+        table = {
+            "dim": self._dim,
+            "ids": self._ids,
+            "offsets": self._offsets,
+            "partitions": self._partitions,
+            "deleted": sorted(self._deleted),
+        }
+        tmp = self.path / f"{INDEX_FILE}.tmp"
+        tmp.write_text(json.dumps(table))
+        os.replace(tmp, self.path / INDEX_FILE)
+
+    def _read_docs(self, rows: Iterable[int]) -> list[Document]:
+        docs = []
+        with open(self.path / DOCS_FILE, "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                record = json.loads(f.readline())
+                docs.append(
+                    Document(
+                        id=record["id"],
+                        page_content=record["text"],
+                        metadata=record["metadata"],
+                    )
+                )
+        return docs
+
+    # Writes
+
+    def _append(
+        self,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Sequence[dict[str, Any]] | None,
+        ids: Sequence[str] | None,
+    ) -> list[str]:
+        if not texts:
+            return []
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = (
+            [i or str(uuid.uuid4()) for i in ids]
+            if ids
+            else [str(uuid.uuid4()) for _ in texts]
+        )
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(matrix.shape[1])
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} does not match store dimension {self._dim}"
+                )
+            start = len(self._ids)
+            with open(self.path / VECTORS_FILE, "ab") as f:
+                # Drop rows left behind by an interrupted write.
+                f.truncate(start * self._dim * 4)
+                f.write(matrix.tobytes())
+            with open(self.path / DOCS_FILE, "ab") as f:
+                for offset, (id_, text, metadata) in enumerate(
+                    zip(ids, texts, metadatas)
+                ):
+                    row = start + offset
+                    self._offsets.append(f.tell())
+                    f.write(
+                        json.dumps(
+                            {"id": id_, "text": text, "metadata": metadata}
+                        ).encode()
+                        + b"\n"
+                    )
+                    self._ids.append(id_)
+                    previous = self._row_of.get(id_)
+                    if previous is not None:
+                        self._deleted.add(previous)
+                    self._row_of[id_] = row
+                    user_id = metadata.get("user_id")
+                    if user_id is not None:
+                        self._partitions.setdefault(str(user_id), []).append(row)
+            self._live_rows.clear()
+            self._write_table()
+            self._remap()
+            if self._ivf is not None and self._matrix is not None:
+                self._ivf.update(self._matrix)
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict[str, Any]] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed and append ``texts`` to the store."""
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self._append(texts, vectors, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict[str, Any]] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed ``texts`` asynchronously and append them to the store."""
+        texts = list(texts)
+        vectors = await self.embedding.aembed_documents(texts)
+        return await asyncio.to_thread(self._append, texts, vectors, metadatas, ids)
+
+    def add_documents(self, documents: list[Document], **kwargs: Any) -> list[str]:
+        """Add documents, using ``Document.id`` when no ``ids`` are given."""
+        if "ids" not in kwargs and any(doc.id for doc in documents):
+            kwargs["ids"] = [doc.id or str(uuid.uuid4()) for doc in documents]
+        return super().add_documents(documents, **kwargs)
+
+    async def aadd_documents(
+        self, documents: list[Document], **kwargs: Any
+    ) -> list[str]:
+        """Add documents asynchronously, using ``Document.id`` when no ``ids`` are given."""
+        if "ids" not in kwargs and any(doc.id for doc in documents):
+            kwargs["ids"] = [doc.id or str(uuid.uuid4()) for doc in documents]
+        return await super().aadd_documents(documents, **kwargs)
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        """Delete rows by id. Space is reclaimed only when the store is rebuilt."""
+        if not ids:
+            return False
+        with self._lock:
+            for id_ in ids:
+                row = self._row_of.pop(id_, None)
+                if row is not None:
+                    self._deleted.add(row)
+            self._live_rows.clear()
+            self._write_table()
+        return True
+
+    async def adelete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        """Delete rows by id."""
+        return await asyncio.to_thread(self.delete, ids, **kwargs)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        """Return the live documents for the given ids."""
+        rows = [self._row_of[i] for i in ids if i in self._row_of]
+        return self._read_docs(rows)
+
+    # Search
+
+    def _candidate_rows(self, filter: dict[str, Any] | None) -> np.ndarray | None:
+        """Return the live rows eligible for ``filter``.
+
+        ``None`` stands for every row of the matrix, when none are deleted.
+        Call with the lock held.
+        """
+        user_id = str(filter["user_id"]) if filter and "user_id" in filter else None
+        if user_id is None and not self._deleted:
+            return None
+        rows = self._live_rows.get(user_id)
+        if rows is None:
+            if user_id is None:
+                rows = np.arange(len(self._ids), dtype=np.int64)
+            else:
+                rows = np.asarray(self._partitions.get(user_id, []), dtype=np.int64)
+            if self._deleted:
+                dead = np.zeros(len(self._ids), dtype=bool)
+                dead[list(self._deleted)] = True
+                rows = rows[~dead[rows]]
+            self._live_rows[user_id] = rows
+        return rows
+
+    def _ivf_rows(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        rows: np.ndarray | None,
+        k: int,
+        **kwargs: Any,
+    ) -> np.ndarray | None:
+        """Narrow ``rows`` to the IVF candidates of ``query`` if the index applies.
+
+        The clusters cover every row, so a filter keeping a fraction of them
+        scales ``nprobe`` up by the inverse of that fraction, and widens it
+        further until at least ``k`` candidates pass. Partitions that would
+        need most clusters anyway are searched exactly. Call with the lock
+        held.
+
+        Keyword Args:
+            nprobe: Number of IVF clusters to scan (``index="ivf"`` only).
+        """
+        searched = len(matrix) if rows is None else len(rows)
+        if (
+            self._ivf is None
+            or not self._ivf.trained
+            or searched <= self.exact_search_rows
+        ):
+            return rows
+        clusters = self._ivf.clusters
+        nprobe = math.ceil(
+            (kwargs.get("nprobe") or self._ivf.nprobe) * len(matrix) / searched
+        )
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(len(matrix), dtype=bool)
+            allowed[rows] = True
+        while nprobe < clusters:
+            candidates = self._ivf.candidates(query, nprobe)
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if len(candidates) >= k:
+                return candidates
+            nprobe *= 2
+        return rows
+
+    @staticmethod
+    def _score_rows(
+        matrix: np.ndarray, query: np.ndarray, rows: np.ndarray | None, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return up to ``k`` (rows, scores) pairs, best first."""
+        if rows is None:
+            scores = matrix @ query
+            best = top_k(scores, k)
+            return best, scores[best]
+        if len(rows) * 4 > len(matrix):
+            # Gathering a large partition costs more than scoring every row.
+            scores = (matrix @ query)[rows]
+        else:
+            scores = matrix[rows] @ query
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Return the ``k`` most similar documents with their cosine similarity."""
+        if k <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        # Take a consistent view of the matrix and live rows; writers replace
+        # rather than mutate both, so scoring can run without the lock.
+        extra = {key: v for key, v in (filter or {}).items() if key != "user_id"}
+        # Deleted rows are already excluded; over-fetch only for other filters.
+        fetch = k * 4 if extra else k
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None:
+                return []
+            rows = self._candidate_rows(filter)
+            rows = self._ivf_rows(matrix, query, rows, fetch, **kwargs)
+        if rows is not None and not len(rows):
+            return []
+        while True:
+            best, scores = self._score_rows(matrix, query, rows, fetch)
+            live = [(int(r), float(s)) for r, s in zip(best, scores)]
+            docs = self._read_docs(r for r, _ in live)
+            results = [
+                (doc, score)
+                for doc, (_, score) in zip(docs, live)
+                if _matches(doc.metadata, extra)
+            ]
+            if len(results) >= k or len(best) < fetch:
+                return results[:k]
+            fetch *= 4
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Embed ``query`` and return the ``k`` most similar documents with scores."""
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(
+            embedding, k, filter, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return the ``k`` most similar documents to ``embedding``."""
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, filter, **kwargs
+            )
+        ]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Return the ``k`` most similar documents to ``query``."""
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score(query, k, filter, **kwargs)
+        ]
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Embed ``query`` asynchronously and search in-process."""
+        embedding = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(
+            embedding, k, filter, **kwargs
+        )
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Embed ``query`` asynchronously and search in-process."""
+        return [
+            doc
+            for doc, _ in await self.asimilarity_search_with_score(
+                query, k, filter, **kwargs
+            )
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] mapped to a relevance in [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict[str, Any]] | None = None,
+        *,
+        ids: list[str] | None = None,
+        path: str | Path | None = None,
+        **kwargs: Any,
+    ) -> LocalVectorStore:
+        """Create a store in ``path`` and add ``texts`` to it."""
+        if path is None:
+            raise ValueError("LocalVectorStore.from_texts requires a `path`.")
+        store = cls(path, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
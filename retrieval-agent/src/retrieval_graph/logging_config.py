@@ -1,7 +1,9 @@
 """Logging configuration for the retrieval graph.
 
 This module sets up logging configuration to help debug authentication
-and data flow issues throughout the application.
+and data flow issues throughout the application. The level of the
+``retrieval_graph`` loggers is taken from the ``LOG_LEVEL`` environment
+variable (default ``INFO``); set it to ``DEBUG`` to trace data flow.
 """
 
 import logging
@@ -11,28 +13,20 @@ import sys
 
 def setup_logging():
     """Configure logging for the entire retrieval_graph package."""
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+
     # Set up root logger
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=level,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         handlers=[logging.StreamHandler(sys.stdout)],
     )
+    logging.getLogger("retrieval_graph").setLevel(level)
 
-    # Set specific loggers to DEBUG
-    loggers_to_debug = [
-        "retrieval_graph",
-        "retrieval_graph.graph",
-        "retrieval_graph.retrieval",
-        "retrieval_graph.utils",
-        "retrieval_graph.configuration",
-    ]
-
-    for logger_name in loggers_to_debug:
-        logger = logging.getLogger(logger_name)
-        logger.setLevel(logging.DEBUG)
-
-    # Log environment variables (safely)
+    # Log which environment variables are set, never their values.
     logger = logging.getLogger(__name__)
+    if not logger.isEnabledFor(logging.INFO):
+        return
     logger.info("=" * 80)
     logger.info("🔍 ENVIRONMENT VARIABLES CHECK")
     logger.info("=" * 80)
@@ -51,14 +45,10 @@ def setup_logging():
     ]
 
     for var in env_vars_to_check:
-        value = os.environ.get(var)
-        if value:
-            # Show presence and length, not the actual value
-            logger.info(
-                f"✅ {var}: SET (length: {len(value)}, prefix: {value[:10]}...)"
-            )
+        if os.environ.get(var):
+            logger.info("✅ %s: SET", var)
         else:
-            logger.warning(f"❌ {var}: NOT SET")
+            logger.warning("❌ %s: NOT SET", var)
 
     logger.info("=" * 80)
 
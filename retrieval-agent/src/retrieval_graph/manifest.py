@@ -0,0 +1,174 @@
+"""Per-user manifest of indexed sources for incremental indexing.
+
+Re-running the index graph on the same documents used to store them again
+and re-embed everything. ``IndexManifest`` remembers, per ``user_id`` and
+index namespace (retriever provider, embedding model and chunking settings),
+the content hash of every indexed source and the ids of its chunks.
+``index_docs`` uses it to:
+
+- skip sources whose hash is unchanged;
+- upsert changed sources under the same stable chunk ids, and delete the
+  chunks that a shorter new version no longer produces;
+- with ``index_prune``, delete the chunks of sources missing from the upload,
+  so syncing a directory costs in proportion to what changed.
+
+A source is identified by ``doc_key`` (the document id, its ``id`` metadata,
+or a content hash), or by ``DocumentRef.key`` for out-of-band payloads, which
+are hashed without loading their text into memory. Stored ids are derived
+from it with ``stable_id``, which scopes them by user so two users indexing
+the same text do not overwrite each other's vectors.
+
+The manifest is a SQLite file at ``INDEX_MANIFEST_PATH``; when unset it lives
+in memory and every source is re-indexed after a restart.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from langchain_core.documents import Document
+
+from retrieval_graph.blobstore import DocumentRef
+from retrieval_graph.fusion import doc_key
+
+
+def content_hash(doc: Document | DocumentRef, settings: str = "") -> str:
+    """Return the SHA-256 of a document's text, metadata and index ``settings``.
+
+    For a ``DocumentRef``, the digest of its payload stands in for the text.
+    """
+    digest = hashlib.sha256()
+    if isinstance(doc, DocumentRef):
+        digest.update(f"ref:{doc.digest()}".encode())
+    else:
+        digest.update(doc.page_content.encode())
+    digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode())
+    digest.update(settings.encode())
+    return digest.hexdigest()
+
+
+def source_key(doc: Document | DocumentRef) -> str:
+    """Return the manifest key of a document or reference."""
+    return doc.key if isinstance(doc, DocumentRef) else doc_key(doc)
+
+
+@dataclass
+class SyncPlan:
+    """What an upload changes relative to the manifest."""
+
+    changed: list[Document | DocumentRef] = field(default_factory=list)
+    """Documents that are new or whose hash changed, de-duplicated by source."""
+    hashes: dict[str, str] = field(default_factory=dict)
+    """New hash of every changed source."""
+    unchanged: int = 0
+    removed: list[str] = field(default_factory=list)
+    """Sources missing from the upload, when pruning."""
+    previous_ids: dict[str, list[str]] = field(default_factory=dict)
+    """Chunk ids stored for the changed and removed sources before this upload."""
+
+    def stale_ids(self, new_ids: dict[str, list[str]]) -> list[str]:
+        """Return stored chunk ids that the upload no longer produces.
+
+        Args:
+            new_ids: Chunk ids produced for each changed source.
+        """
+        stale: list[str] = []
+        for key, ids in self.previous_ids.items():
+            kept = set(new_ids.get(key, ()))
+            stale.extend(i for i in ids if i not in kept)
+        return stale
+
+
+class IndexManifest:
+    """SQLite-backed map of ``(user, namespace, source) -> (hash, chunk ids)``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Open or create the manifest at ``path``; ``None`` keeps it in memory."""
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            ":memory:" if path is None else str(path), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "user_id TEXT NOT NULL, namespace TEXT NOT NULL, source TEXT NOT NULL, "
+            "hash TEXT NOT NULL, chunk_ids TEXT NOT NULL, "
+            "PRIMARY KEY (user_id, namespace, source))"
+        )
+        self._lock = threading.Lock()
+
+    def entries(self, user_id: str, namespace: str) -> dict[str, tuple[str, list[str]]]:
+        """Return ``{source: (hash, chunk ids)}`` for a user and namespace."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, hash, chunk_ids FROM sources "
+                "WHERE user_id = ? AND namespace = ?",
+                (user_id, namespace),
+            ).fetchall()
+        return {source: (h, json.loads(ids)) for source, h, ids in rows}
+
+    def plan(
+        self,
+        user_id: str,
+        namespace: str,
+        docs: Sequence[Document | DocumentRef],
+        *,
+        settings: str = "",
+        prune: bool = False,
+        keep: Iterable[str] | None = None,
+    ) -> SyncPlan:
+        """Compare ``docs`` against the manifest.
+
+        Args:
+            user_id: The user who owns the sources.
+            namespace: The index namespace.
+            docs: The uploaded documents or references.
+            settings: Index settings folded into every content hash.
+            prune: Whether to plan the removal of sources missing from the upload.
+            keep: Sources of the whole upload when ``docs`` is one slice of it;
+                defaults to the sources of ``docs``.
+        """
+        entries = self.entries(user_id, namespace)
+        latest = {source_key(doc): doc for doc in docs}
+        plan = SyncPlan()
+        for key, doc in latest.items():
+            new_hash = content_hash(doc, settings)
+            if key in entries and entries[key][0] == new_hash:
+                plan.unchanged += 1
+                continue
+            plan.changed.append(doc)
+            plan.hashes[key] = new_hash
+            if key in entries:
+                plan.previous_ids[key] = entries[key][1]
+        if prune:
+            kept = latest.keys() if keep is None else set(keep)
+            plan.removed = [key for key in entries if key not in kept]
+            for key in plan.removed:
+                plan.previous_ids[key] = entries[key][1]
+        return plan
+
+    def commit(
+        self,
+        user_id: str,
+        namespace: str,
+        upserted: dict[str, tuple[str, list[str]]],
+        removed: Iterable[str] = (),
+    ) -> None:
+        """Record upserted sources and forget removed ones, atomically."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                [
+                    (user_id, namespace, key, h, json.dumps(ids))
+                    for key, (h, ids) in upserted.items()
+                ],
+            )
+            self._conn.executemany(
+                "DELETE FROM sources WHERE user_id = ? AND namespace = ? AND source = ?",
+                [(user_id, namespace, key) for key in removed],
+            )
@@ -0,0 +1,137 @@
+"""Cache-friendly system prompt assembly.
+
+Providers reuse work for a prompt prefix they have seen before: Anthropic
+through explicit ``cache_control`` breakpoints, OpenAI through automatic
+prefix caching and Ollama through KV-cache reuse. All of them need the start
+of the prompt to be byte-for-byte identical between calls.
+
+The configurable system prompts mix static instructions with per-call values
+(``{retrieved_docs}``, ``{queries}``, ``{system_time}``). ``system_message``
+splits a prompt template at the first of those volatile placeholders, keeps
+the static part first, and, for Anthropic models, marks the end of the static
+part as a cache breakpoint. ``system_time`` is rounded down to the hour so it
+does not change the prompt on every call.
+
+``record_usage`` reads the cached-token counts that providers report in
+``usage_metadata``; ``stats()`` returns the totals per graph node.
+"""
+
+import logging
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any
+
+from langchain_core.messages import AIMessage, SystemMessage
+
+from retrieval_graph import tracing
+
+logger = logging.getLogger(__name__)
+
+VOLATILE_VARIABLES = ("retrieved_docs", "queries", "system_time")
+"""Prompt variables whose values change from call to call."""
+
+_VOLATILE_RE = re.compile(r"(?<!\{)\{(?:" + "|".join(VOLATILE_VARIABLES) + r")\}(?!\})")
+
+
+def coarse_time(now: datetime | None = None) -> str:
+    """Return the current UTC time rounded down to the hour, in ISO format.
+
+    Examples:
+        >>> coarse_time(datetime(2024, 5, 1, 13, 47, 12, tzinfo=timezone.utc))
+        '2024-05-01T13:00:00+00:00'
+    """
+    now = now or datetime.now(tz=timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+def split_template(template: str) -> tuple[str, str]:
+    r"""Split ``template`` into its static prefix and volatile remainder.
+
+    Examples:
+        >>> split_template("Be brief.\n\n{retrieved_docs}\n\nTime: {system_time}")
+        ('Be brief.', '{retrieved_docs}\n\nTime: {system_time}')
+    """
+    match = _VOLATILE_RE.search(template)
+    if match is None:
+        return template.strip(), ""
+    start = match.start()
+    # Keep the line that introduces the placeholder with the volatile part.
+    line_start = template.rfind("\n", 0, start) + 1
+    if template[line_start:start].strip():
+        start = line_start
+    return template[:start].strip(), template[start:].strip()
+
+
+def system_message(
+    template: str,
+    variables: dict[str, Any],
+    *,
+    model: str,
+    suffix: str = "",
+) -> SystemMessage:
+    """Format ``template`` into a system message with a stable prefix.
+
+    Args:
+        template: A system prompt template using ``str.format`` placeholders.
+        variables: Values for the placeholders.
+        model: The fully specified model name; Anthropic models get a cache
+            breakpoint after the static prefix.
+        suffix: Additional instructions placed at the end of the prompt,
+            after the volatile part, such as the multi-query prompt. The
+            split point can fall inside a block of the template, so the
+            suffix never goes into the prefix.
+    """
+    static, volatile = split_template(template)
+    static = static.format(**variables)
+    volatile = volatile.format(**variables)
+    if suffix:
+        suffix = suffix.format(**variables)
+        volatile = f"{volatile}\n\n{suffix}" if volatile else suffix
+    if model.startswith("anthropic/"):
+        blocks: list[str | dict[str, Any]] = [
+            {"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}
+        ]
+        if volatile:
+            blocks.append({"type": "text", "text": volatile})
+        return SystemMessage(content=blocks)
+    return SystemMessage(content=f"{static}\n\n{volatile}" if volatile else static)
+
+
+_usage: dict[str, dict[str, int]] = defaultdict(
+    lambda: {"calls": 0, "input_tokens": 0, "cache_read": 0, "cache_creation": 0}
+)
+_usage_lock = threading.Lock()
+
+
+def record_usage(node: str, message: Any) -> None:
+    """Add the token usage reported on ``message`` to the totals for ``node``."""
+    usage = message.usage_metadata if isinstance(message, AIMessage) else None
+    if not usage:
+        return
+    details = usage.get("input_token_details") or {}
+    cache_read = details.get("cache_read") or 0
+    cache_creation = details.get("cache_creation") or 0
+    with _usage_lock:
+        totals = _usage[node]
+        totals["calls"] += 1
+        totals["input_tokens"] += usage.get("input_tokens", 0)
+        totals["cache_read"] += cache_read
+        totals["cache_creation"] += cache_creation
+    logger.debug(
+        "🧊 %s: %s/%s input tokens read from the prompt cache, %s written",
+        node,
+        cache_read,
+        usage.get("input_tokens", 0),
+        cache_creation,
+    )
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Return the token usage totals per graph node."""
+    with _usage_lock:
+        return {node: dict(totals) for node, totals in _usage.items()}
+
+
+tracing.register_collector("prompt_tokens", stats)
@@ -12,3 +12,5 @@ QUERY_SYSTEM_PROMPT = """Generate search queries to retrieve documents that may
 </previous_queries>
 
 System time: {system_time}"""
+
+MULTI_QUERY_PROMPT = """Write {num_queries} differently-worded search queries for the user's latest question. Vary vocabulary and specificity (e.g. synonyms, expanded acronyms, a broader and a narrower phrasing) so that together they cover the ways the answer might be written."""
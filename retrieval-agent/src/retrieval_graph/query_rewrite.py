@@ -0,0 +1,169 @@
+"""Fast paths around the query-rewrite LLM call in ``generate_query``.
+
+Every follow-up turn normally asks the query model to turn the conversation
+into a standalone search query. Many follow-ups already are one ("What
+services does the cloud team offer?"), and repeated conversations produce the
+same rewrite over and over. This module provides:
+
+- ``needs_rewrite``: a cheap heuristic that says whether the latest message
+  depends on earlier turns (pronouns and other anaphora, very short or
+  elliptical messages, "what about ..." continuations).
+- ``RewriteCache``: an LRU of rewrites keyed on the normalised tail of the
+  conversation, the query model and the prompt.
+- Process-wide counters, exposed through ``stats()``, to tune both.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Sequence
+
+from langchain_core.messages import AnyMessage
+
+from retrieval_graph import tracing
+from retrieval_graph.resources import fingerprint
+from retrieval_graph.utils import get_message_text
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+ANAPHORA = frozenset(
+    "it its it's itself they them their theirs themselves he him his she her hers "
+    "this that these those there then such former latter one ones same above "
+    "previous earlier aforementioned".split()
+)
+"""Words that usually refer back to something said in an earlier turn."""
+
+CONTINUATIONS = (
+    "and ",
+    "also ",
+    "what about",
+    "how about",
+    "and what",
+    "why not",
+    "more ",
+    "tell me more",
+    "same ",
+    "or ",
+)
+"""Message prefixes that mark an elliptical follow-up."""
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def needs_rewrite(
+    message: str, previous_queries: Sequence[str] = (), *, min_words: int = 4
+) -> bool:
+    """Return whether ``message`` must be rewritten with the conversation context.
+
+    A message is considered self-contained, and safe to search as-is, when it
+    has at least ``min_words`` words, contains no anaphora, and does not start
+    like a continuation of the previous turn. A message that is mostly made up
+    of the words of a previous query is also searched as-is, since it restates
+    that query.
+
+    Examples:
+        >>> needs_rewrite("Which cloud migration services do you offer?")
+        False
+        >>> needs_rewrite("Who leads it?")
+        True
+        >>> needs_rewrite("and for Azure?")
+        True
+    """
+    words = _words(message)
+    if len(words) < min_words:
+        return True
+    normalized = " ".join(words) + " "
+    if normalized.startswith(CONTINUATIONS):
+        return True
+    unique = set(words)
+    for query in previous_queries:
+        if len(unique & set(_words(query))) / len(unique) >= 0.8:
+            return False
+    return any(word in ANAPHORA for word in words)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_words(text))
+
+
+class RewriteCache:
+    """An LRU of query rewrites keyed on the tail of the conversation.
+
+    Only the last ``tail_messages`` messages take part in the key, so the
+    same follow-up to the same answer hits the cache across threads. The
+    query model and a fingerprint of the system prompt are part of the key so
+    changing either never serves stale rewrites.
+    """
+
+    def __init__(self, max_entries: int = 2048, tail_messages: int = 3) -> None:
+        """Create an empty cache holding at most ``max_entries`` rewrites."""
+        self.max_entries = max_entries
+        self.tail_messages = tail_messages
+        self._entries: OrderedDict[str, list[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(
+        self, messages: Sequence[AnyMessage], model: str, prompt: str, variants: int
+    ) -> str:
+        """Build the cache key for rewriting ``messages``."""
+        tail = [
+            f"{m.type}:{_normalize(get_message_text(m))}"
+            for m in messages[-self.tail_messages :]
+        ]
+        return fingerprint(model, prompt, str(variants), *tail)
+
+    def get(self, key: str) -> list[str] | None:
+        """Return the cached rewrite for ``key``, if any."""
+        with self._lock:
+            queries = self._entries.get(key)
+            if queries is not None:
+                self._entries.move_to_end(key)
+            return queries
+
+    def put(self, key: str, queries: list[str]) -> None:
+        """Remember ``queries`` as the rewrite for ``key``."""
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = queries
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Return the number of cached rewrites."""
+        return len(self._entries)
+
+
+_counters = {"skipped": 0, "cache_hits": 0, "rewritten": 0}
+_counters_lock = threading.Lock()
+
+
+def record(outcome: str) -> None:
+    """Count one ``generate_query`` outcome: skipped, cache_hits or rewritten."""
+    with _counters_lock:
+        _counters[outcome] += 1
+
+
+def stats() -> dict[str, float]:
+    """Return the outcome counters and the skip and cache-hit rates.
+
+    Rates are relative to the follow-up turns that reached the fast paths.
+    """
+    with _counters_lock:
+        counts = dict(_counters)
+    total = sum(counts.values())
+    return {
+        **counts,
+        "skip_rate": counts["skipped"] / total if total else 0.0,
+        "cache_hit_rate": counts["cache_hits"] / total if total else 0.0,
+    }
+
+
+cache = RewriteCache(max_entries=int(os.environ.get("REWRITE_CACHE_SIZE", "2048")))
+"""The process-wide rewrite cache used by ``generate_query``."""
+
+tracing.register_collector("query_rewrite", stats)
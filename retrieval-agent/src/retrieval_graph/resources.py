@@ -0,0 +1,261 @@
+"""Process-wide pools for expensive, reusable clients.
+
+Embedding clients and vector store connections are costly to build (HTTP
+clients, TLS handshakes, index-existence checks), yet the graph nodes ask for
+them on every invocation. This module provides a small keyed registry that
+hands out the same instance for the same key across runs.
+
+Classes:
+    ResourcePool: A bounded, thread-safe registry with idle eviction.
+
+Functions:
+    fingerprint: Hash secrets so they can be part of a pool key.
+    shutdown: Close every resource held by every pool.
+"""
+
+import asyncio
+import atexit
+import hashlib
+import inspect
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, TypeVar
+
+from retrieval_graph import tracing
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+_pools: "weakref.WeakSet[ResourcePool]" = weakref.WeakSet()
+
+
+def fingerprint(*values: str | None) -> str:
+    """Return a short, stable digest of the given values.
+
+    Use this to include credentials in a pool key without keeping the raw
+    secret around in memory longer than needed.
+
+    Examples:
+        >>> fingerprint("a", None) == fingerprint("a", None)
+        True
+        >>> fingerprint("a") == fingerprint("b")
+        False
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(b"\x00" if value is None else value.encode())
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:16]
+
+
+_closing: set["asyncio.Task[Any]"] = set()
+"""Pending async closes, referenced so they are not garbage-collected."""
+
+
+def _closed(task: "asyncio.Task[Any]") -> None:
+    _closing.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(
+            "Failed to close pooled %s",
+            task.get_name(),
+            exc_info=task.exception(),
+        )
+
+
+def _close(resource: Any) -> None:
+    """Best-effort release of a pooled resource."""
+    for name in ("close", "aclose"):
+        closer = getattr(resource, name, None)
+        if not callable(closer):
+            continue
+        try:
+            result = closer()
+            if inspect.isawaitable(result):
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    asyncio.run(result)  # type: ignore[arg-type]
+                else:
+                    task: asyncio.Task[Any] = loop.create_task(
+                        result,  # type: ignore[arg-type]
+                        name=type(resource).__name__,
+                    )
+                    _closing.add(task)
+                    task.add_done_callback(_closed)
+        except Exception:
+            logger.warning(
+                "Failed to close pooled %s", type(resource).__name__, exc_info=True
+            )
+        return
+
+
+@dataclass
+class _Entry:
+    value: Any
+    last_used: float
+
+
+class ResourcePool:
+    """A keyed registry that reuses resources across graph invocations.
+
+    The pool is bounded (least recently used entries are evicted first) and
+    drops entries that have not been used for ``idle_ttl`` seconds. Evicted
+    resources are closed if they expose a ``close`` or ``aclose`` method.
+
+    Creation happens under a per-key lock, so concurrent callers asking for the
+    same key - from threads or from coroutines sharing a loop - build the
+    resource only once, while different keys are built in parallel.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_size: int | None = None,
+        idle_ttl: float | None = None,
+    ) -> None:
+        """Create a pool.
+
+        Args:
+            name: Used in log messages and stats.
+            max_size: Maximum number of live entries. Defaults to the
+                ``RESOURCE_POOL_SIZE`` environment variable, or 32.
+            idle_ttl: Seconds after which an unused entry is evicted. Defaults
+                to ``RESOURCE_POOL_IDLE_SECONDS``, or 900. Zero disables it.
+        """
+        self.name = name
+        self.max_size = max_size or int(os.environ.get("RESOURCE_POOL_SIZE", "32"))
+        self.idle_ttl = (
+            idle_ttl
+            if idle_ttl is not None
+            else float(os.environ.get("RESOURCE_POOL_IDLE_SECONDS", "900"))
+        )
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _pools.add(self)
+
+    def __len__(self) -> int:
+        """Return the number of live entries."""
+        return len(self._entries)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], R]) -> R:
+        """Return the resource stored under ``key``, building it if needed.
+
+        Args:
+            key: Any hashable value identifying the resource. Include every
+                input that changes the resulting object (provider, model,
+                endpoint, index, credential fingerprint).
+            factory: Zero-argument callable that builds the resource.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = self._sweep(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value: R = entry.value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        self._close_all(expired)
+        if entry is not None:
+            return value
+
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    self.hits += 1
+                    return entry.value  # type: ignore[no-any-return]
+            created = factory()
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(created, time.monotonic())
+                overflow = []
+                while len(self._entries) > self.max_size:
+                    old_key, old = self._entries.popitem(last=False)
+                    self._key_locks.pop(old_key, None)
+                    overflow.append(old.value)
+                    self.evictions += 1
+        logger.debug("Created %s entry (size=%d)", self.name, len(self._entries))
+        self._close_all(overflow)
+        return created
+
+    def evict(self, key: Hashable) -> bool:
+        """Drop and close the entry stored under ``key``, if any."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._key_locks.pop(key, None)
+            if entry is None:
+                return False
+            self.evictions += 1
+        _close(entry.value)
+        return True
+
+    def clear(self) -> None:
+        """Drop and close every entry in the pool."""
+        with self._lock:
+            values = [e.value for e in self._entries.values()]
+            self._entries.clear()
+            self._key_locks.clear()
+        self._close_all(values)
+
+    def values(self) -> list[Any]:
+        """Return the live resources, least recently used first."""
+        with self._lock:
+            return [entry.value for entry in self._entries.values()]
+
+    def stats(self) -> dict[str, int]:
+        """Return counters describing pool usage."""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _sweep(self, now: float) -> list[Any]:
+        """Remove idle entries. Must be called with ``self._lock`` held."""
+        if not self.idle_ttl:
+            return []
+        expired = [
+            k for k, e in self._entries.items() if now - e.last_used > self.idle_ttl
+        ]
+        values = []
+        for k in expired:
+            values.append(self._entries.pop(k).value)
+            self._key_locks.pop(k, None)
+            self.evictions += 1
+        return values
+
+    @staticmethod
+    def _close_all(values: list[Any]) -> None:
+        for value in values:
+            _close(value)
+
+
+def shutdown() -> None:
+    """Close every resource held by every pool.
+
+    Registered with ``atexit``; call it explicitly from server shutdown hooks
+    to release connections while the event loop is still running.
+    """
+    for pool in list(_pools):
+        pool.clear()
+
+
+atexit.register(shutdown)
+tracing.register_collector(
+    "resource_pool", lambda: {pool.name: pool.stats() for pool in list(_pools)}
+)
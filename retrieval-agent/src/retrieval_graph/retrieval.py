@@ -1,33 +1,95 @@
 """Manage the configuration of various retrievers.
 
 This module provides functionality to create and manage retrievers for different
-vector store backends, specifically Elasticsearch, Pinecone, and MongoDB.
+vector store backends, specifically Elasticsearch, Pinecone, MongoDB, Cognee and
+an in-process store persisted to local disk.
 
 The retrievers support filtering results by user_id to ensure data isolation between users.
+
+Encoders and vector stores are kept in process-wide pools (see
+``retrieval_graph.resources``) so that repeated node invocations reuse the same
+HTTP clients instead of reconnecting on every turn.
 """
 
+import asyncio
+import copy
 import logging
 import os
 from contextlib import contextmanager
 from typing import Generator
 
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnableConfig
 from langchain_core.vectorstores import VectorStoreRetriever
 
+from retrieval_graph import tracing
 from retrieval_graph.configuration import Configuration, IndexConfiguration
+from retrieval_graph.embedding_cache import CachedEmbeddings
+from retrieval_graph.fusion import reciprocal_rank_fusion
+from retrieval_graph.lexical import LexicalIndex
+from retrieval_graph.manifest import IndexManifest
+from retrieval_graph.resources import ResourcePool, fingerprint
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+
+_encoders = ResourcePool("encoders")
+_vector_stores = ResourcePool("vector_stores")
+# The BM25 index may be memory-only, so it must never be evicted.
+_lexical_indexes = ResourcePool("lexical_indexes", idle_ttl=0)
+_manifests = ResourcePool("manifests", idle_ttl=0)
+# Shared by the Cognee retrievers of every dataset on the same server.
+_http_transports = ResourcePool("http_transports")
+tracing.register_collector(
+    "embedding_cache",
+    lambda: {encoder.model: encoder.stats() for encoder in _encoders.values()},
+)
+
+# Environment variables whose values change the client a provider builds.
+_CREDENTIAL_ENV = {
+    "openai": ("OPENAI_API_KEY",),
+    "cohere": ("COHERE_API_KEY",),
+    "ollama": ("OLLAMA_BASE_URL",),
+    "azure_openai": (
+        "AZURE_OPENAI_ENDPOINT",
+        "AZURE_OPENAI_API_KEY",
+        "AZURE_OPENAI_API_VERSION",
+    ),
+}
+
+
+def _env_fingerprint(*names: str) -> str:
+    return fingerprint(*(os.environ.get(name) for name in names))
+
 
 ## Encoder constructors
 
 
 def make_text_encoder(model: str) -> Embeddings:
-    """Connect to the configured text encoder."""
-    logger.debug(f"🔧 make_text_encoder called with model: {model}")
+    """Connect to the configured text encoder.
+
+    Encoders are pooled per model name and credentials, so this is a dict
+    lookup after the first call. The returned encoder is wrapped in a
+    ``CachedEmbeddings`` so repeated texts are not re-embedded; see the
+    ``EMBEDDING_CACHE_SIZE`` and ``EMBEDDING_CACHE_PATH`` environment variables.
+    """
+    provider = model.split("/", maxsplit=1)[0]
+    key = (model, _env_fingerprint(*_CREDENTIAL_ENV.get(provider, ())))
+    return _encoders.get_or_create(
+        key,
+        lambda: CachedEmbeddings(
+            _build_text_encoder(model),
+            model,
+            max_entries=int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000")),
+            path=os.environ.get("EMBEDDING_CACHE_PATH") or None,
+        ),
+    )
+
+
+def _build_text_encoder(model: str) -> Embeddings:
+    logger.debug("🔧 make_text_encoder called with model: %s", model)
     provider, model = model.split("/", maxsplit=1)
-    logger.debug(f"📦 Provider: {provider}, Model: {model}")
+    logger.debug("📦 Provider: %s, Model: %s", provider, model)
 
     match provider:
         case "openai":
@@ -35,33 +97,38 @@ def make_text_encoder(model: str) -> Embeddings:
 
             # Check for API key
             api_key = os.environ.get("OPENAI_API_KEY")
-            logger.debug(f"🔑 OPENAI_API_KEY present: {bool(api_key)}")
-            if api_key:
-                logger.debug(f"🔑 OPENAI_API_KEY length: {len(api_key)}")
-                logger.debug(f"🔑 OPENAI_API_KEY prefix: {api_key[:10]}...")
+            logger.debug("🔑 OPENAI_API_KEY present: %s", bool(api_key))
 
-            logger.debug(f"🚀 Initializing OpenAIEmbeddings with model: {model}")
+            logger.debug("🚀 Initializing OpenAIEmbeddings with model: %s", model)
             try:
                 embeddings = OpenAIEmbeddings(model=model)
                 logger.debug("✅ OpenAIEmbeddings initialized successfully")
                 return embeddings
             except Exception as e:
                 logger.error(
-                    f"❌ Failed to initialize OpenAIEmbeddings: {type(e).__name__}: {e}"
+                    "❌ Failed to initialize OpenAIEmbeddings: %s: %s",
+                    type(e).__name__,
+                    e,
                 )
                 raise
 
         case "cohere":
             from langchain_cohere import CohereEmbeddings
 
-            logger.debug(f"🚀 Initializing CohereEmbeddings with model: {model}")
+            logger.debug("🚀 Initializing CohereEmbeddings with model: %s", model)
             return CohereEmbeddings(model=model)  # type: ignore
 
         case "ollama":
             from langchain_ollama import OllamaEmbeddings
 
-            base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
-            logger.debug(f"🚀 Initializing OllamaEmbeddings with model: {model}, base_url: {base_url}")
+            base_url = os.environ.get(
+                "OLLAMA_BASE_URL", "http://host.docker.internal:11434"
+            )
+            logger.debug(
+                "🚀 Initializing OllamaEmbeddings with model: %s, base_url: %s",
+                model,
+                base_url,
+            )
             return OllamaEmbeddings(model=model, base_url=base_url)  # type: ignore
 
         case "azure_openai":
@@ -71,17 +138,17 @@ def make_text_encoder(model: str) -> Embeddings:
             azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
             api_key = os.environ.get("AZURE_OPENAI_API_KEY")
             api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-10-21")
-            
-            logger.debug(f"🔑 AZURE_OPENAI_ENDPOINT present: {bool(azure_endpoint)}")
-            logger.debug(f"🔑 AZURE_OPENAI_API_KEY present: {bool(api_key)}")
-            logger.debug(f"🔑 API Version: {api_version}")
-            
+
+            logger.debug("🔑 AZURE_OPENAI_ENDPOINT present: %s", bool(azure_endpoint))
+            logger.debug("🔑 AZURE_OPENAI_API_KEY present: %s", bool(api_key))
+            logger.debug("🔑 API Version: %s", api_version)
+
             if not azure_endpoint or not api_key:
                 raise ValueError(
                     "AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY must be set for azure_openai provider"
                 )
 
-            logger.debug(f"🚀 Initializing AzureOpenAIEmbeddings with model: {model}")
+            logger.debug("🚀 Initializing AzureOpenAIEmbeddings with model: %s", model)
             try:
                 embeddings = AzureOpenAIEmbeddings(
                     model=model,
@@ -93,7 +160,9 @@ def make_text_encoder(model: str) -> Embeddings:
                 return embeddings
             except Exception as e:
                 logger.error(
-                    f"❌ Failed to initialize AzureOpenAIEmbeddings: {type(e).__name__}: {e}"
+                    "❌ Failed to initialize AzureOpenAIEmbeddings: %s: %s",
+                    type(e).__name__,
+                    e,
                 )
                 raise
 
@@ -121,11 +190,23 @@ def make_elastic_retriever(
     else:
         connection_options = {"es_api_key": os.environ["ELASTICSEARCH_API_KEY"]}
 
-    vstore = ElasticsearchStore(
-        **connection_options,  # type: ignore
-        es_url=os.environ["ELASTICSEARCH_URL"],
-        index_name="langchain_index_1536",
-        embedding=embedding_model,
+    es_url = os.environ["ELASTICSEARCH_URL"]
+    index_name = "langchain_index_1536"
+    key = (
+        configuration.retriever_provider,
+        configuration.embedding_model,
+        es_url,
+        index_name,
+        fingerprint(*map(str, connection_options.values())),
+    )
+    vstore = _vector_stores.get_or_create(
+        key,
+        lambda: ElasticsearchStore(
+            **connection_options,  # type: ignore
+            es_url=es_url,
+            index_name=index_name,
+            embedding=embedding_model,
+        ),
     )
 
     search_kwargs = configuration.search_kwargs
@@ -146,8 +227,18 @@ def make_pinecone_retriever(
 
     search_filter = search_kwargs.setdefault("filter", {})
     search_filter.update({"user_id": configuration.user_id})
-    vstore = PineconeVectorStore.from_existing_index(
-        os.environ["PINECONE_INDEX_NAME"], embedding=embedding_model
+    index_name = os.environ["PINECONE_INDEX_NAME"]
+    key = (
+        "pinecone",
+        configuration.embedding_model,
+        index_name,
+        _env_fingerprint("PINECONE_API_KEY"),
+    )
+    vstore = _vector_stores.get_or_create(
+        key,
+        lambda: PineconeVectorStore.from_existing_index(
+            index_name, embedding=embedding_model
+        ),
     )
     yield vstore.as_retriever(search_kwargs=search_kwargs)
 
@@ -159,10 +250,20 @@ def make_mongodb_retriever(
     """Configure this agent to connect to a specific MongoDB Atlas index & namespaces."""
     from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
 
-    vstore = MongoDBAtlasVectorSearch.from_connection_string(
-        os.environ["MONGODB_URI"],
-        namespace="langgraph_retrieval_agent.default",
-        embedding=embedding_model,
+    namespace = "langgraph_retrieval_agent.default"
+    key = (
+        "mongodb",
+        configuration.embedding_model,
+        namespace,
+        _env_fingerprint("MONGODB_URI"),
+    )
+    vstore = _vector_stores.get_or_create(
+        key,
+        lambda: MongoDBAtlasVectorSearch.from_connection_string(
+            os.environ["MONGODB_URI"],
+            namespace=namespace,
+            embedding=embedding_model,
+        ),
     )
     search_kwargs = configuration.search_kwargs
     pre_filter = search_kwargs.setdefault("pre_filter", {})
@@ -175,7 +276,12 @@ def make_cognee_retriever(
     configuration: IndexConfiguration, embedding_model: Embeddings
 ) -> Generator[VectorStoreRetriever, None, None]:
     """Configure this agent to connect to Cognee knowledge graph retriever."""
+    from langchain_cognee import cache, scheduler
     from langchain_cognee.retrievers import CogneeRetriever
+    from langchain_cognee.transport import CogneeTransport
+
+    tracing.register_collector("cognify_jobs", scheduler.stats)
+    tracing.register_collector("cognee_search_cache", cache.stats)
 
     # Get OpenAI API key from environment
     openai_api_key = os.environ.get("OPENAI_API_KEY")
@@ -192,36 +298,96 @@ def make_cognee_retriever(
 
     # Get dataset_name from configuration
     dataset_name = getattr(configuration, "dataset_name", "main_dataset")
+    search_type = configuration.search_kwargs.get(
+        "search_type", configuration.cognee_search_type
+    )
+    datasets = configuration.search_kwargs.get("datasets")
 
     logger.debug(
-        f"🧠 Initializing Cognee retriever with dataset: {dataset_name}, k={k}, api_url={api_url}"
+        "🧠 Initializing Cognee retriever with dataset: %s, k=%s, search_type=%s, "
+        "api_url=%s",
+        dataset_name,
+        k,
+        search_type,
+        api_url,
     )
 
-    retriever = CogneeRetriever(
-        llm_api_key=openai_api_key,
-        dataset_name=dataset_name,
-        k=k,
-        api_url=api_url,
+    transport = _http_transports.get_or_create(
+        ("cognee", api_url),
+        lambda: CogneeTransport(
+            api_url,
+            event_hooks=tracing.httpx_event_hooks("cognee_http"),
+            sync_event_hooks=tracing.httpx_event_hooks("cognee_http", sync=True),
+        ),
+    )
+    key = (
+        "cognee",
+        api_url,
+        dataset_name,
+        k,
+        search_type,
+        tuple(datasets or ()),
+        fingerprint(openai_api_key),
+    )
+    retriever = _vector_stores.get_or_create(
+        key,
+        lambda: CogneeRetriever(
+            llm_api_key=openai_api_key,
+            dataset_name=dataset_name,
+            k=k,
+            search_type=search_type,
+            datasets=datasets,
+            api_url=api_url,
+            transport=transport,
+        ),
     )
 
-    logger.debug("✅ Cognee retriever initialized successfully")
+    logger.debug("✅ Cognee retriever ready")
     yield retriever
 
 
+@contextmanager
+def make_local_retriever(
+    configuration: IndexConfiguration, embedding_model: Embeddings
+) -> Generator[VectorStoreRetriever, None, None]:
+    """Configure this agent to use the in-process, memory-mapped vector store."""
+    from retrieval_graph.local_store import LocalVectorStore
+
+    base_path = os.environ.get("LOCAL_VECTOR_STORE_PATH", ".vector_store")
+    # Vectors from different models have different dimensions, so each model
+    # gets its own directory.
+    path = os.path.join(base_path, configuration.embedding_model.replace("/", "__"))
+    index = os.environ.get("LOCAL_VECTOR_INDEX", "flat")
+    if index not in ("flat", "ivf"):
+        raise ValueError(f"Unsupported LOCAL_VECTOR_INDEX: {index}")
+    vstore = _vector_stores.get_or_create(
+        ("local", os.path.abspath(path), index),
+        lambda: LocalVectorStore(path, embedding_model, index=index),  # type: ignore[arg-type]
+    )
+    search_kwargs = configuration.search_kwargs
+    search_filter = search_kwargs.setdefault("filter", {})
+    search_filter.update({"user_id": configuration.user_id})
+    yield vstore.as_retriever(search_kwargs=search_kwargs)
+
+
 @contextmanager
 def make_retriever(
     config: RunnableConfig,
 ) -> Generator[VectorStoreRetriever, None, None]:
     """Create a retriever for the agent, based on the current configuration."""
     logger.debug("🔍 make_retriever called")
-    logger.debug(f"📋 Config: {config}")
+    logger.debug("📋 Config: %s", config)
 
     configuration = IndexConfiguration.from_runnable_config(config)
+    # The retriever constructors add the user filter to search_kwargs; work on
+    # a copy so concurrent searches sharing one config do not see each other's
+    # filters.
+    configuration.search_kwargs = copy.deepcopy(configuration.search_kwargs)
     logger.debug("⚙️ Configuration loaded:")
-    logger.debug(f"  - user_id: {configuration.user_id}")
-    logger.debug(f"  - embedding_model: {configuration.embedding_model}")
-    logger.debug(f"  - retriever_provider: {configuration.retriever_provider}")
-    logger.debug(f"  - search_kwargs: {configuration.search_kwargs}")
+    logger.debug("  - user_id: %s", configuration.user_id)
+    logger.debug("  - embedding_model: %s", configuration.embedding_model)
+    logger.debug("  - retriever_provider: %s", configuration.retriever_provider)
+    logger.debug("  - search_kwargs: %s", configuration.search_kwargs)
 
     embedding_model = make_text_encoder(configuration.embedding_model)
     # user_id = configuration.user_id
@@ -244,9 +410,62 @@ def make_retriever(
             with make_cognee_retriever(configuration, embedding_model) as retriever:
                 yield retriever
 
+        case "local":
+            with make_local_retriever(configuration, embedding_model) as retriever:
+                yield retriever
+
         case _:
             raise ValueError(
                 "Unrecognized retriever_provider in configuration. "
                 f"Expected one of: {', '.join(Configuration.__annotations__['retriever_provider'].__args__)}\n"
                 f"Got: {configuration.retriever_provider}"
             )
+
+
+def make_manifest() -> IndexManifest:
+    """Return the process-wide manifest of indexed sources.
+
+    The manifest is stored at ``INDEX_MANIFEST_PATH`` when set; otherwise it is
+    kept in memory and every source is re-indexed after a restart.
+    """
+    path = os.environ.get("INDEX_MANIFEST_PATH") or None
+    return _manifests.get_or_create(path, lambda: IndexManifest(path))
+
+
+def make_lexical_index() -> LexicalIndex:
+    """Return the process-wide BM25 index used by hybrid retrieval.
+
+    The write log lives at ``LEXICAL_INDEX_PATH`` when set; otherwise the index
+    is kept in memory only and must be re-populated after a restart.
+    """
+    path = os.environ.get("LEXICAL_INDEX_PATH") or None
+    return _lexical_indexes.get_or_create(path, lambda: LexicalIndex(path))
+
+
+async def asearch(config: RunnableConfig, query: str) -> list[Document]:
+    """Search the configured retriever for ``query``.
+
+    In ``hybrid`` retrieval mode the vector search and the BM25 search run
+    concurrently and their rankings are merged with reciprocal rank fusion.
+    """
+    configuration = IndexConfiguration.from_runnable_config(config)
+    provider = configuration.retriever_provider
+
+    async def vector_search() -> list[Document]:
+        with tracing.span("vector_search", provider=provider):
+            return await retriever.ainvoke(query, config)
+
+    def lexical_search(index: LexicalIndex, k: int) -> list[Document]:
+        with tracing.span("lexical_search"):
+            return index.search(configuration.user_id, query, k)
+
+    with make_retriever(config) as retriever:
+        if configuration.retrieval_mode != "hybrid":
+            return await vector_search()
+        k = configuration.search_kwargs.get("k", 4)
+        lexical = make_lexical_index()
+        vector_docs, lexical_docs = await asyncio.gather(
+            vector_search(),
+            asyncio.to_thread(lexical_search, lexical, k),
+        )
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], limit=k)
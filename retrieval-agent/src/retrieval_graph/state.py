@@ -27,11 +27,18 @@ from langchain_core.documents import Document
 from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
 
+from retrieval_graph.blobstore import DocumentRef
+
 ############################  Doc Indexing State  #############################
 
 
+def _text_id(text: str) -> str:
+    # Derived from the content so re-uploading the same text is idempotent.
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, text))
+
+
 def reduce_docs(
-    existing: Sequence[Document] | None,
+    existing: Sequence[Document | DocumentRef] | None,
     new: Union[
         Sequence[Document],
         Sequence[dict[str, Any]],
@@ -39,7 +46,7 @@ def reduce_docs(
         str,
         Literal["delete"],
     ],
-) -> Sequence[Document]:
+) -> Sequence[Document | DocumentRef]:
     """Reduce and process documents based on the input type.
 
     This function handles various input types and converts them into a sequence of Document objects.
@@ -49,19 +56,22 @@ def reduce_docs(
         existing (Optional[Sequence[Document]]): The existing docs in the state, if any.
         new (Union[Sequence[Document], Sequence[dict[str, Any]], Sequence[str], str, Literal["delete"]]):
             The new input to process. Can be a sequence of Documents, dictionaries, strings, a single string,
-            or the literal "delete".
+            or the literal "delete". Dictionaries with a ``blob`` or ``path`` key become
+            ``DocumentRef``s whose text is read only while indexing.
     """
     if new == "delete":
         return []
     if isinstance(new, str):
-        return [Document(page_content=new, metadata={"id": str(uuid.uuid4())})]
+        return [Document(page_content=new, metadata={"id": _text_id(new)})]
     if isinstance(new, list):
-        coerced = []
+        coerced: list[Document | DocumentRef] = []
         for item in new:
             if isinstance(item, str):
                 coerced.append(
-                    Document(page_content=item, metadata={"id": str(uuid.uuid4())})
+                    Document(page_content=item, metadata={"id": _text_id(item)})
                 )
+            elif isinstance(item, dict) and ("blob" in item or "path" in item):
+                coerced.append(DocumentRef(**item))
             elif isinstance(item, dict):
                 coerced.append(Document(**item))
             else:
@@ -80,8 +90,14 @@ class IndexState:
     these documents.
     """
 
-    docs: Annotated[Sequence[Document], reduce_docs]
-    """A list of documents that the agent can index."""
+    docs: Annotated[Sequence[Document | DocumentRef], reduce_docs]
+    """A list of documents, or references to their text, that the agent can index."""
+    job: str = ""
+    """Fingerprint of the ``docs`` that ``cursor`` refers to."""
+    cursor: int = 0
+    """Number of ``docs`` indexed and committed by earlier steps of this job."""
+    elapsed: float = 0.0
+    """Seconds spent indexing by earlier steps of this job."""
 
 
 #############################  Agent State  ###################################
@@ -154,6 +170,16 @@ class State(InputState):
     queries: Annotated[list[str], add_queries] = field(default_factory=list)
     """A list of search queries that the agent has generated."""
 
+    query_variants: list[str] = field(default_factory=list)
+    """The queries generated for the current turn. When multi-query fan-out is
+    enabled this holds several phrasings, which are all searched."""
+
+    speculative_query: str = ""
+    """The raw user message searched by the speculative retrieval node."""
+
+    speculative_docs: list[Document] = field(default_factory=list)
+    """Documents retrieved for ``speculative_query`` while the query was rewritten."""
+
     retrieved_docs: list[Document] = field(default_factory=list)
     """Populated by the retriever. This is a list of documents that the agent can reference."""
 
@@ -0,0 +1,365 @@
+"""Lightweight latency tracing and Prometheus metrics for the graphs.
+
+Spans time a block of code and feed a latency histogram per span name and
+labels; nothing is buffered per request, so the memory cost is fixed. Graph
+nodes are wrapped with ``traced`` and open the root span of their execution;
+sub-spans (embedding calls, vector and lexical search, Cognee HTTP requests)
+use ``span``. LLM calls are timed by the ``LLMTimer`` callback, which also
+records time to first token when the model streams.
+
+Sampling is decided once per root span with probability
+``TRACING_SAMPLE_RATE`` (default ``1.0``): every span opened inside an
+unsampled node execution is skipped at the cost of a context-variable read.
+
+``render_prometheus()`` formats the histograms, span error counters and the
+stats of registered collectors (caches, pools) in the Prometheus text
+exposition format; ``retrieval_graph.webapp`` serves it on ``/metrics``.
+"""
+
+import bisect
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Mapping, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGenerationChunk, GenerationChunk
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"""Histogram bucket upper bounds, in seconds."""
+
+SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", "1.0"))
+
+_sampled: ContextVar[bool | None] = ContextVar("retrieval_graph_sampled", default=None)
+
+Labels = tuple[tuple[str, str], ...]
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+class Histogram:
+    """A fixed-bucket latency histogram."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Create an empty histogram with the given bucket upper bounds."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate the ``q`` quantile as the upper bound of its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+_histograms: dict[tuple[str, Labels], Histogram] = {}
+_errors: dict[tuple[str, Labels], int] = {}
+_collectors: dict[str, Callable[[], Mapping[str, Any]]] = {}
+_listeners: list[Callable[[str, float, Labels], None]] = []
+_lock = threading.Lock()
+
+
+def _labels(labels: Mapping[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    """Record a duration for span ``name`` directly."""
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+    for listener in _listeners:
+        listener(name, seconds, key[1])
+
+
+def add_listener(listener: Callable[[str, float, Labels], None]) -> None:
+    """Call ``listener(name, seconds, labels)`` for every recorded span.
+
+    Use it to keep raw durations, e.g. for exact percentiles in benchmarks.
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[str, float, Labels], None]) -> None:
+    """Stop calling a listener added with ``add_listener``."""
+    _listeners.remove(listener)
+
+
+def sampled() -> bool:
+    """Return whether the current execution is being traced."""
+    return _sampled.get() is not False
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[None]:
+    """Time the enclosed block as span ``name``.
+
+    The outermost span of an execution makes the sampling decision; nested
+    spans follow it.
+    """
+    token = None
+    if _sampled.get() is None:
+        token = _sampled.set(random.random() < SAMPLE_RATE)
+    try:
+        if not _sampled.get():
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            key = (name, _labels(labels))
+            with _lock:
+                _errors[key] = _errors.get(key, 0) + 1
+            raise
+        finally:
+            observe(name, time.perf_counter() - start, **labels)
+    finally:
+        if token is not None:
+            _sampled.reset(token)
+
+
+def traced(name: str | None = None) -> Callable[[F], F]:
+    """Decorate an async graph node so each call is recorded as a span.
+
+    ``functools.wraps`` keeps the node's name and signature, which LangGraph
+    uses for the node id and to decide whether to pass ``config``.
+    """
+
+    def decorator(func: F) -> F:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class LLMTimer(BaseCallbackHandler):
+    """Callback handler that records LLM call latency and time to first token.
+
+    Attach one instance to every chat model; runs are tracked by ``run_id``
+    and labelled with the graph node and model name from the run metadata.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        """Create a timer with no runs in flight."""
+        self._runs: dict[UUID, tuple[float, dict[str, Any], bool]] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start timing a chat model run."""
+        if not sampled():
+            return
+        metadata = metadata or {}
+        labels = {
+            "node": metadata.get("langgraph_node"),
+            "model": metadata.get("ls_model_name"),
+        }
+        self._runs[run_id] = (time.perf_counter(), labels, False)
+
+    def on_llm_new_token(
+        self,
+        token: str | list[str | dict[str, Any]],
+        *,
+        chunk: GenerationChunk | ChatGenerationChunk | None = None,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        tags: list[str] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Record time to first token on the first streamed token."""
+        run = self._runs.get(run_id)
+        if run is None or run[2]:
+            return
+        start, labels, _ = run
+        self._runs[run_id] = (start, labels, True)
+        observe("llm_time_to_first_token", time.perf_counter() - start, **labels)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the total duration of a chat model run."""
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            observe("llm_call", time.perf_counter() - run[0], **run[1])
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """Count a failed run as a span error."""
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            key = ("llm_call", _labels(run[1]))
+            with _lock:
+                _errors[key] = _errors.get(key, 0) + 1
+
+
+llm_timer = LLMTimer()
+"""The shared ``LLMTimer`` attached to pooled chat models."""
+
+
+def httpx_event_hooks(
+    name: str, *, sync: bool = False, **labels: Any
+) -> dict[str, list[Callable[..., Any]]]:
+    """Return ``httpx.AsyncClient`` event hooks that time each request as ``name``.
+
+    The duration runs from sending the request to receiving the response
+    headers, labelled with the request method and path. Pass ``sync=True`` for
+    the hooks of an ``httpx.Client``.
+    """
+
+    def start(request: Any) -> None:
+        request.extensions["retrieval_graph_start"] = time.perf_counter()
+
+    def stop(response: Any) -> None:
+        start = response.request.extensions.get("retrieval_graph_start")
+        if start is not None and sampled():
+            observe(
+                name,
+                time.perf_counter() - start,
+                method=response.request.method,
+                path=response.request.url.path,
+                **labels,
+            )
+
+    if sync:
+        return {"request": [start], "response": [stop]}
+
+    async def on_request(request: Any) -> None:
+        start(request)
+
+    async def on_response(response: Any) -> None:
+        stop(response)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def register_collector(name: str, collect: Callable[[], Mapping[str, Any]]) -> None:
+    """Export the numbers returned by ``collect`` as gauges named ``name_<key>``.
+
+    ``collect`` returns a mapping of metric names to numbers, or of label
+    values to such mappings (exported with a ``key`` label).
+    """
+    _collectors[name] = collect
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = (*labels, *extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def render_prometheus(prefix: str = "retrieval_graph") -> str:
+    """Return all metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {
+            k: (h.buckets, list(h.counts), h.sum, h.count)
+            for k, h in _histograms.items()
+        }
+        errors = dict(_errors)
+
+    metric = f"{prefix}_span_duration_seconds"
+    lines = [
+        f"# HELP {metric} Duration of traced spans.",
+        f"# TYPE {metric} histogram",
+    ]
+    for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+        span_labels = (("span", name), *labels)
+        cumulative = 0
+        for bound, bucket_count in zip((*buckets, float("inf")), counts):
+            cumulative += bucket_count
+            le = (("le", _format_bound(bound)),)
+            lines.append(
+                f"{metric}_bucket{_format_labels(span_labels, le)} {cumulative}"
+            )
+        lines.append(f"{metric}_sum{_format_labels(span_labels)} {total}")
+        lines.append(f"{metric}_count{_format_labels(span_labels)} {count}")
+
+    metric = f"{prefix}_span_errors_total"
+    lines += [
+        f"# HELP {metric} Traced spans that raised.",
+        f"# TYPE {metric} counter",
+    ]
+    for (name, labels), count in sorted(errors.items()):
+        lines.append(f"{metric}{_format_labels((('span', name), *labels))} {count}")
+
+    gauges: dict[str, list[str]] = {}
+    for collector, collect in list(_collectors.items()):
+        for key, value in collect().items():
+            if isinstance(value, Mapping):
+                for field, number in value.items():
+                    name = f"{prefix}_{collector}_{field}"
+                    key_labels = _format_labels((("key", str(key)),))
+                    gauges.setdefault(name, []).append(
+                        f"{name}{key_labels} {float(number)}"
+                    )
+            else:
+                name = f"{prefix}_{collector}_{key}"
+                gauges.setdefault(name, []).append(f"{name} {float(value)}")
+    for name, samples in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Drop all recorded spans. Intended for tests and benchmarks."""
+    with _lock:
+        _histograms.clear()
+        _errors.clear()
@@ -10,14 +10,19 @@ Functions:
 
 import logging
 import os
+from typing import Any
 
 from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
 from langchain_core.messages import AnyMessage
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+from retrieval_graph import tracing
+from retrieval_graph.resources import ResourcePool, fingerprint
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 
 def get_message_text(msg: AnyMessage) -> str:
@@ -101,67 +106,107 @@ def format_docs(docs: list[Document] | None) -> str:
 </documents>"""
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
-    """Load a chat model from a fully specified name.
+_chat_models = ResourcePool("chat_models")
 
-    Args:
-        fully_specified_name (str): String in the format 'provider/model'.
-    """
-    logger.debug(f"🤖 load_chat_model called with: {fully_specified_name}")
+_CHAT_CREDENTIAL_ENV = {
+    "openai": ("OPENAI_API_KEY",),
+    "anthropic": ("ANTHROPIC_API_KEY",),
+    "azure_openai": ("AZURE_OPENAI_API_KEY",),
+}
 
-    if "/" in fully_specified_name:
-        provider, model = fully_specified_name.split("/", maxsplit=1)
-    else:
-        provider = ""
-        model = fully_specified_name
-
-    logger.debug(f"📦 Provider: {provider}, Model: {model}")
 
-    # Prepare configurable parameters for specific providers
+def _provider_kwargs(provider: str) -> dict[str, str]:
+    """Return the provider-specific keyword arguments for ``init_chat_model``."""
     config_kwargs = {}
-    
-    # Log API keys status for common providers
-    if provider == "openai":
-        api_key = os.environ.get("OPENAI_API_KEY")
-        logger.debug(f"🔑 OPENAI_API_KEY present: {bool(api_key)}")
-        if api_key:
-            logger.debug(f"🔑 OPENAI_API_KEY length: {len(api_key)}")
-    elif provider == "anthropic":
-        api_key = os.environ.get("ANTHROPIC_API_KEY")
-        logger.debug(f"🔑 ANTHROPIC_API_KEY present: {bool(api_key)}")
-        if api_key:
-            logger.debug(f"🔑 ANTHROPIC_API_KEY length: {len(api_key)}")
-    elif provider == "azure_openai":
+    if provider == "azure_openai":
         # Azure OpenAI requires specific configuration parameters
         # Reference: https://learn.microsoft.com/en-us/azure/ai-services/openai/reference
         azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-        azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-        azure_api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-10-21")
-        
-        logger.debug(f"🔑 AZURE_OPENAI_API_KEY present: {bool(azure_api_key)}")
-        logger.debug(f"🌐 AZURE_OPENAI_ENDPOINT: {azure_endpoint}")
-        logger.debug(f"📅 AZURE_OPENAI_API_VERSION: {azure_api_version}")
-        
         if azure_endpoint:
             config_kwargs["azure_endpoint"] = azure_endpoint
-        
+
         # API version is required for Azure OpenAI
         # See: https://learn.microsoft.com/en-us/azure/ai-services/openai/reference#rest-api-versioning
-        config_kwargs["api_version"] = azure_api_version
+        config_kwargs["api_version"] = os.environ.get(
+            "AZURE_OPENAI_API_VERSION", "2024-10-21"
+        )
     elif provider == "ollama":
-        base_url = os.environ.get("OLLAMA_BASE_URL", "http://host.docker.internal:11434")
-        logger.debug(f"🦙 OLLAMA_BASE_URL: {base_url}")
-        config_kwargs["base_url"] = base_url
+        config_kwargs["base_url"] = os.environ.get(
+            "OLLAMA_BASE_URL", "http://host.docker.internal:11434"
+        )
+    return config_kwargs
+
+
+def _init_chat_model(
+    provider: str, model: str, config_kwargs: dict[str, str]
+) -> BaseChatModel:
+    """Build a chat model client. Called once per pool key."""
+    logger.debug("📦 Provider: %s, Model: %s", provider, model)
+    for name in _CHAT_CREDENTIAL_ENV.get(provider, ()):
+        logger.debug("🔑 %s present: %s", name, bool(os.environ.get(name)))
 
     logger.debug("🚀 Initializing chat model...")
     try:
         if config_kwargs:
-            logger.debug(f"🔧 Passing config kwargs: {config_kwargs}")
-            chat_model = init_chat_model(model, model_provider=provider, **config_kwargs)
+            logger.debug("🔧 Passing config kwargs: %s", config_kwargs)
+            chat_model = init_chat_model(
+                model, model_provider=provider, **config_kwargs
+            )
         else:
             chat_model = init_chat_model(model, model_provider=provider)
         logger.debug("✅ Chat model initialized successfully")
+        chat_model.callbacks = [tracing.llm_timer]
         return chat_model
     except Exception as e:
-        logger.error(f"❌ Failed to initialize chat model: {type(e).__name__}: {e}")
+        logger.error("❌ Failed to initialize chat model: %s: %s", type(e).__name__, e)
         raise
+
+
+def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+    """Load a chat model from a fully specified name.
+
+    Initialized models are pooled per process, keyed by the name, the
+    provider keyword arguments and a fingerprint of the provider credentials,
+    so repeated calls return the same client (and its HTTP connection pool).
+    Chat models are stateless between calls and safe to share across
+    concurrent runs.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+    """
+    if "/" in fully_specified_name:
+        provider, model = fully_specified_name.split("/", maxsplit=1)
+    else:
+        provider = ""
+        model = fully_specified_name
+
+    config_kwargs = _provider_kwargs(provider)
+    credentials = fingerprint(
+        *(os.environ.get(name) for name in _CHAT_CREDENTIAL_ENV.get(provider, ()))
+    )
+    key = (provider, model, tuple(sorted(config_kwargs.items())), credentials)
+    return _chat_models.get_or_create(
+        key, lambda: _init_chat_model(provider, model, config_kwargs)
+    )
+
+
+def load_structured_model(
+    fully_specified_name: str, schema: type[BaseModel], *, include_raw: bool = False
+) -> Runnable[LanguageModelInput, Any]:
+    """Load a chat model bound to structured output with ``schema``.
+
+    Building the structured-output wrapper (tool schema conversion and output
+    parser) costs more than loading the model itself, so the wrapper is pooled
+    alongside it.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'.
+        schema (type[BaseModel]): The Pydantic model to parse responses into.
+        include_raw (bool): Return ``{"raw", "parsed", "parsing_error"}``
+            instead of the parsed object, to read the raw message's metadata.
+    """
+    model = load_chat_model(fully_specified_name)
+    return _chat_models.get_or_create(
+        ("structured", id(model), schema, include_raw),
+        lambda: model.with_structured_output(schema, include_raw=include_raw),
+    )
@@ -0,0 +1,61 @@
+"""Custom HTTP routes served alongside the graphs by the LangGraph server.
+
+Registered through the ``http.app`` entry of ``langgraph.json``. Starlette is
+provided by the LangGraph API server that loads this app.
+"""
+
+import asyncio
+import os
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from retrieval_graph import tracing
+from retrieval_graph.blobstore import blob_store
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    """Serve span latency histograms and cache/pool stats for Prometheus."""
+    return PlainTextResponse(
+        tracing.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+async def put_blob(request: Request) -> JSONResponse:
+    """Stream the request body into the blob store and return its key.
+
+    Index the payload by passing ``{"blob": key}`` in the index graph's ``docs``.
+    Bodies larger than ``BLOB_MAX_BYTES`` (default 100 MiB) are refused with
+    413. File writes run in a worker thread so uploads do not block the loop.
+    """
+    limit = int(os.environ.get("BLOB_MAX_BYTES", str(100 << 20)))
+    too_large = JSONResponse(
+        {"detail": f"Payload exceeds {limit} bytes."}, status_code=413
+    )
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        return too_large
+    writer = await asyncio.to_thread(blob_store().writer)
+    size = 0
+    try:
+        async for data in request.stream():
+            size += len(data)
+            if size > limit:
+                await asyncio.to_thread(writer.abort)
+                return too_large
+            await asyncio.to_thread(writer.write, data)
+        key = await asyncio.to_thread(writer.commit)
+    except BaseException:
+        writer.abort()
+        raise
+    return JSONResponse({"blob": key}, status_code=201)
+
+
+app = Starlette(
+    routes=[
+        Route("/metrics", metrics),
+        Route("/blobs", put_blob, methods=["POST"]),
+    ]
+)
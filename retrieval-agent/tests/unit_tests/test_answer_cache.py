@@ -0,0 +1,30 @@
+import time
+
+from retrieval_graph.answer_cache import AnswerCache
+
+
+def test_answer_cache_scopes_by_user_and_documents() -> None:
+    cache = AnswerCache(max_entries=10, ttl=0)
+    cache.put("alice", "docs-a", [1.0, 0.0], "answer", generation=0)
+
+    assert cache.get("alice", "docs-a", [1.0, 0.01], threshold=0.95) == "answer"
+    assert cache.get("alice", "docs-a", [0.0, 1.0], threshold=0.95) is None
+    assert cache.get("alice", "docs-b", [1.0, 0.0], threshold=0.95) is None
+    assert cache.get("bob", "docs-a", [1.0, 0.0], threshold=0.95) is None
+    assert cache.stats()["hit_rate"] == 0.25
+
+
+def test_answer_cache_evicts_expires_and_ignores_stale_writes() -> None:
+    cache = AnswerCache(max_entries=1, ttl=0.01)
+    cache.put("alice", "s", [1.0, 0.0], "first", generation=0)
+    cache.put("alice", "s", [0.0, 1.0], "second", generation=0)
+    assert cache.get("alice", "s", [1.0, 0.0], threshold=0.9) is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.02)
+    assert cache.get("alice", "s", [0.0, 1.0], threshold=0.9) is None
+
+    generation = cache.generation("alice")
+    cache.invalidate("alice")
+    cache.put("alice", "s", [1.0, 0.0], "stale", generation=generation)
+    assert cache.get("alice", "s", [1.0, 0.0], threshold=0.9) is None
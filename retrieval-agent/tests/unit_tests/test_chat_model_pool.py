@@ -0,0 +1,26 @@
+from retrieval_graph import utils
+
+
+def test_load_chat_model_reuses_clients_per_credentials(monkeypatch) -> None:
+    built: list[tuple[str, str]] = []
+
+    def fake_init(provider, model, config_kwargs):
+        built.append((provider, model))
+        return object()
+
+    monkeypatch.setattr(utils, "_init_chat_model", fake_init)
+    monkeypatch.setenv("OPENAI_API_KEY", "first")
+    utils._chat_models.clear()
+
+    model = utils.load_chat_model("openai/gpt-4o-mini")
+    assert utils.load_chat_model("openai/gpt-4o-mini") is model
+    assert utils.load_chat_model("openai/gpt-4o") is not model
+
+    monkeypatch.setenv("OPENAI_API_KEY", "rotated")
+    assert utils.load_chat_model("openai/gpt-4o-mini") is not model
+    assert built == [
+        ("openai", "gpt-4o-mini"),
+        ("openai", "gpt-4o"),
+        ("openai", "gpt-4o-mini"),
+    ]
+    utils._chat_models.clear()
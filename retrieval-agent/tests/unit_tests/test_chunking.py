@@ -0,0 +1,48 @@
+from langchain_core.documents import Document
+
+from retrieval_graph import chunking
+from retrieval_graph.context import estimate_tokens
+
+TEXT = "\n\n".join(
+    f"## Section {i}\n\n" + " ".join(f"Sentence {i}.{j} has words." for j in range(20))
+    for i in range(5)
+)
+
+
+def test_chunks_fit_the_budget_and_cover_the_text() -> None:
+    spans = chunking.split_text(TEXT, chunk_tokens=50, overlap_tokens=10)
+
+    assert len(spans) > 5
+    assert all(estimate_tokens(TEXT[s:e]) <= 50 for s, e in spans)
+    # Consecutive chunks overlap or touch; nothing but whitespace is skipped.
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert start <= end or not TEXT[end:start].strip()
+    assert any(start < end for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def test_iter_chunks_carries_parent_and_offsets() -> None:
+    doc = Document(page_content=TEXT, id="doc-1", metadata={"source": "a.md"})
+
+    chunks = list(chunking.iter_chunks([doc], chunk_tokens=50, overlap_tokens=10))
+
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert chunk.id == f"doc-1:{chunk.metadata['chunk_index']}"
+        assert chunk.metadata["parent_id"] == "doc-1"
+        assert chunk.metadata["source"] == "a.md"
+        start, end = chunk.metadata["start_index"], chunk.metadata["end_index"]
+        assert TEXT[start:end] == chunk.page_content
+    assert list(chunking.iter_chunks([doc], chunk_tokens=0)) == [doc]
+
+
+def test_process_pool_matches_inline_splitting(monkeypatch) -> None:
+    docs = [Document(page_content=TEXT * (i + 1), id=str(i)) for i in range(6)]
+    inline = list(chunking.iter_chunks(docs, chunk_tokens=40, overlap_tokens=8))
+
+    monkeypatch.setattr(chunking, "PROCESSES", 2)
+    monkeypatch.setattr(chunking, "PARALLEL_MIN_CHARS", 0)
+    pooled = list(chunking.iter_chunks(docs, chunk_tokens=40, overlap_tokens=8))
+
+    assert pooled == inline
+    chunking.shutdown()
+    assert chunking._executor is None
@@ -0,0 +1,190 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+from langchain_cognee import CogneeRetriever
+from langchain_cognee import transport as transport_module
+from langchain_cognee.cache import SearchCache
+from langchain_cognee.scheduler import CognifyScheduler
+from langchain_cognee.transport import CogneeTransport
+
+
+def _retriever(handler, **kwargs) -> CogneeRetriever:
+    transport = CogneeTransport(
+        "http://cognee.test", http_transport=httpx.MockTransport(handler)
+    )
+    kwargs.setdefault("cache_searches", False)
+    return CogneeRetriever(llm_api_key="key", transport=transport, **kwargs)
+
+
+def test_transport_is_loop_safe_and_times_out_per_operation() -> None:
+    timeouts: dict[str, float] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts[request.url.path] = request.extensions["timeout"]["read"]
+        return httpx.Response(200, json=["Paris is in France."])
+
+    retriever = _retriever(handler)
+    transport = retriever.transport
+    assert transport is not None
+
+    async def search():
+        docs = await retriever.ainvoke("Paris")
+        # The sync path works inside a running event loop too.
+        assert retriever.invoke("Paris") == docs
+        return transport.async_client
+
+    # Each event loop gets its own client, reused across its calls.
+    first, second = asyncio.run(search()), asyncio.run(search())
+    assert first is not second
+    retriever.process_data()
+    assert timeouts == {"/api/v1/search": 30.0, "/api/v1/cognify": 600.0}
+
+    transport.close()
+    assert retriever.invoke("Paris")[0].page_content == "Paris is in France."
+
+
+def test_uploads_are_batched_deduplicated_and_retried(monkeypatch) -> None:
+    monkeypatch.setattr(transport_module, "BACKOFF_BASE_SECONDS", 0.0)
+    uploads: list[list[bytes]] = []
+    failures = [1]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if failures[0]:
+            failures[0] -= 1
+            return httpx.Response(503)
+        body = request.read()
+        uploads.append([line for line in body.split(b"\r\n") if b"filename=" in line])
+        return httpx.Response(200, json={})
+
+    retriever = _retriever(handler, upload_batch_files=2, upload_concurrency=2)
+    docs = [Document(page_content=f"Doc {i % 5}.") for i in range(10)]
+    asyncio.run(retriever.aadd_documents(docs))
+
+    assert sorted(len(batch) for batch in uploads) == [1, 2, 2]
+    names = {line for batch in uploads for line in batch}
+    assert len(names) == 5
+    retriever.add_documents(docs[:2])
+    assert set(uploads[-1]) <= names
+
+
+def test_a_failed_upload_stops_scheduling_batches() -> None:
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(400)
+
+    retriever = _retriever(handler, upload_batch_files=1, upload_concurrency=1)
+    docs = [Document(page_content=f"Doc {i}.") for i in range(5)]
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(retriever.aadd_documents(docs))
+    assert requests == ["/api/v1/add"]
+
+
+def test_cognify_requests_are_coalesced_and_polled() -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/v1/cognify":
+            return httpx.Response(200, json={"run": {"dataset_id": "d1"}})
+        done = calls.count("/api/v1/datasets/status") > 1
+        status = "DATASET_PROCESSING_COMPLETED" if done else "STARTED"
+        return httpx.Response(200, json={"d1": status})
+
+    retriever = _retriever(handler, dataset_name="docs")
+    assert retriever.transport is not None
+    scheduler = CognifyScheduler(retriever.transport, debounce=0.05, poll_interval=0)
+
+    def broken_listener(dataset: str) -> None:
+        raise RuntimeError("listener failed")
+
+    scheduler.add_listener(broken_listener)
+    for _ in range(3):
+        job = scheduler.request("docs")
+    assert job.state == "pending" and job.requests == 3
+
+    job = scheduler.wait("docs", timeout=5)
+    assert job is not None and job.state == "completed"
+    assert calls.count("/api/v1/cognify") == 1
+    assert scheduler.stats()["completed"] == 1
+
+
+def test_search_sends_type_top_k_and_datasets_and_keeps_structure() -> None:
+    payloads: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        results = [
+            {"id": "c1", "text": "Paris is in France.", "score": 0.9, "chunk_index": 0},
+            {"id": "c2", "text": "Lyon is in France.", "score": 0.7, "chunk_index": 3},
+        ]
+        return httpx.Response(
+            200, json=[{"dataset_name": "geo", "search_result": results}]
+        )
+
+    retriever = _retriever(handler, search_type="CHUNKS", datasets=["geo"], k=1)
+    [doc] = retriever.invoke("France")
+    assert payloads[-1] == {
+        "query": "France",
+        "search_type": "CHUNKS",
+        "top_k": 1,
+        "datasets": ["geo"],
+    }
+    assert doc.id == "c1" and doc.page_content == "Paris is in France."
+    assert doc.metadata == {
+        "id": "c1",
+        "chunk_index": 0,
+        "score": 0.9,
+        "search_type": "CHUNKS",
+        "dataset_name": "geo",
+    }
+
+    docs = asyncio.run(retriever.ainvoke("France", k=2, search_type="SUMMARIES"))
+    assert payloads[-1]["search_type"] == "SUMMARIES" and len(docs) == 2
+
+
+def test_searches_are_cached_until_the_dataset_changes(tmp_path) -> None:
+    searches = [0]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/v1/search":
+            searches[0] += 1
+            return httpx.Response(200, json=[f"answer {searches[0]}"])
+        return httpx.Response(200, json={})
+
+    cache = SearchCache(path=tmp_path / "search.sqlite")
+    retriever = _retriever(handler, search_cache=cache)
+
+    assert retriever.invoke("Where is Paris?")[0].page_content == "answer 1"
+    assert retriever.invoke("  where is  paris? ")[0].page_content == "answer 1"
+    assert retriever.invoke("Where is Paris?", k=2)[0].page_content == "answer 2"
+
+    retriever.add_documents([Document(page_content="Paris moved.")])
+    assert retriever.invoke("Where is Paris?")[0].page_content == "answer 3"
+    retriever.prune()
+    assert retriever.invoke("Where is Paris?")[0].page_content == "answer 4"
+
+    # A new process sharing the file sees the same generations and results.
+    reopened = _retriever(
+        handler, search_cache=SearchCache(path=tmp_path / "search.sqlite")
+    )
+    assert reopened.invoke("Where is Paris?")[0].page_content == "answer 4"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 4
+
+
+def test_cached_results_are_isolated_from_callers() -> None:
+    cache = SearchCache()
+    doc = Document(page_content="Paris", metadata={"tags": ["city"]})
+    cache.put("k", ["geo"], [doc])
+    doc.metadata["tags"].append("changed")
+
+    first = cache.get("k")
+    assert first is not None and first[0].metadata == {"tags": ["city"]}
+    first[0].metadata["tags"].append("changed")
+    second = cache.get("k")
+    assert second is not None and second[0].metadata == {"tags": ["city"]}
@@ -0,0 +1,21 @@
+from langchain_core.documents import Document
+
+from retrieval_graph.context import estimate_tokens, pack_docs
+
+
+def test_pack_docs_respects_budget_and_rank_order() -> None:
+    words = " ".join(f"word{i}" for i in range(400))
+    docs = [
+        Document(page_content="The data practice is led by Jane.", id="best"),
+        Document(page_content=words, metadata={"source": "long.md", "user_id": "u"}),
+        Document(page_content="Cloud services include migration.", id="short"),
+    ]
+
+    packed = pack_docs(docs, token_budget=200)
+    assert estimate_tokens(packed) <= 200
+    assert packed.index("Jane") < packed.index("word0") < packed.index("migration")
+    assert "source='long.md'" in packed
+    assert "user_id" not in packed
+    assert packed.count("…") == 1
+
+    assert "word399" in pack_docs(docs, token_budget=0)
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retrieval_graph.embedding_cache import CachedEmbeddings
+
+
+def test_cache_dedups_and_counts() -> None:
+    emb = CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake/8")
+    first = emb.embed_documents(["a", "b", "a"])
+    assert first[0] == first[2]
+    assert emb.embed_documents(["b"])[0] == pytest.approx(first[1], rel=1e-6)
+    assert emb.stats()["misses"] == 2
+    assert emb.stats()["hits"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path: Path) -> None:
+    path = tmp_path / "emb.sqlite3"
+    emb = CachedEmbeddings(DeterministicFakeEmbedding(size=8), "fake/8", path=path)
+    vector = emb.embed_query("hello")
+    emb.close()
+
+    reopened = CachedEmbeddings(
+        DeterministicFakeEmbedding(size=8), "fake/8", max_entries=0, path=path
+    )
+    cached = reopened.embed_query("hello")
+    assert reopened.stats()["disk_hits"] == 1
+    assert cached == pytest.approx(vector, rel=1e-6)
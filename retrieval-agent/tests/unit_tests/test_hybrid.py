@@ -0,0 +1,36 @@
+from langchain_core.documents import Document
+
+from retrieval_graph.fusion import reciprocal_rank_fusion
+from retrieval_graph.index_graph import ensure_docs_have_user_id
+from retrieval_graph.lexical import LexicalIndex
+
+
+def test_bm25_prefers_exact_terms_and_isolates_users() -> None:
+    index = LexicalIndex()
+    index.add_documents(
+        "alice",
+        [
+            Document(page_content="Jane Doe leads the data practice.", id="1"),
+            Document(page_content="We offer cloud migration services.", id="2"),
+        ],
+    )
+    index.add_documents("bob", [Document(page_content="Data practice notes", id="3")])
+
+    results = index.search("alice", "who leads the data practice", k=1)
+    assert [d.id for d in results] == ["1"]
+    assert index.search("carol", "data", k=5) == []
+
+
+def test_rrf_dedups_and_rewards_agreement() -> None:
+    a, b, c = (Document(page_content=t, id=t) for t in "abc")
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], limit=2)
+    assert [d.id for d in fused] == ["b", "a"]
+
+
+def test_identical_text_gets_a_distinct_id_per_user() -> None:
+    doc = Document(page_content="Quarterly numbers")
+    (alice,) = ensure_docs_have_user_id([doc], {"configurable": {"user_id": "alice"}})
+    (bob,) = ensure_docs_have_user_id([doc], {"configurable": {"user_id": "bob"}})
+    assert alice.id != bob.id
+    again = ensure_docs_have_user_id([doc], {"configurable": {"user_id": "alice"}})
+    assert again[0].id == alice.id
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+
+from retrieval_graph import indexing
+from retrieval_graph.context import estimate_tokens
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def _docs(n: int) -> list[Document]:
+    return [Document(page_content="x" * 40, id=str(i)) for i in range(n)]
+
+
+def test_batches_are_bounded_concurrent_and_retried(monkeypatch) -> None:
+    monkeypatch.setattr(indexing, "BACKOFF_BASE_SECONDS", 0.0)
+    stored, sizes, in_flight, peak = [], [], [0], [0]
+    throttled = [False]
+
+    async def upsert(batch):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.001)
+            if len(stored) >= 20 and not throttled[0]:
+                throttled[0] = True
+                raise RateLimitError
+            sizes.append(len(batch))
+            stored.extend(doc.id for doc in batch)
+        finally:
+            in_flight[0] -= 1
+
+    run = asyncio.run(
+        indexing.upsert_batches(
+            iter(_docs(100)),
+            upsert,
+            batch_size=10,
+            batch_tokens=80,  # 10 tokens per doc: at most 8 docs per batch.
+            concurrency=3,
+            count=estimate_tokens,
+        )
+    )
+
+    assert sorted(stored, key=int) == [str(i) for i in range(100)]
+    assert max(sizes) == 8
+    assert peak[0] == 3
+    assert run.docs == 100 and run.tokens == 1000 and run.retries == 1
+
+
+def test_other_errors_fail_the_job() -> None:
+    async def upsert(batch):
+        raise ValueError("bad document")
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            indexing.upsert_batches(
+                iter(_docs(5)),
+                upsert,
+                batch_size=2,
+                batch_tokens=1000,
+                concurrency=2,
+                count=estimate_tokens,
+            )
+        )
@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retrieval_graph.local_store import LocalVectorStore
+
+
+def test_local_store_filters_by_user_and_persists(tmp_path: Path) -> None:
+    embedding = DeterministicFakeEmbedding(size=16)
+    store = LocalVectorStore(tmp_path, embedding)
+    store.add_documents(
+        [
+            Document(page_content="cats swim", metadata={"user_id": "a"}),
+            Document(page_content="dogs run", metadata={"user_id": "a"}),
+            Document(page_content="cats swim", metadata={"user_id": "b"}),
+        ]
+    )
+
+    results = store.similarity_search("cats swim", k=1, filter={"user_id": "a"})
+    assert [d.page_content for d in results] == ["cats swim"]
+    assert results[0].metadata["user_id"] == "a"
+
+    reopened = LocalVectorStore(tmp_path, embedding)
+    assert len(reopened) == 3
+    assert len(reopened.similarity_search("cats", k=5, filter={"user_id": "b"})) == 1
+
+
+def test_local_store_upsert_and_delete(tmp_path: Path) -> None:
+    store = LocalVectorStore(tmp_path, DeterministicFakeEmbedding(size=8))
+    store.add_texts(["old"], [{"user_id": "a"}], ids=["doc-1"])
+    store.add_texts(["new"], [{"user_id": "a"}], ids=["doc-1"])
+    results = store.similarity_search("old", k=5, filter={"user_id": "a"})
+    assert [d.page_content for d in results] == ["new"]
+
+    store.delete(["doc-1"])
+    assert store.similarity_search("new", k=5, filter={"user_id": "a"}) == []
+
+
+def test_local_store_skips_tombstones_without_overfetching(tmp_path: Path) -> None:
+    store = LocalVectorStore(tmp_path, DeterministicFakeEmbedding(size=8))
+    store.add_texts([str(i) for i in range(50)], ids=[str(i) for i in range(50)])
+    store.delete([str(i) for i in range(1, 50)])
+    store.add_texts(["fresh"], ids=["fresh"])
+
+    results = store.similarity_search("0", k=5)
+    assert sorted(d.page_content for d in results) == ["0", "fresh"]
+
+
+def test_ivf_index_trains_and_finds_neighbours(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16))
+    store = LocalVectorStore(
+        tmp_path, DeterministicFakeEmbedding(size=16), index="ivf", exact_search_rows=0
+    )
+    assert store._ivf is not None
+    store._ivf.min_train_rows = 100
+    store._append([str(i) for i in range(300)], vectors, [{"user_id": "a"}] * 300, None)
+    assert store._ivf.trained
+
+    query = vectors[42].tolist()
+    results = store.similarity_search_by_vector(
+        query, k=1, filter={"user_id": "a"}, nprobe=4
+    )
+    assert results[0].page_content == "42"
+
+    assert not list(tmp_path.rglob("*.tmp"))
+
+    # A crash between writing the centroids and the assignments leaves no
+    # assignments; they are rebuilt when the store is opened.
+    for assign in tmp_path.rglob("ivf_assign*"):
+        assign.unlink()
+    reopened = LocalVectorStore(
+        tmp_path, DeterministicFakeEmbedding(size=16), index="ivf", exact_search_rows=0
+    )
+    assert reopened._ivf is not None and reopened._ivf.trained
+    results = reopened.similarity_search_by_vector(
+        query, k=1, filter={"user_id": "a"}, nprobe=4
+    )
+    assert results[0].page_content == "42"
+
+
+def test_ivf_trains_on_open_and_probes_wider_for_small_partitions(
+    tmp_path: Path,
+) -> None:
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((4200, 16))
+    users = [{"user_id": "small" if i % 100 == 0 else "big"} for i in range(4200)]
+    flat = LocalVectorStore(tmp_path, DeterministicFakeEmbedding(size=16))
+    flat._append([str(i) for i in range(4200)], vectors, users, None)
+
+    store = LocalVectorStore(
+        tmp_path, DeterministicFakeEmbedding(size=16), index="ivf", exact_search_rows=0
+    )
+    assert store._ivf is not None and store._ivf.trained
+
+    results = store.similarity_search_by_vector(
+        vectors[0].tolist(), k=10, filter={"user_id": "small"}, nprobe=1
+    )
+    assert len(results) == 10
+    assert results[0].page_content == "0"
@@ -0,0 +1,175 @@
+import asyncio
+import sys
+from contextlib import contextmanager
+
+import pytest
+from langchain_core.documents import Document
+from langgraph.checkpoint.memory import InMemorySaver
+
+from retrieval_graph import retrieval
+from retrieval_graph.blobstore import DocumentRef, blob_store
+from retrieval_graph.manifest import IndexManifest
+from retrieval_graph.state import IndexState, reduce_docs
+
+index_graph_module = sys.modules["retrieval_graph.index_graph"]
+
+
+class FakeStore:
+    def __init__(self) -> None:
+        self.docs: dict[str, Document] = {}
+        self.upserts = 0
+
+    async def aadd_documents(self, docs):
+        self.upserts += len(docs)
+        self.docs.update((doc.id, doc) for doc in docs)
+
+    async def adelete(self, ids):
+        for id_ in ids:
+            self.docs.pop(id_, None)
+
+
+class FakeRetriever:
+    def __init__(self, store: FakeStore) -> None:
+        self.vectorstore = store
+
+    async def aadd_documents(self, docs):
+        await self.vectorstore.aadd_documents(docs)
+
+
+def test_reindexing_only_touches_changed_sources(monkeypatch) -> None:
+    store, manifest = FakeStore(), IndexManifest()
+
+    @contextmanager
+    def make_retriever(config):
+        yield FakeRetriever(store)
+
+    monkeypatch.setattr(retrieval, "make_retriever", make_retriever)
+    monkeypatch.setattr(retrieval, "make_manifest", lambda: manifest)
+
+    def index(docs, **configurable):
+        config = {
+            "configurable": {
+                "user_id": "u1",
+                "retriever_provider": "local",
+                "chunk_tokens": 10,
+                "chunk_overlap_tokens": 0,
+                **configurable,
+            }
+        }
+        state = IndexState(docs=reduce_docs(None, docs))
+        asyncio.run(index_graph_module.index_docs(state, config=config))
+
+    long_text = "\n\n".join(f"Paragraph {i} has a few words." for i in range(4))
+    a = Document(page_content=long_text, id="a.md")
+    b = Document(page_content="Short file.", id="b.md")
+    index([a, b])
+    assert store.upserts == len(store.docs) == 5
+
+    index([a, b])
+    assert store.upserts == 5
+
+    index([Document(page_content="Now shorter.", id="a.md"), b])
+    assert store.upserts == 6
+    assert sorted(d.page_content for d in store.docs.values()) == [
+        "Now shorter.",
+        "Short file.",
+    ]
+
+    index([b], index_prune=True)
+    assert [d.page_content for d in store.docs.values()] == ["Short file."]
+
+    # Plain strings get content-derived ids, so re-uploading them is a no-op.
+    index(["Same text."])
+    index(["Same text."])
+    assert store.upserts == 7
+
+    # Caller metadata cannot redirect the manifest, even without chunking.
+    spoofed = Document(page_content="Whole.", id="c.md", metadata={"parent_id": "x"})
+    index([spoofed], chunk_tokens=0)
+    assert store.upserts == 8
+
+
+def test_references_are_read_lazily_and_confined(monkeypatch, tmp_path) -> None:
+    store, manifest = FakeStore(), IndexManifest()
+
+    @contextmanager
+    def make_retriever(config):
+        yield FakeRetriever(store)
+
+    monkeypatch.setattr(retrieval, "make_retriever", make_retriever)
+    monkeypatch.setattr(retrieval, "make_manifest", lambda: manifest)
+    monkeypatch.setenv("BLOB_STORE_PATH", str(tmp_path / "blobs"))
+    monkeypatch.setenv("INDEX_FILE_ROOT", str(tmp_path / "files"))
+    (tmp_path / "files").mkdir()
+    (tmp_path / "files" / "notes.md").write_text("Notes on files.")
+    key = blob_store().put("Text from a blob.")
+
+    def index(docs):
+        config = {"configurable": {"user_id": "u1", "retriever_provider": "local"}}
+        state = IndexState(docs=reduce_docs(None, docs))
+        assert all(isinstance(doc, DocumentRef) for doc in state.docs)
+        return asyncio.run(index_graph_module.index_docs(state, config=config))
+
+    assert index([{"blob": key}, {"path": "notes.md"}])["docs"] == "delete"
+    assert sorted(d.page_content for d in store.docs.values()) == [
+        "Notes on files.",
+        "Text from a blob.",
+    ]
+    index([{"blob": key}, {"path": "notes.md"}])
+    assert store.upserts == 2
+
+    with pytest.raises(ValueError):
+        index([{"path": "../outside.md"}])
+
+
+def test_failed_jobs_resume_after_the_last_committed_step(monkeypatch) -> None:
+    store, manifest = FakeStore(), IndexManifest()
+    failures = [1]
+
+    class FlakyRetriever(FakeRetriever):
+        async def aadd_documents(self, docs):
+            if store.upserts >= 4 and failures[0]:
+                failures[0] -= 1
+                raise ValueError("provider down")
+            await super().aadd_documents(docs)
+
+    @contextmanager
+    def make_retriever(config):
+        yield FlakyRetriever(store)
+
+    planned: list[int] = []
+    plan = manifest.plan
+
+    def counting_plan(user_id, namespace, docs, **kwargs):
+        planned.append(len(docs))
+        return plan(user_id, namespace, docs, **kwargs)
+
+    monkeypatch.setattr(retrieval, "make_retriever", make_retriever)
+    monkeypatch.setattr(retrieval, "make_manifest", lambda: manifest)
+    monkeypatch.setattr(manifest, "plan", counting_plan)
+    graph = index_graph_module.builder.compile(checkpointer=InMemorySaver())
+    config = {
+        "configurable": {
+            "thread_id": "t1",
+            "user_id": "u1",
+            "retriever_provider": "local",
+            "index_step_docs": 2,
+            "index_batch_size": 1,
+        }
+    }
+    docs = [Document(page_content=f"Doc {i}.", id=f"{i}.md") for i in range(5)]
+
+    async def run(input):
+        return [
+            event async for event in graph.astream(input, config, stream_mode="custom")
+        ]
+
+    with pytest.raises(ValueError):
+        asyncio.run(run({"docs": docs}))
+    events = asyncio.run(run(None))
+
+    assert store.upserts == 5
+    assert planned == [2, 2, 1, 1]  # Committed steps are not planned again.
+    progress = [event["indexing"] for event in events]
+    assert progress[-1]["docs_done"] == progress[-1]["docs_total"] == 5
+    assert progress[-1]["eta_seconds"] == 0
@@ -0,0 +1,76 @@
+import asyncio
+import sys
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from retrieval_graph import query_rewrite, retrieval
+from retrieval_graph.state import State
+
+graph_module = sys.modules["retrieval_graph.graph"]
+
+
+class FakeStructuredModel:
+    def __init__(self, parsed) -> None:
+        self.parsed = parsed
+
+    async def ainvoke(self, messages, config=None):
+        return {
+            "raw": AIMessage(content=""),
+            "parsed": self.parsed,
+            "parsing_error": None,
+        }
+
+
+def test_query_variants_are_parsed_and_deduplicated(monkeypatch) -> None:
+    generated = graph_module.SearchQueries(
+        queries=["data lead", "", "  Data   LEAD ", "head of data", "   ", "x", "y"]
+    )
+    schemas: list[type] = []
+
+    def load_structured_model(name, schema, include_raw=False):
+        schemas.append(schema)
+        return FakeStructuredModel(generated)
+
+    monkeypatch.setattr(graph_module, "load_structured_model", load_structured_model)
+    monkeypatch.setattr(query_rewrite, "cache", query_rewrite.RewriteCache())
+    config = {"configurable": {"num_queries": 3}}
+
+    state = State(messages=[HumanMessage(content="Who leads the data practice?")])
+    result = asyncio.run(graph_module.generate_query(state, config))
+    assert schemas == [graph_module.SearchQueries]
+    assert result["query_variants"] == ["data lead", "head of data", "x"]
+    assert result["queries"] == result["query_variants"]
+
+    generated.queries = ["", " "]
+    state = State(messages=[HumanMessage(content="Who runs the cloud team?")])
+    result = asyncio.run(graph_module.generate_query(state, config))
+    assert result["query_variants"] == ["Who runs the cloud team?"]
+
+
+def test_variants_are_searched_concurrently_and_fused_to_k(monkeypatch) -> None:
+    in_flight, peak = [0], [0]
+    rankings = {
+        "a": ["d1", "d2", "d3"],
+        "b": ["d2", "d1", "d4"],
+        "c": ["d2", "d5"],
+    }
+
+    async def fake_search(config, query):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return [Document(page_content=id_, id=id_) for id_ in rankings[query]]
+
+    monkeypatch.setattr(retrieval, "asearch", fake_search)
+    state = State(
+        messages=[HumanMessage(content="q")],
+        queries=["a", "b", "c"],
+        query_variants=["a", "b", "c"],
+    )
+    config = {"configurable": {"search_kwargs": {"k": 2}}}
+
+    result = asyncio.run(graph_module.retrieve(state, config))
+    assert peak[0] == 3
+    assert [d.id for d in result["retrieved_docs"]] == ["d2", "d1"]
@@ -0,0 +1,41 @@
+from retrieval_graph import prompts
+from retrieval_graph.prompt_cache import system_message
+
+
+def test_system_message_puts_static_instructions_first() -> None:
+    variables = {"retrieved_docs": "<documents/>", "system_time": "T"}
+
+    anthropic = system_message(
+        prompts.RESPONSE_SYSTEM_PROMPT, variables, model="anthropic/claude"
+    )
+    static, volatile = anthropic.content
+    assert static["cache_control"] == {"type": "ephemeral"}
+    assert "{" not in static["text"] and "<documents/>" not in static["text"]
+    assert volatile["text"] == "<documents/>\n\nSystem time: T"
+
+    openai = system_message(
+        prompts.RESPONSE_SYSTEM_PROMPT, variables, model="openai/gpt-4o"
+    )
+    assert openai.content == f"{static['text']}\n\n{volatile['text']}"
+
+    other_docs = system_message(
+        prompts.RESPONSE_SYSTEM_PROMPT,
+        {**variables, "retrieved_docs": "<documents>x</documents>"},
+        model="openai/gpt-4o",
+    )
+    assert other_docs.content.startswith(static["text"])
+
+
+def test_multi_query_instructions_come_after_the_previous_queries() -> None:
+    message = system_message(
+        prompts.QUERY_SYSTEM_PROMPT,
+        {"queries": "first query", "num_queries": 3, "system_time": "T"},
+        model="anthropic/claude",
+        suffix=prompts.MULTI_QUERY_PROMPT,
+    )
+    static, volatile = message.content
+    assert "Write 3" not in static["text"]
+    text = volatile["text"]
+    assert text.index("first query") < text.index("</previous_queries>")
+    assert text.index("</previous_queries>") < text.index("Write 3")
+    assert text.endswith(prompts.MULTI_QUERY_PROMPT.format(num_queries=3))
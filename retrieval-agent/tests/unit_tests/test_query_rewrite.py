@@ -0,0 +1,36 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from retrieval_graph.query_rewrite import RewriteCache, needs_rewrite
+
+
+def test_needs_rewrite_detects_context_dependent_follow_ups() -> None:
+    assert not needs_rewrite("What cloud migration services do you offer?")
+    assert needs_rewrite("Who leads that team?")
+    assert needs_rewrite("What about the Azure practice?")
+    assert needs_rewrite("pricing?")
+    # Restating an earlier standalone query needs no context.
+    assert not needs_rewrite(
+        "who leads the data practice then",
+        ["who leads the data practice at the company"],
+    )
+
+
+def test_rewrite_cache_keys_on_normalized_tail() -> None:
+    cache = RewriteCache(max_entries=1, tail_messages=2)
+    conversation = [
+        HumanMessage(content="Tell me about the data team"),
+        AIMessage(content="It builds pipelines."),
+        HumanMessage(content="Who leads it?"),
+    ]
+    key = cache.key(conversation, "model", "prompt", 1)
+    cache.put(key, ["data team lead"])
+
+    other_start = [HumanMessage(content="hi"), *conversation[1:]]
+    reformatted = [*conversation[:2], HumanMessage(content="  who LEADS it ")]
+    assert cache.get(cache.key(other_start, "model", "prompt", 1)) == ["data team lead"]
+    assert cache.get(cache.key(reformatted, "model", "prompt", 1)) == ["data team lead"]
+    assert cache.get(cache.key(conversation, "other-model", "prompt", 1)) is None
+
+    cache.put("other", ["x"])
+    assert cache.get(key) is None
+    assert len(cache) == 1
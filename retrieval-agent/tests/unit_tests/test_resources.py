@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+from retrieval_graph import resources
+from retrieval_graph.resources import ResourcePool
+
+
+class _Closable:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_pool_reuses_and_evicts_lru() -> None:
+    pool = ResourcePool("test", max_size=2, idle_ttl=0)
+    a = pool.get_or_create("a", _Closable)
+    assert pool.get_or_create("a", _Closable) is a
+    pool.get_or_create("b", _Closable)
+    pool.get_or_create("a", _Closable)  # "b" is now least recently used
+    pool.get_or_create("c", _Closable)
+    assert len(pool) == 2
+    assert not a.closed
+    assert pool.stats()["evictions"] == 1
+
+
+def test_pool_clear_closes_resources() -> None:
+    pool = ResourcePool("test", max_size=4, idle_ttl=0)
+    a = pool.get_or_create("a", _Closable)
+    pool.clear()
+    assert a.closed
+    assert len(pool) == 0
+
+
+def test_async_closes_are_kept_alive_and_failures_logged(caplog) -> None:
+    class _AsyncClosable:
+        async def aclose(self) -> None:
+            await asyncio.sleep(0)
+            raise RuntimeError("close failed")
+
+    async def evict() -> None:
+        pool = ResourcePool("test", max_size=4, idle_ttl=0)
+        pool.get_or_create("a", _AsyncClosable)
+        pool.evict("a")
+        assert len(resources._closing) == 1
+        await asyncio.gather(*resources._closing, return_exceptions=True)
+
+    with caplog.at_level(logging.WARNING, logger=resources.__name__):
+        asyncio.run(evict())
+    assert not resources._closing
+    assert "Failed to close pooled _AsyncClosable" in caplog.text
@@ -0,0 +1,42 @@
+import asyncio
+import sys
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from retrieval_graph import retrieval
+from retrieval_graph.state import State
+
+graph_module = sys.modules["retrieval_graph.graph"]
+
+
+def test_speculative_docs_reused_only_for_matching_queries(monkeypatch) -> None:
+    searched: list[str] = []
+
+    async def fake_search(config, query):
+        searched.append(query)
+        return [Document(page_content=query, id=query)]
+
+    monkeypatch.setattr(retrieval, "asearch", fake_search)
+    monkeypatch.setattr(
+        retrieval,
+        "make_text_encoder",
+        lambda model: DeterministicFakeEmbedding(size=16),
+    )
+    speculative = [Document(page_content="speculative", id="s")]
+    config = {"configurable": {"search_kwargs": {"k": 4}}}
+
+    state = State(
+        messages=[("user", "Who leads the data practice?")],
+        queries=["Who leads the data practice?"],
+        speculative_query="Who leads the data practice?",
+        speculative_docs=speculative,
+    )
+    result = asyncio.run(graph_module.retrieve_with_speculation(state, config=config))
+    assert result["retrieved_docs"] == speculative
+    assert searched == []
+
+    state.queries = ["data practice lead"]
+    result = asyncio.run(graph_module.retrieve_with_speculation(state, config=config))
+    assert [d.id for d in result["retrieved_docs"]] == ["data practice lead"]
+    assert searched == ["data practice lead"]
@@ -0,0 +1,75 @@
+import asyncio
+import inspect
+from itertools import cycle
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from retrieval_graph import tracing
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+    tracing.reset()
+    yield
+    tracing.reset()
+
+
+def test_spans_feed_histograms_and_prometheus_text() -> None:
+    @tracing.traced()
+    async def node(state, *, config):
+        with tracing.span("vector_search", provider="local"):
+            pass
+        return {}
+
+    assert list(inspect.signature(node).parameters) == ["state", "config"]
+    asyncio.run(node({}, config={}))
+    with pytest.raises(ValueError), tracing.span("respond"):
+        raise ValueError
+
+    text = tracing.render_prometheus()
+    assert 'retrieval_graph_span_duration_seconds_count{span="node"} 1' in text
+    assert (
+        'retrieval_graph_span_duration_seconds_bucket{span="vector_search",'
+        'provider="local",le="+Inf"} 1'
+    ) in text
+    assert 'retrieval_graph_span_errors_total{span="respond"} 1' in text
+
+
+def test_unsampled_root_skips_nested_spans(monkeypatch) -> None:
+    monkeypatch.setattr(tracing, "SAMPLE_RATE", 0.0)
+    with tracing.span("respond"), tracing.span("embedding"):
+        pass
+    assert "span=" not in tracing.render_prometheus()
+
+
+def test_listeners_receive_raw_durations() -> None:
+    seen = []
+
+    def listener(name, seconds, labels):
+        seen.append((name, labels))
+
+    tracing.add_listener(listener)
+    try:
+        with tracing.span("retrieve", provider="local"):
+            pass
+    finally:
+        tracing.remove_listener(listener)
+    tracing.observe("respond", 0.1)
+    assert seen == [("retrieve", (("provider", "local"),))]
+
+
+def test_llm_timer_records_call_and_time_to_first_token() -> None:
+    model = GenericFakeChatModel(
+        messages=cycle([AIMessage(content="a b c")]), callbacks=[tracing.llm_timer]
+    )
+
+    async def stream() -> None:
+        async for _ in model.astream("hi"):
+            pass
+
+    asyncio.run(stream())
+    text = tracing.render_prometheus()
+    assert 'span_duration_seconds_count{span="llm_call"} 1' in text
+    assert 'span_duration_seconds_count{span="llm_time_to_first_token"} 1' in text
@@ -0,0 +1,17 @@
+from starlette.testclient import TestClient
+
+from retrieval_graph.blobstore import blob_store
+from retrieval_graph.webapp import app
+
+
+def test_blob_uploads_are_stored_and_bounded(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("BLOB_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("BLOB_MAX_BYTES", "8")
+    client = TestClient(app)
+
+    response = client.post("/blobs", content=b"small")
+    assert response.status_code == 201
+    assert blob_store().read(response.json()["blob"]) == b"small"
+
+    assert client.post("/blobs", content=b"far too large").status_code == 413
+    assert not list(tmp_path.glob(".upload-*"))